@@ -1,10 +1,13 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from app.response import AppError
-from app.routes import auth_routes, news_routes
+from app.routes import auth_routes, news_routes, internal_routes
 from app.log import logger
+from app.services.category_catalogue import category_catalogue
 
 VERSION = "v1"
 origins = [
@@ -22,7 +25,14 @@ origins = [
 #     yield
 #     scheduler.shutdown()
 
-app = FastAPI(title="AiNewsVerse", version=VERSION)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    catalogue_listener = asyncio.create_task(category_catalogue.listen())
+    yield
+    catalogue_listener.cancel()
+
+
+app = FastAPI(title="AiNewsVerse", version=VERSION, lifespan=lifespan)
 
 
 app.add_middleware(
@@ -82,6 +92,9 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 app.include_router(news_routes, tags=["News"], prefix=f"/api/{VERSION}/news")
 app.include_router(auth_routes, tags=["Authentication"], prefix=f"/api/{VERSION}/auth")
+app.include_router(
+    internal_routes, tags=["Internal"], prefix=f"/api/{VERSION}/internal"
+)
 
 
 
@@ -1,7 +1,18 @@
-from app.ai.models import TitleCategoryRecord, TitleRecordResponse, TitleRecordFields
+from app.ai.models import (
+    TitleCategoryRecord,
+    TitleRecordResponse,
+    TitleRecordFields,
+    ArticleVectorRecord,
+    ArticleHit,
+)
+from app.ai.utils import make_title_record_id, make_article_record_id
 
 __all__ = [
     "TitleCategoryRecord",
     "TitleRecordResponse",
-    "TitleRecordFields"
-]
\ No newline at end of file
+    "TitleRecordFields",
+    "ArticleVectorRecord",
+    "ArticleHit",
+    "make_title_record_id",
+    "make_article_record_id",
+]
@@ -5,6 +5,11 @@ import inspect
 from loguru import logger
 from typing import Iterable
 from app.config import CONFIG
+from app.ai.components.rate_limit import (
+    GroqRateLimiter,
+    groq_rate_limiter,
+    estimate_tokens,
+)
 import enum
 
 
@@ -24,8 +29,7 @@ def retry_on_groq_rate_limit(
     Retries an async function on Groq RateLimitError by switching models.
 
     Assumptions:
-    - The wrapped function is an async method
-    - `self.client.chat.completions.create` accepts `model=...`
+    - The wrapped function is an async method of an object with `default_model`
     - The wrapped function accepts `model` as a keyword argument
     """
 
@@ -40,33 +44,28 @@ def retry_on_groq_rate_limit(
             )
 
         @functools.wraps(func)
-        async def wrapper(*args, **kwargs):
-            self = args[0]
-            first_model_used = kwargs["model"] if kwargs['model'] is not None else self.default_model
+        async def wrapper(self, *args, **kwargs):
+            first_model_used = kwargs.get("model") or self.default_model
 
-            models_to_retry: list[GroqModelEnum] = (
-                model_list if max_retries is None else model_list[:max_retries]
-            ).remove(first_model_used)
-
-            last_exc: Exception | None = None
+            # Every model except the first one used, that caused the error
+            models_to_retry = [model for model in model_list if model != first_model_used]
+            if max_retries is not None:
+                models_to_retry = models_to_retry[:max_retries]
 
             try:
-                # Tries the user provided model, explicit of default
-                return await func(*args, **kwargs)
-            except groq._exceptions.RateLimitError as exc:
-
-                # Tries all models except the first one used, that caused error
-                for i, model in enumerate(models_to_retry):
+                # Tries the user provided model, explicit or default
+                return await func(self, *args, **kwargs)
+            except groq.RateLimitError as exc:
+                last_exc: Exception = exc
+                logger.warning(f"Groq rate limit hit for {first_model_used.value}.")
+
+            for model in models_to_retry:
+                kwargs["model"] = model
+                try:
+                    return await func(self, *args, **kwargs)
+                except groq.RateLimitError as exc:
                     last_exc = exc
-                    self.default_model = models_to_retry[i]
-                    kwargs["model"] = models_to_retry[i]
-                    try:
-                        return await func(*args, **kwargs)
-                    except groq._exceptions.RateLimitError as exc:
-                        last_exc = exc
-                        logger.warning(
-                            f"Groq rate limit hit for {model}. Retrying with next model: {self.default_model}"
-                        )
+                    logger.warning(f"Groq rate limit hit for {model.value}.")
 
             # All models exhausted
             logger.error("All Groq models exhausted due to rate limits")
@@ -79,9 +78,14 @@ def retry_on_groq_rate_limit(
 
 class UseLLMsGroq:
 
-    def __init__(self, default_model: GroqModelEnum = GroqModelEnum.GPT_OSS_120B):
-        self._client: groq.Groq = groq.Groq(api_key=CONFIG.GROQ_API_KEY)
+    def __init__(
+        self,
+        default_model: GroqModelEnum = GroqModelEnum.GPT_OSS_120B,
+        rate_limiter: GroqRateLimiter | None = None,
+    ):
+        self._client: groq.AsyncGroq = groq.AsyncGroq(api_key=CONFIG.GROQ_API_KEY)
         self.default_model: GroqModelEnum = default_model
+        self.rate_limiter: GroqRateLimiter = rate_limiter or groq_rate_limiter
 
 
     @retry_on_groq_rate_limit(
@@ -94,6 +98,7 @@ class UseLLMsGroq:
         system_content: str = "You are a helpful AI assistant",
         model: GroqModelEnum | None = None,
         temperature: float = 0.9,
+        max_tokens: int | None = None,
     ) -> str:
         """Returns the chat completion from the groq"""
         if model is not None:
@@ -101,13 +106,19 @@ class UseLLMsGroq:
         else:
             model = self.default_model.value
 
-        chat_completion = self._client.chat.completions.create(
+        await self.rate_limiter.acquire(
+            model=model,
+            tokens=estimate_tokens(system_content + prompt)
+            + (max_tokens or CONFIG.GROQ_COMPLETION_TOKENS_ESTIMATE),
+        )
+        chat_completion = await self._client.chat.completions.create(
             messages=[
                 {"role": "system", "content": system_content},
                 {"role": "user", "content": prompt},
             ],
             model=model,
             temperature=temperature,
+            max_tokens=max_tokens,
         )
         return chat_completion.choices[0].message.content
 
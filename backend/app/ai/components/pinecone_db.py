@@ -1,4 +1,9 @@
-from app.ai import TitleCategoryRecord, TitleRecordResponse
+from app.ai import (
+    TitleCategoryRecord,
+    TitleRecordResponse,
+    ArticleVectorRecord,
+    ArticleHit,
+)
 from app.config import CONFIG
 
 from pinecone import PineconeAsyncio
@@ -12,7 +17,10 @@ from itertools import islice
 
   
 class PineconeClient:
-    NAMESPACES = {"title-category-namespace": "title-category-namespace"}
+    NAMESPACES = {
+        "title-category-namespace": "title-category-namespace",
+        "article-namespace": "article-namespace",
+    }
     _obj: "PineconeClient" = None
 
     def __init__(self, index):
@@ -75,10 +83,42 @@ class PineconeClient:
             except PineconeApiException as exc:
                 raise exc
 
-    async def upsert_records(self, records: List[TitleCategoryRecord]):
+    async def search_articles(
+        self, query: str, top_k: int, filter: Dict | None = None
+    ) -> List[ArticleHit]:
+        """Returns the articles nearest to the query, best match first. See
+        app.ai.components.vector_store.article_filter for the filter."""
+        search_query = {"inputs": {"text": query}, "top_k": top_k}
+        if filter:
+            search_query["filter"] = filter
+        async with self.index as idx:
+            result = await idx.search(
+                namespace=self.NAMESPACES["article-namespace"],
+                query=search_query,
+                fields=["guid", "published_on"],
+            )
+        return [
+            ArticleHit(
+                guid=hit["fields"]["guid"],
+                published_on=hit["fields"]["published_on"],
+                score=hit["_score"],
+            )
+            for hit in result.get("result", {}).get("hits", [])
+        ]
+
+    async def upsert_article_records(self, records: List[ArticleVectorRecord]):
+        await self.upsert_records(
+            records=records, namespace=self.NAMESPACES["article-namespace"]
+        )
+
+    async def upsert_records(
+        self,
+        records: List[TitleCategoryRecord] | List[ArticleVectorRecord],
+        namespace: str = NAMESPACES["title-category-namespace"],
+    ):
         async with self.index as idx:
             try:
-                logger.info(f"Upserting {len(records)} records to pinecone")
+                logger.info(f"Upserting {len(records)} records to pinecone {namespace}")
 
                 def chunks(
                     iterable: list[Dict], size=96
@@ -90,12 +130,7 @@ class PineconeClient:
 
                 for batch in chunks(records, 96):
                     logger.debug(f"The batch is : {batch} \n\n")
-                    await idx.upsert_records(
-                        namespace=self.NAMESPACES.get(
-                            "title-category-namespace", "title-category-namespace"
-                        ),
-                        records=batch,
-                    )
+                    await idx.upsert_records(namespace=namespace, records=batch)
                 logger.info(f"Upserted {len(records)} records to pinecone")
 
             except PineconeApiException as e:
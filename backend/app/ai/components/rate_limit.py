@@ -0,0 +1,81 @@
+"""Groq rate limits shared by every process calling groq.
+
+The classifier in the scrape task and the summarizer run in different celery workers
+against the same organisation limits. Each call reserves one request and its estimated
+tokens in the current one minute window of the model, kept in redis, and waits for
+the next window when the reservation does not fit.
+"""
+
+import asyncio
+import random
+import time
+
+from loguru import logger
+from redis.exceptions import RedisError
+
+from app.cache import get_redis
+from app.config import CONFIG
+
+
+# Roughly 4 characters per token for english text, good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class GroqRateLimiter:
+    WINDOW_KEY = "groq:ratelimit:{model}:{window}"
+    WINDOW_SECONDS = 60
+
+    # Reserves the request and tokens unless the window would go over a limit
+    RESERVE_SCRIPT = """
+    local requests = tonumber(redis.call('HGET', KEYS[1], 'requests') or '0')
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or '0')
+    if requests + 1 > tonumber(ARGV[2]) or tokens + tonumber(ARGV[1]) > tonumber(ARGV[3]) then
+        return 0
+    end
+    redis.call('HINCRBY', KEYS[1], 'requests', 1)
+    redis.call('HINCRBY', KEYS[1], 'tokens', ARGV[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    return 1
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = CONFIG.GROQ_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = CONFIG.GROQ_TOKENS_PER_MINUTE,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+    async def acquire(self, model: str, tokens: int):
+        """Waits until the request fits in the limits of the model. Without redis the
+        request goes through and groq's own 429 handling applies."""
+        # A request larger than the whole budget would never fit
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            now = time.time()
+            window = int(now // self.WINDOW_SECONDS)
+            try:
+                reserved = await get_redis().eval(
+                    self.RESERVE_SCRIPT,
+                    1,
+                    self.WINDOW_KEY.format(model=model, window=window),
+                    tokens,
+                    self.requests_per_minute,
+                    self.tokens_per_minute,
+                    self.WINDOW_SECONDS * 2,
+                )
+            except RedisError as exc:
+                logger.warning(f"Groq rate limiter unavailable: {exc}")
+                return
+            if reserved:
+                return
+            wait = self.WINDOW_SECONDS - now % self.WINDOW_SECONDS
+            # Spreads the waiting callers over the start of the next window
+            await asyncio.sleep(wait + random.uniform(0, 1))
+
+
+groq_rate_limiter = GroqRateLimiter()
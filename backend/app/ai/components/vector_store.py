@@ -0,0 +1,146 @@
+"""Vector store of the article embeddings used by the semantic search.
+
+`VECTOR_STORE=pinecone` keeps them in the "article-namespace" of the pinecone index,
+embedded with llama-text-embed-v2 like the title records. `VECTOR_STORE=fake` keeps
+them in memory with a bag of words embedding, for tests and running locally without
+a pinecone index. It only knows the records upserted by its own process.
+
+Articles are upserted by the scrape task, see app/ai/pipeline/index_articles.py.
+"""
+
+import hashlib
+import math
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Protocol
+
+from app.ai import ArticleVectorRecord, ArticleHit
+from app.config import CONFIG
+
+
+class ArticleVectorStore(Protocol):
+    async def upsert_article_records(self, records: List[ArticleVectorRecord]): ...
+
+    async def search_articles(
+        self, query: str, top_k: int, filter: Dict | None = None
+    ) -> List[ArticleHit]: ...
+
+
+def article_filter(
+    subcategory_ids: Iterable[str] | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> Dict | None:
+    """Builds the pinecone metadata filter of the article records."""
+    filter = {}
+    if subcategory_ids is not None:
+        filter["subcategory_id"] = {"$in": [str(id) for id in subcategory_ids]}
+    published_ts = {}
+    if since is not None:
+        published_ts["$gte"] = int(since.timestamp())
+    if until is not None:
+        published_ts["$lte"] = int(until.timestamp())
+    if published_ts:
+        filter["published_ts"] = published_ts
+    return filter or None
+
+
+_OPERATORS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": lambda value, operand: value > operand,
+    "$gte": lambda value, operand: value >= operand,
+    "$lt": lambda value, operand: value < operand,
+    "$lte": lambda value, operand: value <= operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+
+def matches_filter(record: Dict, filter: Dict | None) -> bool:
+    """Evaluates a pinecone metadata filter against a record, the subset of the filter
+    language `article_filter` produces plus $and/$or."""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(record, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(record, part) for part in condition):
+                return False
+        elif key not in record:
+            return False
+        elif isinstance(condition, dict):
+            for operator, operand in condition.items():
+                if not _OPERATORS[operator](record[key], operand):
+                    return False
+        elif record[key] != condition:
+            return False
+    return True
+
+
+class FakeVectorStore:
+    """In memory `ArticleVectorStore`, scores are the cosine similarity of hashed bag
+    of words vectors. Deterministic, which the real embeddings are not guaranteed to be."""
+
+    DIMENSION = 1024
+    _TOKEN = re.compile(r"\w+")
+
+    def __init__(self):
+        self.records: Dict[str, ArticleVectorRecord] = {}
+        self.vectors: Dict[str, Dict[int, float]] = {}
+
+    @classmethod
+    def embed(cls, text: str) -> Dict[int, float]:
+        vector: Dict[int, float] = {}
+        for token in cls._TOKEN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest, "big") % cls.DIMENSION
+            vector[bucket] = vector.get(bucket, 0.0) + 1.0
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        return {bucket: value / norm for bucket, value in vector.items()} if norm else {}
+
+    async def upsert_article_records(self, records: List[ArticleVectorRecord]):
+        for record in records:
+            self.records[record["id"]] = record
+            self.vectors[record["id"]] = self.embed(record["title"])
+
+    async def search_articles(
+        self, query: str, top_k: int, filter: Dict | None = None
+    ) -> List[ArticleHit]:
+        query_vector = self.embed(query)
+        scored = []
+        for id, record in self.records.items():
+            if not matches_filter(record, filter):
+                continue
+            vector = self.vectors[id]
+            score = sum(value * vector.get(bucket, 0.0) for bucket, value in query_vector.items())
+            scored.append((score, id))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [
+            ArticleHit(
+                guid=self.records[id]["guid"],
+                published_on=self.records[id]["published_on"],
+                score=score,
+            )
+            for score, id in scored[:top_k]
+        ]
+
+
+fake_vector_store = FakeVectorStore()
+_vector_store: ArticleVectorStore | None = None
+
+
+# async factory, the store is created once per process
+async def init_vector_store() -> ArticleVectorStore:
+    global _vector_store
+    if _vector_store is None:
+        if CONFIG.VECTOR_STORE == "fake":
+            _vector_store = fake_vector_store
+        else:
+            # Imported here so the fake store works without the pinecone client
+            from app.ai.components.pinecone_db import init_pinecone_db
+
+            _vector_store = await init_pinecone_db()
+    return _vector_store
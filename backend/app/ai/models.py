@@ -17,4 +17,22 @@ class TitleRecordFields(TypedDict):
 class TitleRecordResponse(TypedDict):
     _id: str
     _score: float
-    fields: TitleRecordFields
\ No newline at end of file
+    fields: TitleRecordFields
+
+class ArticleVectorRecord(TypedDict):
+    id: str
+    # Embedded field of the index, title and description of the article
+    title: str
+    guid: str
+    # ISO timestamp to hydrate the article, the epoch seconds are for range filters
+    published_on: str
+    published_ts: int
+    category_id: str
+    subcategory_id: str
+    source: str
+
+
+class ArticleHit(TypedDict):
+    guid: str
+    published_on: str
+    score: float
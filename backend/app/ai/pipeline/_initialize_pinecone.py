@@ -4,20 +4,37 @@ import asyncio
 from loguru import logger
 
 from app.ai.components.pinecone_db import init_pinecone_db, PineconeClient
-from app.ai.models import TitleCategoryRecord
 from app.repository import init_repository, NewsRepository
+from app.services.ai_news_service import NewsDBService
 from app.db.main import get_session
 
 # groq.RateLimitError: Error code: 429 - {'error': {'message': 'Rate limit reached for model `openai/gpt-oss-120b` in organization `org_01jzf764c7eenssycd98hwa9zr` service tier `on_demand` on tokens per day (TPD): Limit 200000, Used 199682, Requested 672. Please try again in 2m32.928s. Need more tokens? Upgrade to Dev Tier today at https://console.groq.com/settings/billing', 'type': 'tokens', 'code': 'rate_limit_exceeded'}}
 
-async def main_pipeline():
 
-    logger.critical("Run only once, data might be duplicated in pinecone db.")
+async def sync_pinecone_records(
+    pinecone: PineconeClient, db: NewsDBService, batch_size: int = 960
+) -> int:
+    """Upserts only the articles which are not indexed yet and moves their watermark.
+    Returns the number of articles synced."""
+    no_of_articles = 0
+    async for session in get_session():
+        while True:
+            records, guids = await db.get_unindexed_records_for_pinecone(
+                session=session, limit=batch_size
+            )
+            if not guids:
+                break
+            await pinecone.upsert_records(records=records)
+            await db.mark_articles_indexed(guids=guids, session=session)
+            no_of_articles = no_of_articles + len(guids)
+
+    logger.info(f"Synced {no_of_articles} new articles to pinecone.")
+    return no_of_articles
 
-    choice = input("Do you want to proceed?(y/n): ")
 
-    if choice.lower() != 'y':
-        return
+async def main_pipeline(full_rebuild: bool = False):
+    """Fetches the recent articles and indexes them. Record ids are content addressed
+    so re-running never duplicates data, the full rebuild just costs more."""
 
     repository: NewsRepository = await init_repository()
     pinecone: PineconeClient = await init_pinecone_db()
@@ -36,10 +53,12 @@ async def main_pipeline():
             session=session, source='HACKERNOON', cutoff_hours=48, commit_on_each=True, scrape_content=False
         )
 
-        pinecone_records: list[TitleCategoryRecord] = await repository.db.get_records_for_pinecone(session=session)
-        
-    await pinecone.upsert_records(records=pinecone_records)
+        if full_rebuild:
+            await repository.db.reset_pinecone_watermark(session=session)
+
+    await sync_pinecone_records(pinecone=pinecone, db=repository.db)
 
 
 if __name__ == "__main__":
-    asyncio.run(main_pipeline())
\ No newline at end of file
+    import sys
+    asyncio.run(main_pipeline(full_rebuild="--full" in sys.argv))
@@ -0,0 +1,321 @@
+"""Map-reduce summaries of articles too long for one prompt.
+
+The docling markdown is cleaned of navigation, share bars, newsletter boxes and footers,
+split at its headings into chunks of at most `SUMMARY_CHUNK_TOKENS` and every chunk is
+summarized on its own, concurrently. The chunk summaries are then reduced into the
+article summary, in rounds when they do not fit one prompt either.
+
+Chunks follow the heading structure so an edit only changes the chunks of the edited
+sections. Chunk summaries are cached by content hash, re-summarizing an edited article
+only calls the model for those chunks and the reduce.
+"""
+
+import asyncio
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import List
+
+from loguru import logger
+
+from app.ai.components.llms import UseLLMsGroq, GroqModelEnum
+from app.ai.components.rate_limit import estimate_tokens, CHARS_PER_TOKEN
+from app.cache import SummaryCache
+from app.config import CONFIG
+
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+# Sections that are not part of the article, matched against the whole heading so
+# article sections like "Related work" or "Menu pricing" are kept
+_NOISE_HEADINGS = re.compile(
+    r"^("
+    r"(related|recommended|popular|trending|latest)"
+    r"(\s+(posts|articles|stories|news|content|links|reading))?"
+    r"|read (more|next)|share( this( article| post| story)?)?|follow us( on \w+)?"
+    r"|(subscribe to|sign up for)( our)? newsletters?|newsletters?|subscribe|sign up"
+    r"|footer|navigation|menu|comments|about the author|tags|you may also like"
+    r"|more from(\s+\S+){1,4}"
+    r")\s*[:.!]?\s*$",
+    re.IGNORECASE,
+)
+# Lines of page chrome that docling keeps between the paragraphs, matched against the
+# whole line so sentences about copyright or advertising are kept
+_NOISE_LINES = re.compile(
+    r"^("
+    r"©.*|copyright\s+(©\s*)?\d{4}.*|.*all rights reserved\.?"
+    r"|share( this( article| post| story)?| on \w+)|follow us( on \w+)?"
+    r"|(subscribe to|sign up for)( our)? newsletters?.*"
+    r"|we use cookies.*|(accept|manage)( all)? cookies"
+    r"|advertisement|sponsored|skip to (main )?content|<!-- image -->"
+    r")\s*[:.!]?\s*$",
+    re.IGNORECASE,
+)
+_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+# Consecutive link only lines from which on they are a menu or a share bar
+_LINK_RUN = 3
+
+
+@dataclass
+class Section:
+    heading: str
+    text: str
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+def _strip_line(line: str) -> str:
+    return line.strip().lstrip("-*|> ").strip()
+
+
+def _is_link_line(stripped: str) -> bool:
+    return bool(stripped) and not _LINK.sub("", stripped).strip(" |·•-*")
+
+
+def _is_noise_line(stripped: str) -> bool:
+    # Image only lines are logos and icons, several links on a line a share bar
+    if _is_link_line(stripped) and (
+        not _IMAGE.sub("", stripped).strip(" |·•-*") or len(_LINK.findall(stripped)) > 1
+    ):
+        return True
+    return len(stripped) < 120 and bool(_NOISE_LINES.match(stripped))
+
+
+def strip_noise_lines(text: str) -> List[str]:
+    """Lines of the text without the page chrome. A line that is a single link is
+    kept, it may be a reference of the article, unless it is part of a run of link
+    lines like a menu."""
+    lines = text.splitlines()
+    stripped = [_strip_line(line) for line in lines]
+    kept = []
+    index = 0
+    while index < len(lines):
+        end = index
+        while end < len(lines) and _is_link_line(stripped[end]):
+            end += 1
+        if end - index >= _LINK_RUN:
+            index = end
+            continue
+        end = max(end, index + 1)
+        kept.extend(
+            line
+            for line, clean in zip(lines[index:end], stripped[index:end])
+            if not (clean and _is_noise_line(clean))
+        )
+        index = end
+    return kept
+
+
+def split_sections(markdown: str) -> List[Section]:
+    """Splits the markdown at its headings, the text before the first heading is a
+    section with an empty heading."""
+    sections = [Section(heading="", text="")]
+    lines: List[str] = []
+    for line in markdown.splitlines():
+        match = _HEADING.match(line)
+        if match:
+            sections[-1].text = "\n".join(lines).strip()
+            sections.append(Section(heading=match[2].strip(), text=""))
+            lines = [line]
+        else:
+            lines.append(line)
+    sections[-1].text = "\n".join(lines).strip()
+    return [section for section in sections if section.text]
+
+
+def strip_noise(markdown: str) -> List[Section]:
+    """Sections of the article without the page chrome and the noise sections."""
+    sections = []
+    for section in split_sections(markdown):
+        if _NOISE_HEADINGS.match(section.heading):
+            continue
+        lines = strip_noise_lines(section.text)
+        # Nothing but the heading is left
+        if not any(line.strip() and not _HEADING.match(line) for line in lines):
+            continue
+        text = re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+        sections.append(Section(heading=section.heading, text=text))
+    return sections
+
+
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """Splits a section at its paragraphs, and paragraphs at max length."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    parts: List[str] = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > max_chars:
+            parts.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            parts.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        parts.append(current)
+    return parts
+
+
+def chunk_sections(
+    sections: List[Section],
+    max_tokens: int = CONFIG.SUMMARY_CHUNK_TOKENS,
+    min_tokens: int = CONFIG.SUMMARY_CHUNK_MIN_TOKENS,
+) -> List[str]:
+    """One chunk per section, short sections are merged into the following ones until
+    `min_tokens` and long ones split at their paragraphs."""
+    chunks: List[str] = []
+    pending = ""
+    for section in sections:
+        if section.tokens > max_tokens:
+            if pending:
+                chunks.append(pending)
+                pending = ""
+            chunks.extend(_split_oversized(section.text, max_tokens))
+            continue
+        pending = f"{pending}\n\n{section.text}" if pending else section.text
+        if estimate_tokens(pending) >= min_tokens:
+            chunks.append(pending)
+            pending = ""
+    if pending:
+        if chunks and estimate_tokens(chunks[-1] + pending) <= max_tokens:
+            chunks[-1] = f"{chunks[-1]}\n\n{pending}"
+        else:
+            chunks.append(pending)
+    return chunks
+
+
+class ChunkedSummarizer:
+    # Part of the cache keys, change it when the prompts change the summaries
+    PROMPT_VERSION = "v1"
+    CHUNK_KEY = "news:summary:chunk:{content_hash}"
+
+    MAP_PROMPT = """
+        You are an AI assistant summarizing one part of a long AI news article.
+
+        Task:
+        Summarize the **PART** in at most 3 sentences of plain text. Keep the facts,
+        names and numbers. Output only the summary, no introduction.
+
+        Input:
+        PART: `{chunk}`
+    """
+
+    REDUCE_PROMPT = """
+        You are an AI assistant summarizing AI news articles.
+
+        Task:
+        The **PARTS** are summaries of consecutive parts of one article. Write the
+        summary of the whole article in 2 to 3 sentences of plain text. Keep the most
+        important facts, names and numbers. Output only the summary, no introduction.
+
+        Input:
+        PARTS: `{parts}`
+    """
+
+    def __init__(
+        self,
+        llm: UseLLMsGroq | None = None,
+        cache: SummaryCache | None = None,
+        model: GroqModelEnum = GroqModelEnum.LLAMA_3_3_70B_VERSATILE,
+        concurrency: int = CONFIG.SUMMARY_CHUNK_CONCURRENCY,
+    ):
+        self.llm: UseLLMsGroq = llm or UseLLMsGroq(default_model=model)
+        self.cache: SummaryCache = cache or SummaryCache(key=self.CHUNK_KEY)
+        self.model = model
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    def content_hash(self, kind: str, text: str) -> str:
+        return hashlib.sha256(
+            f"{self.PROMPT_VERSION}\x1f{kind}\x1f{text}".encode()
+        ).hexdigest()
+
+    async def _complete(self, prompt: str) -> str:
+        async with self.semaphore:
+            result = await self.llm.chat_completion(
+                prompt=prompt,
+                model=self.model,
+                temperature=0.2,
+                max_tokens=CONFIG.SUMMARY_TOKENS_PER_ARTICLE,
+            )
+        return result.strip()
+
+    async def _summarize_cached(
+        self, kind: str, texts: List[str], prompt: str, field: str
+    ) -> List[str]:
+        """Summarizes every text with the prompt, through the cache."""
+        hashes = [self.content_hash(kind, text) for text in texts]
+        cached = await self.cache.get_many(list(set(hashes)))
+        missing = {h: text for h, text in zip(hashes, texts) if h not in cached}
+        if missing:
+            logger.info(
+                f"Summarizing {len(missing)} of {len(texts)} {kind} parts, "
+                f"{len(texts) - len(missing)} cached."
+            )
+            results = await asyncio.gather(
+                *(
+                    self._complete(prompt.format(**{field: text}))
+                    for text in missing.values()
+                )
+            )
+            computed = dict(zip(missing.keys(), results))
+            await self.cache.set_many(computed)
+            cached.update(computed)
+        return [cached[h] for h in hashes]
+
+    async def summarize(self, markdown: str) -> str:
+        chunks = chunk_sections(strip_noise(markdown))
+        if not chunks:
+            return ""
+        summaries = await self._summarize_cached("map", chunks, self.MAP_PROMPT, "chunk")
+
+        # Reduce in groups that fit one prompt until one summary is left
+        budget = CONFIG.SUMMARY_CHUNK_TOKENS
+        while len(summaries) > 1:
+            groups: List[List[str]] = [[]]
+            for summary in summaries:
+                group_tokens = estimate_tokens("\n\n".join(groups[-1] + [summary]))
+                if groups[-1] and group_tokens > budget:
+                    groups.append([])
+                groups[-1].append(summary)
+            parts = ["\n\n".join(group) for group in groups]
+            summaries = await self._summarize_cached(
+                "reduce", parts, self.REDUCE_PROMPT, "parts"
+            )
+        return summaries[0]
+
+
+if __name__ == "__main__":
+    # Shows how an article is cleaned and chunked, without calling the model
+    import sys
+
+    for line in (
+        "The New York Times sued OpenAI for copyright infringement.",
+        "Apple said advertisement revenue fell.",
+        "Users can now share on X directly from ChatGPT.",
+        "Cookie consent rules apply to AI chatbots too.",
+        "[OpenAI releases o3](https://openai.com/index/o3)",
+    ):
+        assert strip_noise_lines(line) == [line], line
+    for line in (
+        "© 2025 Vox Media, LLC. All rights reserved.",
+        "Copyright 2025 The Verge",
+        "Share on Twitter",
+        "Follow us",
+        "Advertisement",
+        "[Twitter](https://x.com) | [Facebook](https://facebook.com)",
+        "- [Home](/)\n- [AI](/ai)\n- [Policy](/policy)",
+    ):
+        assert strip_noise_lines(line) == [], line
+
+    with open(sys.argv[1]) as f:
+        markdown = f.read()
+    sections = strip_noise(markdown)
+    chunks = chunk_sections(sections)
+    print(
+        f"{estimate_tokens(markdown)} tokens, {len(sections)} sections kept, "
+        f"{sum(estimate_tokens(chunk) for chunk in chunks)} tokens in {len(chunks)} chunks"
+    )
+    for chunk in chunks:
+        print(f"--- {estimate_tokens(chunk)} tokens\n{chunk[:200]}")
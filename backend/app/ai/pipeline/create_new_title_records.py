@@ -1,13 +1,13 @@
 """This file defines the pipeline for generating the titles and upserting them when new
 category or subcategory are added to the database."""
 
-import uuid
 import asyncio as aio
 from loguru import logger
 
 from app.ai.components.news_title_generator import NewsTitleGenerator, NewsTitles
 from app.ai.components.pinecone_db import PineconeClient, init_pinecone_db
 from app.ai.models import TitleCategoryRecord
+from app.ai.utils import make_title_record_id
 
 
 class CreateNewTitleRecordsPipeline:
@@ -42,7 +42,7 @@ class CreateNewTitleRecordsPipeline:
         )
         records: list[TitleCategoryRecord] = [
             {
-                "id": str(uuid.uuid4()),
+                "id": make_title_record_id(title, category, topic),
                 "title": title,
                 "category": category,
                 "subcategory": topic,
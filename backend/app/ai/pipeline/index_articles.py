@@ -0,0 +1,47 @@
+"""Upserts the articles into the vector store of the semantic search."""
+
+import asyncio
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.ai.components.vector_store import ArticleVectorStore, init_vector_store
+from app.services.ai_news_service import NewsDBService
+
+
+async def sync_article_vectors(
+    store: ArticleVectorStore,
+    db: NewsDBService,
+    session: AsyncSession,
+    batch_size: int = 960,
+) -> int:
+    """Upserts only the articles which are not indexed yet and moves their watermark.
+    Returns the number of articles synced."""
+    no_of_articles = 0
+    while True:
+        records, keys = await db.get_unindexed_article_records(
+            session=session, limit=batch_size
+        )
+        if not keys:
+            break
+        await store.upsert_article_records(records=records)
+        await db.mark_articles_vector_indexed(keys=keys, session=session)
+        no_of_articles = no_of_articles + len(keys)
+
+    logger.info(f"Synced {no_of_articles} new articles to the vector store.")
+    return no_of_articles
+
+
+if __name__ == "__main__":
+    import sys
+
+    from app.db.main import get_session
+
+    async def main(full_rebuild: bool):
+        store = await init_vector_store()
+        db = NewsDBService()
+        async for session in get_session():
+            if full_rebuild:
+                await db.reset_vector_watermark(session=session)
+            await sync_article_vectors(store=store, db=db, session=session)
+
+    asyncio.run(main(full_rebuild="--full" in sys.argv))
@@ -0,0 +1,266 @@
+"""Background summarization of the scraped articles into `article_contents.summary`.
+
+Runs as the `celery_app.summarize_articles` task, queued after every ingestion and on
+a schedule, so the scrape path never waits for it. Each run takes the newest articles
+with a body but no summary, packs several of them per LLM request within the token
+budget and writes the summaries back in bulk after every request. The queue is the
+`summary IS NULL` rows themselves, an interrupted run just leaves the rest for the
+next one. Summaries are also cached by a hash of the prompt version and the body, the
+same body is never summarized twice.
+
+Page chrome is stripped first. Articles still longer than `SUMMARY_ARTICLE_MAX_TOKENS`
+are summarized on their own by the map-reduce `ChunkedSummarizer`.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List
+
+from loguru import logger
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.ai.components.llms import UseLLMsGroq, GroqModelEnum
+from app.ai.components.rate_limit import estimate_tokens
+from app.ai.pipeline.chunked_summary import ChunkedSummarizer, strip_noise
+from app.cache import get_redis, SummaryCache
+from app.config import CONFIG
+from app.services.ai_news_service import NewsDBService
+
+
+@dataclass
+class SummaryInput:
+    guid: str
+    published_on: datetime
+    content_hash: str
+    text: str
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+def pack_batches(
+    inputs: List[SummaryInput],
+    token_budget: int = CONFIG.SUMMARY_BATCH_INPUT_TOKENS,
+    max_articles: int = CONFIG.SUMMARY_BATCH_MAX_ARTICLES,
+) -> List[List[SummaryInput]]:
+    """Packs the inputs in order into batches of at most `token_budget` input tokens and
+    `max_articles` articles. An input over the budget gets a batch of its own."""
+    batches: List[List[SummaryInput]] = []
+    batch: List[SummaryInput] = []
+    batch_tokens = 0
+    for item in inputs:
+        if batch and (
+            batch_tokens + item.tokens > token_budget or len(batch) >= max_articles
+        ):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += item.tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class ArticleSummarizer:
+    # Part of the cache key, change it when the prompt changes the summaries
+    PROMPT_VERSION = "v2"
+
+    SUMMARIZE_PROMPT = """
+        You are an AI assistant summarizing AI news articles.
+
+        Task:
+        Summarize each article of **ARTICLES** in 2 to 3 sentences of plain text. Keep the
+        facts, names and numbers, leave out opinions, navigation and advertisements.
+
+        Rules:
+
+        1. Output **strict JSON only**, following the structure below. Do not even include the markdown json format. Give just json.
+        2. One entry per article, with the article's id.
+        3. No explanations or extra text.
+
+        Input:
+        ARTICLES: `{articles}`
+
+        Output (exact structure):
+        {{
+        "summaries": [{{ "id": "0", "summary": "..." }}]
+        }}
+    """
+
+    LOCK_KEY = "news:summary:lock"
+    LOCK_SECONDS = 15 * 60
+    RELEASE_LOCK_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(
+        self,
+        db: NewsDBService | None = None,
+        llm: UseLLMsGroq | None = None,
+        cache: SummaryCache | None = None,
+        chunked: ChunkedSummarizer | None = None,
+        model: GroqModelEnum = GroqModelEnum.LLAMA_3_3_70B_VERSATILE,
+    ):
+        self.db: NewsDBService = db or NewsDBService()
+        self.llm: UseLLMsGroq = llm or UseLLMsGroq(default_model=model)
+        self.cache: SummaryCache = cache or SummaryCache()
+        self.chunked: ChunkedSummarizer = chunked or ChunkedSummarizer(
+            llm=self.llm, model=model
+        )
+        self.model = model
+
+    def to_input(self, guid: str, published_on: datetime, markdown: str) -> SummaryInput:
+        text = "\n\n".join(section.text for section in strip_noise(markdown))
+        content_hash = hashlib.sha256(
+            f"{self.PROMPT_VERSION}\x1f{text}".encode()
+        ).hexdigest()
+        return SummaryInput(
+            guid=guid, published_on=published_on, content_hash=content_hash, text=text
+        )
+
+    @staticmethod
+    def parse_summaries(result: str, batch_size: int) -> Dict[int, str]:
+        """Returns the summaries of the response by position in the batch."""
+        result = re.sub(r"^```(?:json)?|```$", "", result.strip()).strip()
+        summaries = {}
+        for item in json.loads(result).get("summaries", []):
+            try:
+                position = int(item["id"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            summary = str(item.get("summary") or "").strip()
+            if 0 <= position < batch_size and summary:
+                summaries[position] = summary
+        return summaries
+
+    async def summarize_batch(self, batch: List[SummaryInput]) -> Dict[str, str]:
+        """Returns the summaries of the batch by content hash, the articles the model
+        skipped are missing."""
+        prompt = self.SUMMARIZE_PROMPT.format(
+            articles=json.dumps(
+                [{"id": str(i), "text": item.text} for i, item in enumerate(batch)]
+            )
+        )
+        result = await self.llm.chat_completion(
+            prompt=prompt,
+            model=self.model,
+            temperature=0.2,
+            max_tokens=CONFIG.SUMMARY_TOKENS_PER_ARTICLE * len(batch),
+        )
+        summaries = self.parse_summaries(result, batch_size=len(batch))
+        return {batch[i].content_hash: summary for i, summary in summaries.items()}
+
+    async def _acquire_lock(self) -> str | None:
+        token = uuid.uuid4().hex
+        try:
+            acquired = await get_redis().set(
+                self.LOCK_KEY, token, nx=True, ex=self.LOCK_SECONDS
+            )
+        except RedisError as exc:
+            # Overlapping runs only waste tokens, summarizing is idempotent
+            logger.warning(f"Summary lock unavailable: {exc}")
+            return token
+        return token if acquired else None
+
+    async def _release_lock(self, token: str):
+        try:
+            await get_redis().eval(self.RELEASE_LOCK_SCRIPT, 1, self.LOCK_KEY, token)
+        except RedisError as exc:
+            logger.warning(f"Releasing the summary lock failed: {exc}")
+
+    async def run(self, session: AsyncSession, max_articles: int = 200) -> int:
+        """Summarizes up to `max_articles` articles, returns the number summarized. Only
+        one run at a time does the work, the others return 0."""
+        token = await self._acquire_lock()
+        if token is None:
+            logger.info("Another summarization run is in progress.")
+            return 0
+        try:
+            return await self._run(session=session, max_articles=max_articles)
+        finally:
+            await self._release_lock(token)
+
+    async def _run(self, session: AsyncSession, max_articles: int) -> int:
+        no_of_summaries = 0
+        # Articles the model did not summarize in this run, retried by the next one
+        failed = set()
+        while no_of_summaries < max_articles:
+            rows = await self.db.get_articles_to_summarize(
+                session=session,
+                limit=min(50, max_articles - no_of_summaries),
+                exclude=list(failed),
+            )
+            await session.commit()
+            if not rows:
+                break
+            inputs = [self.to_input(*row) for row in rows]
+
+            cached = await self.cache.get_many([item.content_hash for item in inputs])
+            await self.db.save_summaries(
+                [
+                    (item.guid, item.published_on, cached[item.content_hash])
+                    for item in inputs
+                    if item.content_hash in cached
+                ],
+                session=session,
+            )
+            no_of_summaries += sum(1 for item in inputs if item.content_hash in cached)
+
+            missing = [item for item in inputs if item.content_hash not in cached]
+            max_tokens = CONFIG.SUMMARY_ARTICLE_MAX_TOKENS
+            # Long articles one by one, their chunks are summarized concurrently
+            batches = [
+                (batch, False)
+                for batch in pack_batches(
+                    [item for item in missing if item.tokens <= max_tokens]
+                )
+            ] + [([item], True) for item in missing if item.tokens > max_tokens]
+
+            for batch, is_long in batches:
+                try:
+                    if is_long:
+                        summary = await self.chunked.summarize(batch[0].text)
+                        summaries = {batch[0].content_hash: summary} if summary else {}
+                    else:
+                        summaries = await self.summarize_batch(batch)
+                except Exception as exc:
+                    logger.error(f"Summarizing {len(batch)} articles failed: {exc}")
+                    summaries = {}
+                await self.cache.set_many(summaries)
+                await self.db.save_summaries(
+                    [
+                        (item.guid, item.published_on, summaries[item.content_hash])
+                        for item in batch
+                        if item.content_hash in summaries
+                    ],
+                    session=session,
+                )
+                for item in batch:
+                    if item.content_hash in summaries:
+                        no_of_summaries += 1
+                    else:
+                        failed.add((item.guid, item.published_on))
+
+        logger.info(f"Summarized {no_of_summaries} articles, {len(failed)} failed.")
+        return no_of_summaries
+
+
+if __name__ == "__main__":
+    from app.db.main import get_session
+
+    async def main():
+        summarizer = ArticleSummarizer()
+        async for session in get_session():
+            await summarizer.run(session=session)
+
+    asyncio.run(main())
@@ -0,0 +1,18 @@
+import hashlib
+
+
+def make_title_record_id(title: str, category: str, subcategory: str) -> str:
+    """Returns the content addressed id of a title record.
+
+    Same (title, category, subcategory) always gives the same id, so upserting a
+    record twice overwrites it in pinecone instead of creating a duplicate.
+    """
+    key = "\x1f".join((title.strip(), str(category), str(subcategory)))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def make_article_record_id(guid: str, published_on: str) -> str:
+    """Returns the id of the article record, guids are urls which can be longer than
+    the ids pinecone accepts."""
+    key = "\x1f".join((guid, published_on))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio.session import AsyncSession
 
 
 from app.db.schemas import Users
-from app.db.main import get_session
+from app.db.main import get_read_session, Session
 from app.auth.utils import decode_jwt_tokens
 from app.services.auth import AuthService
 from app.auth.exceptions import InvalidJWTTokenError, UserNotFoundError, PermissionDeniedError
@@ -39,7 +39,7 @@ class AccessTokenBearer(APIKeyCookie):
 
 
 async def get_current_user(
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
     token_data=Depends(AccessTokenBearer()),
 ):
     user_uid = token_data["sub"]
@@ -47,6 +47,13 @@ async def get_current_user(
     if result is not None:
         return result
 
+    # A user who just signed up may not be on the replica yet
+    if session.info.get("replica"):
+        async with Session() as primary_session:
+            result = await auth_service.get_user_by_uuid(user_uid, primary_session)
+        if result is not None:
+            return result
+
     raise AppError(UserNotFoundError())
 
 
@@ -23,14 +23,40 @@ app.conf.update(
     task_annotations={
         '*': {'rate_limit': '10/s'}  # Limit task execution rate globally
     },
+    # Scraping and LLM calls run on their own worker pools, scaled separately:
+    #   celery -A app.background_tasks.tasks worker -Q playwright
+    #   celery -A app.background_tasks.tasks worker -Q llm
+    # everything else goes to the default "celery" queue.
+    task_routes={
+        'celery_app.scrape_chunk': {'queue': 'playwright'},
+        'celery_app.classify_chunk': {'queue': 'llm'},
+        'celery_app.summarize_articles': {'queue': 'llm'},
+    },
+    # The chunk tasks take minutes, a worker only reserves the task it runs
+    worker_prefetch_multiplier=1,
 )
 
 
 CELERY_BEAT_SCHEDULE = {
+    # Fans out over every feed of every source, see app/background_tasks/tasks.py
     "fetch-news-everyday-at-12-00": {
         "task": "celery_app.scrape_and_store_news",
         "schedule": crontab(hour=12, minute=0)
-    }
+    },
+    # Picks up what the runs queued after each scrape missed
+    "summarize-articles-every-5-minutes": {
+        "task": "celery_app.summarize_articles",
+        "schedule": schedule(run_every=5 * 60)
+    },
+    # The digests are per day, rebuilt after midnight even without new articles
+    "precompute-digests-after-midnight": {
+        "task": "celery_app.precompute_digests",
+        "schedule": crontab(hour=0, minute=5)
+    },
+    "maintain-article-partitions-daily": {
+        "task": "celery_app.maintain_article_partitions",
+        "schedule": crontab(hour=3, minute=30)
+    },
 }
 
 app.conf.beat_schedule = CELERY_BEAT_SCHEDULE
\ No newline at end of file
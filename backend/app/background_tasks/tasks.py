@@ -1,20 +1,284 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Tuple
 from asgiref.sync import async_to_sync
+from celery import chain, chord
 from app.background_tasks.celery_app import app
-from app.database.main import get_session
-from app.repository import NewsRepository, init_repository
+from app.config import CONFIG
+from app.db.main import get_session, async_engine
+from app.cache import feed_cache
+from app.services.news_buckets import news_bucket_store
+from app.services.digests import digest_store
+from app.db.partitions import maintain_article_partitions
+from app.repository import NewsRepository, init_repository, contruct_google_rss_urls
+from app.news_service.types import IngestItem
+from app.ai.components.vector_store import init_vector_store
+from app.ai.pipeline.index_articles import sync_article_vectors
+from app.ai.pipeline.summarize_articles import ArticleSummarizer
+from loguru import logger
 
 repo: NewsRepository = async_to_sync(init_repository)()
 
-async def _scrape_and_store_news():
-    async for session in get_session():
-        await repo.fetch_classify_and_save_articles(
-            session=session,
-            source="GOOGLE",
-            cutoff_hours=24,
-            commit_on_each=True,
-        )
+SOURCES = ("GOOGLE", "OPENAI", "ANTHROPIC", "HACKERNOON")
+
+
+# Ingestion runs as a task graph spread over the workers:
+#
+#   scrape_and_store_news        discovers the feeds of every source
+#   -> fetch_feed                one task per feed                  (chord)
+#   -> plan_ingestion            dedupes and clusters the entries into stories
+#   -> classify_chunk            chunks of whole stories            (chord, llm queue)
+#      -> scrape_chunk           scrapes and saves the same chunks  (playwright queue)
+#   -> finish_ingestion          refreshes the caches and queues the vector sync,
+#                                summaries and digests
+#
+# Items travel between the tasks as `IngestItem` JSON. Each chunk is saved by its own
+# task, so a failing chunk only loses its own articles and the bodies never leave the
+# worker which scraped them. The chunk tasks handle their errors per item,
+# `finish_ingestion` runs even when one of them fails.
+
+
+async def _discover_feeds(sources: List[str]) -> List[Tuple[str, str]]:
+    feeds = []
+    try:
+        for source in sources:
+            if source == "GOOGLE":
+                # The subcategories added since the worker started get their feed too
+                async for session in get_session():
+                    subcategory_ids = await repo.db.category_service.get_subcategory_column(
+                        column="subcategory_id", session=session
+                    )
+                rss_urls = await contruct_google_rss_urls(subcategory_ids=subcategory_ids)
+            else:
+                rss_urls = repo.get_service(source).scraper.rss_urls
+            feeds.extend((source, rss_url) for rss_url in rss_urls if rss_url)
+    finally:
+        await async_engine.dispose()
+    return feeds
 
 
 @app.task(name="celery_app.scrape_and_store_news")
-def scrape_and_store_news():
-    async_to_sync(_scrape_and_store_news)()
+def scrape_and_store_news(
+    sources: List[str] = SOURCES,
+    cutoff_hours: int = CONFIG.INGEST_CUTOFF_HOURS,
+    scrape_content: bool = True,
+):
+    feeds = async_to_sync(_discover_feeds)(list(sources))
+    logger.info(f"Fetching {len(feeds)} feeds of {', '.join(sources)}.")
+    chord(
+        [
+            fetch_feed_task.s(source=source, rss_url=rss_url, cutoff_hours=cutoff_hours)
+            for source, rss_url in feeds
+        ]
+    )(plan_ingestion_task.s(cutoff_hours=cutoff_hours, scrape_content=scrape_content))
+
+
+@app.task(name="celery_app.fetch_feed")
+def fetch_feed_task(source: str, rss_url: str, cutoff_hours: int):
+    """Returns [source, entry] pairs, a feed which can not be fetched has none."""
+    try:
+        entries = async_to_sync(repo.fetch_feed)(
+            source=source, rss_url=rss_url, cutoff_hours=cutoff_hours
+        )
+    except Exception as exc:
+        logger.error(f"Fetching {rss_url} failed: {exc}")
+        return []
+    return [[source, entry] for entry in entries]
+
+
+async def _plan_ingestion(
+    feeds_entries: List[List[Tuple[str, Dict]]], cutoff_hours: int
+) -> List[IngestItem]:
+    try:
+        async for session in get_session():
+            return await repo.plan_ingestion(
+                source_entries=[
+                    (source, entry) for entries in feeds_entries for source, entry in entries
+                ],
+                session=session,
+                cutoff_hours=cutoff_hours,
+            )
+    finally:
+        await async_engine.dispose()
+
+
+@app.task(name="celery_app.plan_ingestion")
+def plan_ingestion_task(
+    feeds_entries: List[List[Tuple[str, Dict]]], cutoff_hours: int, scrape_content: bool
+):
+    items = async_to_sync(_plan_ingestion)(feeds_entries, cutoff_hours)
+    pending = {(item.source, item.guid) for item in repo.pending_items(items)}
+    logger.info(f"{len(pending)} of {len(items)} new entries to classify and scrape.")
+    if not items:
+        return
+
+    # A story stays in one chunk, its duplicates copy the classification of the
+    # canonical article when they are saved
+    stories: Dict[str, List[IngestItem]] = defaultdict(list)
+    for item in items:
+        stories[item.cluster_id].append(item)
+    chunks: List[List[Dict]] = []
+    chunk, chunk_pending = [], 0
+    for story in stories.values():
+        story_pending = sum((item.source, item.guid) in pending for item in story)
+        if chunk and chunk_pending + story_pending > CONFIG.INGEST_CHUNK_SIZE:
+            chunks.append(chunk)
+            chunk, chunk_pending = [], 0
+        chunk.extend(item.model_dump(mode="json") for item in story)
+        chunk_pending += story_pending
+    chunks.append(chunk)
+
+    chord(
+        [
+            chain(
+                classify_chunk_task.s(chunk),
+                scrape_chunk_task.s(
+                    cutoff_hours=cutoff_hours, scrape_content=scrape_content
+                ),
+            )
+            for chunk in chunks
+        ]
+    )(finish_ingestion_task.s().on_error(ingestion_chunk_failed_task.s()))
+
+
+async def _classify_item(item: IngestItem):
+    try:
+        await repo.classify_item(item=item)
+    except Exception as exc:
+        logger.error(f"Classifying {item.guid} failed: {exc}")
+
+
+async def _classify_chunk(items: List[IngestItem]):
+    # The groq rate limiter spaces the requests of all workers
+    await asyncio.gather(*(_classify_item(item) for item in items))
+
+
+@app.task(name="celery_app.classify_chunk")
+def classify_chunk_task(chunk: List[Dict]):
+    items = [IngestItem.model_validate(item) for item in chunk]
+    async_to_sync(_classify_chunk)(items)
+    return [item.model_dump(mode="json") for item in items]
+
+
+async def _scrape_chunk(
+    items: List[IngestItem], cutoff_hours: int, scrape_content: bool
+) -> int:
+    # One browser at a time per task, the playwright workers' concurrency sets the rest
+    for item in items:
+        try:
+            await repo.scrape_item(item=item, scrape_content=scrape_content)
+        except Exception as exc:
+            logger.error(f"Scraping {item.guid} failed: {exc}")
+    try:
+        async for session in get_session():
+            return await repo.persist_items(
+                items=items, session=session, cutoff_hours=cutoff_hours
+            )
+    except Exception as exc:
+        logger.error(f"Saving {len(items)} entries failed: {exc}")
+        return 0
+    finally:
+        # async_to_sync runs every task on a new event loop, asyncpg connections can
+        # not be reused on the next one
+        await async_engine.dispose()
+
+
+@app.task(name="celery_app.scrape_chunk")
+def scrape_chunk_task(chunk: List[Dict], cutoff_hours: int, scrape_content: bool = True):
+    """Scrapes the classified articles of the chunk and saves it. Returns the number of
+    articles saved."""
+    items = [IngestItem.model_validate(item) for item in chunk]
+    return async_to_sync(_scrape_chunk)(items, cutoff_hours, scrape_content)
+
+
+async def _refresh_feeds():
+    try:
+        async for session in get_session():
+            await news_bucket_store.refresh(session=session)
+    except Exception as exc:
+        # The feeds are served from the database until the next refresh
+        logger.error(f"Refreshing the news buckets failed: {exc}")
+    finally:
+        await async_engine.dispose()
+    await feed_cache.bump_epoch()
+
+
+def _finish_ingestion():
+    async_to_sync(_refresh_feeds)()
+    # The rest is filled in the background, the feed does not wait for it
+    sync_article_vectors_task.delay()
+    summarize_articles_task.delay()
+    precompute_digests_task.delay()
+
+
+@app.task(name="celery_app.finish_ingestion")
+def finish_ingestion_task(saved: List[int]):
+    no_of_articles = sum(saved)
+    logger.info(f"Ingested {no_of_articles} articles.")
+    if no_of_articles:
+        _finish_ingestion()
+    return no_of_articles
+
+
+@app.task(name="celery_app.ingestion_chunk_failed")
+def ingestion_chunk_failed_task(request, exc, traceback):
+    """Error callback of the chord, e.g. a worker died or hit the time limit. The other
+    chunks saved their articles, the caches are refreshed for them."""
+    logger.error(f"An ingestion chunk failed: {exc}")
+    _finish_ingestion()
+
+
+async def _sync_article_vectors():
+    # The watermark keeps the articles missed here for the next run
+    try:
+        store = await init_vector_store()
+        async for session in get_session():
+            await sync_article_vectors(store=store, db=repo.db, session=session)
+    except Exception as exc:
+        logger.error(f"Syncing the article vectors failed: {exc}")
+    finally:
+        await async_engine.dispose()
+
+
+@app.task(name="celery_app.sync_article_vectors")
+def sync_article_vectors_task():
+    async_to_sync(_sync_article_vectors)()
+
+
+async def _precompute_digests():
+    try:
+        async for session in get_session():
+            await digest_store.refresh(session=session)
+    finally:
+        await async_engine.dispose()
+
+
+@app.task(name="celery_app.precompute_digests")
+def precompute_digests_task():
+    async_to_sync(_precompute_digests)()
+
+
+async def _summarize_articles():
+    try:
+        async for session in get_session():
+            await ArticleSummarizer(db=repo.db).run(session=session)
+    finally:
+        await async_engine.dispose()
+
+
+@app.task(name="celery_app.summarize_articles")
+def summarize_articles_task():
+    async_to_sync(_summarize_articles)()
+
+
+async def _maintain_article_partitions():
+    try:
+        async for session in get_session():
+            await maintain_article_partitions(session=session)
+    finally:
+        await async_engine.dispose()
+
+
+@app.task(name="celery_app.maintain_article_partitions")
+def maintain_article_partitions_task():
+    async_to_sync(_maintain_article_partitions)()
@@ -0,0 +1,280 @@
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config import CONFIG
+
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Redis]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_redis() -> Redis:
+    """Returns the redis client of the running event loop.
+
+    Celery tasks run their coroutines through `async_to_sync`, which can give each
+    call a new loop, and redis connections cannot be shared across loops.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = Redis.from_url(CONFIG.REDIS_URL or CONFIG.CELERY_BROKER_URL)
+        _clients[loop] = client
+    return client
+
+
+class DataVersions:
+    """Monotonic version counters of data that the API serves, kept in redis."""
+
+    CATALOGUE_KEY = "news:catalogue:version"
+
+    async def get(self, *keys: str) -> list[int] | None:
+        """Returns the versions of the given keys, None if redis is unavailable."""
+        try:
+            values = await get_redis().mget(keys)
+        except RedisError as exc:
+            logger.warning(f"Reading data versions failed: {exc}")
+            return None
+        return [int(value or 0) for value in values]
+
+    async def bump(self, key: str) -> int | None:
+        try:
+            return await get_redis().incr(key)
+        except RedisError as exc:
+            logger.warning(f"Bumping data version {key} failed: {exc}")
+            return None
+
+
+@dataclass(frozen=True)
+class FeedLookup:
+    """Result of a feed cache lookup. The versions are the ones current at lookup time
+    and must be passed back to `FeedCache.store` so a racing invalidation wins."""
+
+    epoch: int
+    version: int
+    day: str
+    payload: bytes | None = None
+
+
+class FeedCache:
+    """Two tier cache of the serialized `/news/get/news` response of each user.
+
+    An entry is valid for the ingestion epoch, the user's category-set version and the
+    UTC day it was built for. Ingestion bumps the epoch and category edits bump the
+    user version, so nothing has to be deleted. The in-process tier skips redis for
+    `local_ttl` seconds, which bounds how stale another worker's entry can get.
+
+    The user's subcategory ids are cached under the user version as well, a miss of
+    the feed served from the shared buckets then does not touch the database. Every
+    lookup that reaches redis records the user as active, the digest job precomputes
+    the entries of the active users after each ingestion (see app/services/digests.py).
+    """
+
+    EPOCH_KEY = "news:feed:epoch"
+    USER_VERSION_KEY = "news:feed:user-version:{user_id}"
+    FEED_KEY = "news:feed:{user_id}"
+    SUBCATEGORIES_KEY = "news:feed:user-subcategories:{user_id}"
+    ACTIVE_USERS_KEY = "news:digest:active"
+    RESPONSE_MESSAGE = "Returned News Successfully"
+
+    def __init__(
+        self,
+        local_ttl: int = CONFIG.FEED_CACHE_LOCAL_TTL_SECONDS,
+        redis_ttl: int = CONFIG.FEED_CACHE_REDIS_TTL_SECONDS,
+        max_local_entries: int = CONFIG.FEED_CACHE_LOCAL_MAX_ENTRIES,
+    ):
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self.max_local_entries = max_local_entries
+        self._local: OrderedDict[str, tuple[float, FeedLookup]] = OrderedDict()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).date().isoformat()
+
+    def _get_local(self, user_id: str, day: str) -> FeedLookup | None:
+        entry = self._local.get(user_id)
+        if entry is None:
+            return None
+        expires_at, lookup = entry
+        if expires_at < time.monotonic() or lookup.day != day:
+            self._local.pop(user_id, None)
+            return None
+        self._local.move_to_end(user_id)
+        return lookup
+
+    def _set_local(self, user_id: str, lookup: FeedLookup):
+        self._local[user_id] = (time.monotonic() + self.local_ttl, lookup)
+        self._local.move_to_end(user_id)
+        while len(self._local) > self.max_local_entries:
+            self._local.popitem(last=False)
+
+    async def lookup(self, user_id: str) -> FeedLookup:
+        """Returns the cached payload of the user, `payload` is None on a miss."""
+        day = self._today()
+        local = self._get_local(user_id, day)
+        if local is not None:
+            return local
+
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.mget(self.EPOCH_KEY, self.USER_VERSION_KEY.format(user_id=user_id))
+            pipe.hmget(
+                self.FEED_KEY.format(user_id=user_id), "epoch", "version", "day", "payload"
+            )
+            pipe.zadd(self.ACTIVE_USERS_KEY, {user_id: time.time()})
+            (
+                (epoch, version),
+                (c_epoch, c_version, c_day, payload),
+                _,
+            ) = await pipe.execute()
+        except RedisError as exc:
+            logger.warning(f"Feed cache lookup failed: {exc}")
+            return FeedLookup(epoch=-1, version=-1, day=day)
+
+        lookup = FeedLookup(epoch=int(epoch or 0), version=int(version or 0), day=day)
+        if (
+            payload is not None
+            and int(c_epoch) == lookup.epoch
+            and int(c_version) == lookup.version
+            and c_day.decode() == day
+        ):
+            lookup = FeedLookup(lookup.epoch, lookup.version, day, payload)
+            self._set_local(user_id, lookup)
+        return lookup
+
+    def _store_entry(self, pipe, user_id: str, entry: FeedLookup):
+        key = self.FEED_KEY.format(user_id=user_id)
+        pipe.hset(
+            key,
+            mapping={
+                "epoch": entry.epoch,
+                "version": entry.version,
+                "day": entry.day,
+                "payload": entry.payload,
+            },
+        )
+        pipe.expire(key, self.redis_ttl)
+
+    async def store(self, user_id: str, payload: bytes, lookup: FeedLookup):
+        """Stores the payload built after the given (missed) lookup."""
+        if lookup.epoch < 0:
+            return
+        entry = FeedLookup(lookup.epoch, lookup.version, lookup.day, payload)
+        self._set_local(user_id, entry)
+        try:
+            pipe = get_redis().pipeline(transaction=True)
+            self._store_entry(pipe, user_id, entry)
+            await pipe.execute()
+        except RedisError as exc:
+            logger.warning(f"Feed cache store failed: {exc}")
+
+    async def store_many(self, entries: Dict[str, FeedLookup]):
+        """Stores precomputed entries by user id, in redis only. Each entry carries the
+        epoch and user version read before its payload was built."""
+        pipe = get_redis().pipeline(transaction=False)
+        for user_id, entry in entries.items():
+            self._store_entry(pipe, user_id, entry)
+        await pipe.execute()
+
+    async def get_subcategories(self, user_id: str, version: int) -> List[str] | None:
+        """Returns the user's subcategory ids cached for the given user version, None on
+        a miss."""
+        if version < 0:
+            return None
+        try:
+            cached = await get_redis().get(self.SUBCATEGORIES_KEY.format(user_id=user_id))
+        except RedisError as exc:
+            logger.warning(f"Subcategories cache lookup failed: {exc}")
+            return None
+        if cached is None:
+            return None
+        cached_version, _, subcategory_ids = cached.decode().partition(":")
+        if int(cached_version) != version:
+            return None
+        return subcategory_ids.split(",") if subcategory_ids else []
+
+    async def store_subcategories(
+        self, user_id: str, version: int, subcategory_ids: List[str]
+    ):
+        """Stores the subcategory ids read after the user version was read. An edit in
+        between moved the version past it, so the entry is never served."""
+        if version < 0:
+            return
+        try:
+            await get_redis().set(
+                self.SUBCATEGORIES_KEY.format(user_id=user_id),
+                f"{version}:{','.join(subcategory_ids)}",
+                ex=self.redis_ttl,
+            )
+        except RedisError as exc:
+            logger.warning(f"Subcategories cache store failed: {exc}")
+
+    async def invalidate_user(self, user_id: str):
+        """Call after the user's categories change."""
+        self._local.pop(user_id, None)
+        try:
+            await get_redis().incr(self.USER_VERSION_KEY.format(user_id=user_id))
+        except RedisError as exc:
+            logger.warning(f"Feed cache invalidation failed for {user_id}: {exc}")
+
+    async def bump_epoch(self):
+        """Call after ingestion stored new articles, invalidates the feed of every user."""
+        self._local.clear()
+        try:
+            await get_redis().incr(self.EPOCH_KEY)
+        except RedisError as exc:
+            logger.warning(f"Feed cache epoch bump failed: {exc}")
+
+
+class SummaryCache:
+    """LLM summaries by content hash, see app/ai/pipeline/summarize_articles.py. A redis
+    failure is a cache miss."""
+
+    KEY = "news:summary:{content_hash}"
+
+    def __init__(
+        self, key: str = KEY, ttl: int = CONFIG.SUMMARY_CACHE_TTL_SECONDS
+    ):
+        self.key = key
+        self.ttl = ttl
+
+    async def get_many(self, content_hashes: List[str]) -> Dict[str, str]:
+        if not content_hashes:
+            return {}
+        try:
+            values = await get_redis().mget(
+                [self.key.format(content_hash=h) for h in content_hashes]
+            )
+        except RedisError as exc:
+            logger.warning(f"Summary cache lookup failed: {exc}")
+            return {}
+        return {
+            content_hash: value.decode()
+            for content_hash, value in zip(content_hashes, values)
+            if value is not None
+        }
+
+    async def set_many(self, summaries: Dict[str, str]):
+        if not summaries:
+            return
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for content_hash, summary in summaries.items():
+                pipe.set(self.key.format(content_hash=content_hash), summary, ex=self.ttl)
+            await pipe.execute()
+        except RedisError as exc:
+            logger.warning(f"Summary cache write failed: {exc}")
+
+
+data_versions = DataVersions()
+feed_cache = FeedCache()
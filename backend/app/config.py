@@ -1,7 +1,28 @@
+from typing import Dict, Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Config(BaseSettings):
     DATABASE_URL: str
+    # "api" for the web app, start celery workers with DB_POOL_PROFILE=worker
+    DB_POOL_PROFILE: Literal["api", "worker"] = "api"
+    DB_API_POOL_SIZE: int = 10
+    DB_API_MAX_OVERFLOW: int = 20
+    DB_API_POOL_TIMEOUT_SECONDS: float = 5
+    DB_WORKER_POOL_SIZE: int = 2
+    DB_WORKER_MAX_OVERFLOW: int = 2
+    DB_WORKER_POOL_TIMEOUT_SECONDS: float = 60
+    DB_POOL_RECYCLE_SECONDS: int = 30 * 60
+    DB_POOL_PRE_PING: bool = True
+    # Prepared statements cached per asyncpg connection, 0 disables the cache
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Set when DATABASE_URL points to PgBouncer (or another pooler) in transaction mode,
+    # see backend/README.md
+    DB_PGBOUNCER: bool = False
+
+    # Comma separated URLs of streaming replicas serving read-only endpoints
+    DATABASE_REPLICA_URLS: str = ""
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5
+    DB_REPLICA_CHECK_INTERVAL_SECONDS: float = 2
     IS_DEV: bool
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str
@@ -11,11 +32,86 @@ class Config(BaseSettings):
     CELERY_BROKER_URL: str
     CELERY_RESULT_BACKEND: str
 
+    # Falls back to CELERY_BROKER_URL when not given.
+    REDIS_URL: str | None = None
+    FEED_CACHE_LOCAL_TTL_SECONDS: int = 10
+    FEED_CACHE_REDIS_TTL_SECONDS: int = 6 * 60 * 60
+    FEED_CACHE_LOCAL_MAX_ENTRIES: int = 10_000
+
+    CATEGORY_CATALOGUE_MAX_AGE_SECONDS: int = 5 * 60
+
+    # Monthly partitions of the articles table, see app/db/partitions.py
+    ARTICLES_PARTITIONS_AHEAD_MONTHS: int = 3
+    ARTICLES_RETENTION_MONTHS: int = 12
+
+    # "zstd" stores new article bodies compressed, see app/content_codec.py
+    CONTENT_COMPRESSION: Literal["none", "zstd"] = "none"
+    CONTENT_COMPRESSION_LEVEL: int = 9
+    # Comma separated trained dictionary files, the first one compresses new bodies
+    CONTENT_ZSTD_DICTIONARIES: str = ""
+
+    # Search only looks this far back by default, older partitions are pruned
+    SEARCH_LOOKBACK_DAYS: int = 90
+    SEARCH_MAX_LOOKBACK_DAYS: int = 730
+
+    # Ingestion task graph, see app/background_tasks/tasks.py
+    INGEST_CUTOFF_HOURS: int = 24
+    # Entries to classify and scrape per chunk task, a story is never split
+    INGEST_CHUNK_SIZE: int = 5
+
+    # Near-duplicate articles of this window join the same story, see
+    # app/news_service/components/story_clusters.py
+    STORY_CLUSTER_THRESHOLD: float = 0.5
+    STORY_CLUSTER_WINDOW_HOURS: int = 72
+
+    # Background summaries of the scraped articles, see
+    # app/ai/pipeline/summarize_articles.py
+    SUMMARY_LOOKBACK_HOURS: int = 72
+    SUMMARY_BATCH_INPUT_TOKENS: int = 5_000
+    SUMMARY_BATCH_MAX_ARTICLES: int = 8
+    SUMMARY_ARTICLE_MAX_TOKENS: int = 1_500
+    SUMMARY_TOKENS_PER_ARTICLE: int = 160
+    SUMMARY_CACHE_TTL_SECONDS: int = 30 * 24 * 60 * 60
+    # Longer bodies are summarized chunk by chunk, see app/ai/pipeline/chunked_summary.py
+    SUMMARY_CHUNK_TOKENS: int = 2_000
+    SUMMARY_CHUNK_MIN_TOKENS: int = 300
+    SUMMARY_CHUNK_CONCURRENCY: int = 4
+
+    # Digests of the users seen in the last days are precomputed after every
+    # ingestion, see app/services/digests.py
+    DIGEST_ARTICLES_PER_SUBCATEGORY: int = 10
+    DIGEST_ACTIVE_DAYS: int = 14
+    DIGEST_TTL_SECONDS: int = 2 * 24 * 60 * 60
+
+    FEED_LOOKBACK_HOURS: int = 48
+    FEED_MAX_LOOKBACK_HOURS: int = 7 * 24
+    FEED_DEFAULT_PAGE_SIZE: int = 20
+    FEED_MAX_PAGE_SIZE: int = 100
+    # Relevance ranking of today's feed, see app/services/ranking.py
+    FEED_TOP_K: int = 100
+    FEED_RECENCY_HALF_LIFE_HOURS: float = 12.0
+    FEED_CLUSTER_SIZE_WEIGHT: float = 0.5
+    FEED_SOURCE_WEIGHTS: Dict[str, float] = {
+        "GOOGLE": 1.0,
+        "ANTHROPIC": 1.2,
+        "OPENAI": 1.2,
+        "HACKERNOON": 0.8,
+    }
+
     PINECONE_API_KEY: str
     PINECONE_HOST: str
+    # "fake" keeps the article vectors in memory, see app/ai/components/vector_store.py
+    VECTOR_STORE: Literal["pinecone", "fake"] = "pinecone"
+    SEMANTIC_SEARCH_MAX_RESULTS: int = 50
 
 
     GROQ_API_KEY: str
+    # Limits of the groq organisation shared by all workers, see
+    # app/ai/components/rate_limit.py
+    GROQ_REQUESTS_PER_MINUTE: int = 30
+    GROQ_TOKENS_PER_MINUTE: int = 8_000
+    # Reserved for the completion when the call sets no max_tokens
+    GROQ_COMPLETION_TOKENS_ESTIMATE: int = 1_024
 
     ANTHROPIC_RSS_URLS: str
     OPENAI_RSS_URLS: str
@@ -0,0 +1,232 @@
+"""Optional compression of the scraped markdown stored in `article_contents`.
+
+With `CONTENT_COMPRESSION=zstd` new bodies are stored zstd compressed in
+`markdown_compressed` and `content_codec` names how to decode them: "zstd" or
+"zstd:{dictionary_id}" when compressed with a trained dictionary. Rows written before,
+or with compression off, keep plain `markdown_content`. Reading goes through `decode`
+which handles both, so the setting can be switched at any time.
+
+zstandard is an optional dependency: pip install "ainewsaggregator[compression]".
+
+News pages share a lot of boilerplate which a dictionary trained on past articles
+captures, see the `train` and `bench` commands below:
+
+    python -m app.content_codec train dictionaries/news-v1.zdict
+    python -m app.content_codec bench dictionaries/news-v1.zdict
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List
+
+from app.config import CONFIG
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class ContentCodecError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class EncodedContent:
+    """Column values of `ArticleContents` for one markdown body."""
+
+    markdown_content: str | None
+    markdown_compressed: bytes | None = None
+    content_codec: str | None = None
+
+    def as_columns(self) -> dict:
+        return {
+            "markdown_content": self.markdown_content,
+            "markdown_compressed": self.markdown_compressed,
+            "content_codec": self.content_codec,
+        }
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ContentCodecError(
+            "zstandard is not installed, "
+            'pip install "ainewsaggregator[compression]" or set CONTENT_COMPRESSION=none'
+        )
+
+
+def load_dictionary(path: str) -> "zstandard.ZstdCompressionDict":
+    _require_zstandard()
+    with open(path, "rb") as f:
+        return zstandard.ZstdCompressionDict(f.read())
+
+
+class ContentCodec:
+    """Encodes markdown for storage and decodes it back.
+
+    `dictionaries` are all the dictionaries rows may have been compressed with, the
+    first one is used to compress new rows. Retired dictionaries have to stay listed
+    as long as rows compressed with them exist.
+    """
+
+    def __init__(
+        self,
+        compression: str = CONFIG.CONTENT_COMPRESSION,
+        level: int = CONFIG.CONTENT_COMPRESSION_LEVEL,
+        dictionary_paths: List[str] | None = None,
+    ):
+        self.compression = compression
+        self.level = level
+        self.dictionaries: Dict[int, "zstandard.ZstdCompressionDict"] = {}
+        self.current_dictionary = None
+
+        if dictionary_paths is None:
+            dictionary_paths = [
+                path.strip()
+                for path in CONFIG.CONTENT_ZSTD_DICTIONARIES.split(",")
+                if path.strip()
+            ]
+        for path in dictionary_paths:
+            dictionary = load_dictionary(path)
+            self.dictionaries[dictionary.dict_id()] = dictionary
+            if self.current_dictionary is None:
+                self.current_dictionary = dictionary
+
+        if self.compression == "zstd":
+            _require_zstandard()
+        # zstd (de)compressor objects are not thread safe, they are cheap to create
+        # per call compared to the dictionary which is digested once here.
+        if self.current_dictionary is not None:
+            self.current_dictionary.precompute_compress(level=self.level)
+
+    def encode(self, markdown: str | None) -> EncodedContent:
+        if markdown is None or self.compression != "zstd":
+            return EncodedContent(markdown_content=markdown)
+        compressor = zstandard.ZstdCompressor(
+            level=self.level, dict_data=self.current_dictionary
+        )
+        codec = (
+            f"zstd:{self.current_dictionary.dict_id()}"
+            if self.current_dictionary is not None
+            else "zstd"
+        )
+        return EncodedContent(
+            markdown_content=None,
+            markdown_compressed=compressor.compress(markdown.encode()),
+            content_codec=codec,
+        )
+
+    def decode(
+        self,
+        markdown_content: str | None,
+        markdown_compressed: bytes | None,
+        content_codec: str | None,
+    ) -> str | None:
+        if content_codec is None or markdown_compressed is None:
+            return markdown_content
+        name, _, dictionary_id = content_codec.partition(":")
+        if name != "zstd":
+            raise ContentCodecError(f"Unknown content codec {content_codec}.")
+        _require_zstandard()
+        dictionary = None
+        if dictionary_id:
+            dictionary = self.dictionaries.get(int(dictionary_id))
+            if dictionary is None:
+                raise ContentCodecError(
+                    f"Dictionary {dictionary_id} is not in CONTENT_ZSTD_DICTIONARIES."
+                )
+        decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return decompressor.decompress(bytes(markdown_compressed)).decode()
+
+
+def train_dictionary(samples: List[str], size: int = 112_640) -> bytes:
+    """Trains a zstd dictionary on markdown bodies, a few thousand samples are enough."""
+    _require_zstandard()
+    return zstandard.train_dictionary(
+        size, [sample.encode() for sample in samples]
+    ).as_bytes()
+
+
+content_codec = ContentCodec()
+
+
+if __name__ == "__main__":
+    import asyncio
+    import random
+    import sys
+    import time
+
+    from sqlalchemy import select
+
+    from app.db.main import get_session
+    from app.db.schemas import ArticleContents
+
+    async def load_samples(limit: int) -> List[str]:
+        codec = ContentCodec(compression="none")
+        async for session in get_session():
+            rows = await session.execute(
+                select(
+                    ArticleContents.markdown_content,
+                    ArticleContents.markdown_compressed,
+                    ArticleContents.content_codec,
+                )
+                .where(
+                    (ArticleContents.markdown_content.is_not(None))
+                    | (ArticleContents.markdown_compressed.is_not(None))
+                )
+                .order_by(ArticleContents.published_on.desc())
+                .limit(limit)
+            )
+            return [codec.decode(*row) for row in rows.all()]
+
+    def split(samples: List[str]) -> tuple[List[str], List[str]]:
+        """Training samples and the held out fifth the benchmark runs on, a dictionary
+        must not be measured on the samples it was trained on."""
+        samples = sorted(samples)
+        random.Random(0).shuffle(samples)
+        held_out = max(1, len(samples) // 5)
+        return samples[held_out:], samples[:held_out]
+
+    def bench(samples: List[str], dictionary_path: str | None):
+        """Compares storage size and CPU time of zstd without and with a dictionary."""
+        _, held_out = split(samples)
+        raw_bytes = sum(len(sample.encode()) for sample in held_out)
+        print(f"{len(held_out)} articles, {raw_bytes / 1024:.0f} KiB of markdown")
+
+        codecs = {"zstd": ContentCodec(compression="zstd", dictionary_paths=[])}
+        if dictionary_path:
+            codecs["zstd+dict"] = ContentCodec(
+                compression="zstd", dictionary_paths=[dictionary_path]
+            )
+        for level in (3, 9, 19):
+            for name, codec in codecs.items():
+                codec.level = level
+                if codec.current_dictionary is not None:
+                    codec.current_dictionary.precompute_compress(level=level)
+                started = time.perf_counter()
+                encoded = [codec.encode(sample) for sample in held_out]
+                encode_seconds = time.perf_counter() - started
+                started = time.perf_counter()
+                for item in encoded:
+                    codec.decode(*item.as_columns().values())
+                decode_seconds = time.perf_counter() - started
+                stored = sum(len(item.markdown_compressed) for item in encoded)
+                print(
+                    f"{name:<10} level {level:>2}  ratio {raw_bytes / stored:5.2f}  "
+                    f"encode {encode_seconds / len(held_out) * 1e6:7.1f} us/article  "
+                    f"decode {decode_seconds / len(held_out) * 1e6:6.1f} us/article"
+                )
+
+    command, *args = sys.argv[1:] or ["bench"]
+    samples = asyncio.run(load_samples(limit=5_000))
+    if not samples:
+        sys.exit("No scraped articles in the database.")
+    if command == "train":
+        training, _ = split(samples)
+        dictionary = train_dictionary(training)
+        with open(args[0], "wb") as f:
+            f.write(dictionary)
+        print(f"Trained a {len(dictionary)} byte dictionary on {len(training)} articles.")
+    elif command == "bench":
+        bench(samples, dictionary_path=args[0] if args else None)
+    else:
+        sys.exit(f"Unknown command {command}, use train or bench.")
@@ -0,0 +1,90 @@
+"""Regression check of the feed query plan, run against a migrated database:
+
+    python -m app.db._explain_feed_plan
+
+Fails when the articles side of the feed query stops being an index or index-only scan
+on the covering index, e.g. after projecting a column the index does not include, or
+when it scans a monthly partition older than the current month.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.main import get_session
+from app.db.partitions import PARTITION_NAME, month_start
+from app.services.ai_news_service import NewsDBService
+
+FEED_INDEX = "idx_articles_subcategory_published"
+ALLOWED_SCANS = ("Index Only Scan", "Index Scan")
+
+
+class FeedPlanRegression(Exception):
+    pass
+
+
+async def feed_index_names(session: AsyncSession) -> set[str]:
+    """Returns the name of the feed index and of its per partition indexes."""
+    result = await session.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:index AS regclass)"
+        ),
+        {"index": FEED_INDEX},
+    )
+    return {FEED_INDEX, *result.scalars().all()}
+
+
+async def explain_feed_plan(session: AsyncSession) -> list[str]:
+    """Returns the plan lines of the feed query. Sequential scans are disabled for the
+    transaction so a tiny dev table still reports which index the query can use."""
+    statement = NewsDBService.today_news_statement(user_id=str(uuid.uuid4()))
+    compiled = statement.compile(
+        dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}
+    )
+    async with session.begin():
+        await session.execute(text("SET LOCAL enable_seqscan = off"))
+        result = await session.execute(text(f"EXPLAIN {compiled}"))
+        return [row[0] for row in result.all()]
+
+
+def check_feed_plan(plan: list[str], index_names: set[str]):
+    """Raises FeedPlanRegression unless the feed index is scanned with an allowed node
+    and no partition older than the current month is scanned."""
+    current_month = month_start(datetime.now(timezone.utc))
+    for line in plan:
+        for word in line.replace("(", " ").replace(")", " ").split():
+            match = PARTITION_NAME.match(word)
+            if match and (int(match[1]), int(match[2])) < (
+                current_month.year,
+                current_month.month,
+            ):
+                raise FeedPlanRegression(
+                    f"Feed query scans the old partition {word}:\n" + "\n".join(plan)
+                )
+
+    for line in plan:
+        if any(name in line for name in index_names) and any(
+            scan in line for scan in ALLOWED_SCANS
+        ):
+            return
+    raise FeedPlanRegression(
+        f"Feed query does not use {' / '.join(ALLOWED_SCANS)} on {FEED_INDEX}:\n"
+        + "\n".join(plan)
+    )
+
+
+if __name__ == "__main__":
+
+    async def main():
+        async for session in get_session():
+            index_names = await feed_index_names(session=session)
+            await session.commit()
+            plan = await explain_feed_plan(session=session)
+        print("\n".join(plan))
+        check_feed_plan(plan, index_names=index_names)
+        print("\nFeed plan OK.")
+
+    asyncio.run(main())
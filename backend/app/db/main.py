@@ -1,14 +1,88 @@
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator
+from uuid import uuid4
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.ext.asyncio import AsyncSession
 from ..config import CONFIG
+from .pool_metrics import MeteredQueuePool, pool_metrics
+from .replicas import ReplicaRouter
 
 Base = declarative_base()
 
+
+@dataclass(frozen=True)
+class PoolProfile:
+    pool_size: int
+    max_overflow: int
+    timeout: float
+
+
+# The API serves many short requests and fails fast when the pool is exhausted, the
+# celery workers hold few long ingestion transactions and rather wait for a connection.
+POOL_PROFILES = {
+    "api": PoolProfile(
+        pool_size=CONFIG.DB_API_POOL_SIZE,
+        max_overflow=CONFIG.DB_API_MAX_OVERFLOW,
+        timeout=CONFIG.DB_API_POOL_TIMEOUT_SECONDS,
+    ),
+    "worker": PoolProfile(
+        pool_size=CONFIG.DB_WORKER_POOL_SIZE,
+        max_overflow=CONFIG.DB_WORKER_MAX_OVERFLOW,
+        timeout=CONFIG.DB_WORKER_POOL_TIMEOUT_SECONDS,
+    ),
+}
+pool_profile = POOL_PROFILES[CONFIG.DB_POOL_PROFILE]
+
+
+def asyncpg_connect_args(pgbouncer: bool = CONFIG.DB_PGBOUNCER) -> dict:
+    """Statement cache settings of asyncpg connections.
+
+    Behind a transaction mode pooler consecutive transactions can run on different
+    server connections, so statements prepared on one are missing on the next. Both
+    caches are then disabled and every prepared statement gets a unique name, so two
+    clients sharing a server connection never collide on the name.
+    """
+    if pgbouncer:
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return {
+        # asyncpg's own statement cache and the one of the SQLAlchemy asyncpg dialect
+        "statement_cache_size": CONFIG.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": CONFIG.DB_STATEMENT_CACHE_SIZE,
+    }
+
+
+engine_options = dict(
+    pool_size=pool_profile.pool_size,
+    max_overflow=pool_profile.max_overflow,
+    pool_timeout=pool_profile.timeout,
+    pool_recycle=CONFIG.DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=CONFIG.DB_POOL_PRE_PING,
+    connect_args=asyncpg_connect_args(),
+)
+
 # Async engine
 async_engine = create_async_engine(
-    url=CONFIG.DATABASE_URL
+    url=CONFIG.DATABASE_URL, poolclass=MeteredQueuePool, **engine_options
+)
+pool_metrics.attach(async_engine)
+
+# Read replicas, only used through the read sessions below
+replica_router = ReplicaRouter(
+    engines=[
+        create_async_engine(url=url.strip(), **engine_options)
+        for url in CONFIG.DATABASE_REPLICA_URLS.split(",")
+        if url.strip()
+    ],
+    max_lag=CONFIG.DB_REPLICA_MAX_LAG_SECONDS,
+    check_interval=CONFIG.DB_REPLICA_CHECK_INTERVAL_SECONDS,
 )
+
 # Async Session
 Session = sessionmaker(
     bind=async_engine,
@@ -21,3 +95,22 @@ async def get_session():
     async with Session() as session:
         yield session
 
+
+@asynccontextmanager
+async def read_session() -> AsyncIterator[AsyncSession]:
+    """Session for read-only work, bound to a replica that is not lagging or to the
+    primary. `session.info["replica"]` tells which, reads that must see the caller's
+    own recent writes can retry on the primary when a replica returned nothing."""
+    engine = await replica_router.pick()
+    if engine is None:
+        async with Session(info={"replica": False}) as session:
+            yield session
+    else:
+        async with Session(bind=engine, info={"replica": True}) as session:
+            yield session
+
+
+# Dependency for FastAPI, read-only endpoints
+async def get_read_session():
+    async with read_session() as session:
+        yield session
@@ -0,0 +1,176 @@
+"""Monthly range partitions of the articles and article_contents tables.
+
+Partitions are named `{table}_pYYYY_MM` and hold the rows published in that UTC month.
+`{table}_default` catches rows outside every partition (e.g. a feed entry dated years
+back). The maintenance job keeps `months_ahead` partitions ready and moves partitions
+older than the retention out of the tables into the archive schema.
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import List
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import CONFIG
+
+
+PARENT_TABLE = "articles"
+# Partitioned in lockstep, archived in this order
+PARTITIONED_TABLES = ("article_contents", "articles")
+ARCHIVE_SCHEMA = "archive"
+PARTITION_NAME = re.compile(r"^articles_p(\d{4})_(\d{2})$")
+
+
+@dataclass
+class PartitionMaintenanceResult:
+    created: List[str] = field(default_factory=list)
+    archived: List[str] = field(default_factory=list)
+
+
+def month_start(value: date | datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date, table: str = PARENT_TABLE) -> str:
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+
+def _bound(month: date) -> str:
+    return f"{month.isoformat()} 00:00:00+00"
+
+
+async def list_partitions(
+    session: AsyncSession, table: str = PARENT_TABLE
+) -> List[date]:
+    """Returns the months of the monthly partitions attached to the table."""
+    result = await session.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:parent AS regclass)"
+        ),
+        {"parent": table},
+    )
+    pattern = re.compile(rf"^{table}_p(\d{{4}})_(\d{{2}})$")
+    months = []
+    for (name,) in result.all():
+        match = pattern.match(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+async def _stored_columns(session: AsyncSession, table: str) -> str:
+    """Column list of the table without its generated columns, which can't be
+    inserted into."""
+    result = await session.execute(
+        text(
+            "SELECT attname FROM pg_attribute "
+            "WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 "
+            "AND NOT attisdropped AND attgenerated = '' ORDER BY attnum"
+        ),
+        {"table": table},
+    )
+    return ", ".join(f'"{name}"' for (name,) in result.all())
+
+
+async def create_partition(
+    session: AsyncSession, month: date, table: str = PARENT_TABLE
+):
+    """Creates the partition of the given month.
+
+    Rows of that month that landed in the default partition are moved out first, the
+    partition can't be created while the default one holds rows of its range. It is
+    created with `PARTITION OF`, so it gets the parent's indexes and generated columns
+    (`LIKE` drops the generation expressions and the attach would then be rejected).
+    """
+    name = partition_name(month, table)
+    start, end = _bound(month), _bound(add_months(month, 1))
+    columns = await _stored_columns(session=session, table=table)
+    in_month = f"published_on >= '{start}' AND published_on < '{end}'"
+    await session.execute(text("SET LOCAL lock_timeout = '5s'"))
+    # No row of the month can reach the default partition until it is created
+    await session.execute(text(f"LOCK TABLE {table}_default IN EXCLUSIVE MODE"))
+    await session.execute(
+        text(
+            f"CREATE TEMPORARY TABLE {name}_moved ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {table}_default WHERE {in_month}"
+        )
+    )
+    await session.execute(text(f"DELETE FROM {table}_default WHERE {in_month}"))
+    await session.execute(
+        text(
+            f"CREATE TABLE {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+    )
+    await session.execute(
+        text(f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {name}_moved")
+    )
+
+
+async def archive_partition(
+    session: AsyncSession, month: date, table: str = PARENT_TABLE
+):
+    """Detaches the partition of the given month and moves it to the archive schema,
+    where it can be dumped and dropped independently of the live table."""
+    name = partition_name(month, table)
+    await session.execute(text("SET LOCAL lock_timeout = '5s'"))
+    await session.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+    await session.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+    await session.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+
+
+async def maintain_article_partitions(
+    session: AsyncSession,
+    months_ahead: int = CONFIG.ARTICLES_PARTITIONS_AHEAD_MONTHS,
+    retention_months: int = CONFIG.ARTICLES_RETENTION_MONTHS,
+) -> PartitionMaintenanceResult:
+    """Creates the missing partitions up to `months_ahead` months from now and archives
+    the ones that ended more than `retention_months` months ago. Each partition change
+    is its own transaction, a failing one is retried on the next run."""
+    result = PartitionMaintenanceResult()
+    current = month_start(datetime.now(timezone.utc))
+    oldest_kept = add_months(current, -retention_months)
+
+    for table in PARTITIONED_TABLES:
+        existing = set(await list_partitions(session=session, table=table))
+        await session.commit()
+
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if month in existing:
+                continue
+            name = partition_name(month, table)
+            try:
+                await create_partition(session=session, month=month, table=table)
+                await session.commit()
+                result.created.append(name)
+            except Exception as exc:
+                await session.rollback()
+                logger.error(f"Creating partition {name} failed: {exc}")
+
+        for month in sorted(existing):
+            if month >= oldest_kept:
+                break
+            name = partition_name(month, table)
+            try:
+                await archive_partition(session=session, month=month, table=table)
+                await session.commit()
+                result.archived.append(name)
+            except Exception as exc:
+                await session.rollback()
+                logger.error(f"Archiving partition {name} failed: {exc}")
+
+    logger.info(
+        f"Article partitions created: {result.created}, archived: {result.archived}"
+    )
+    return result
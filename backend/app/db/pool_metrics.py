@@ -0,0 +1,114 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolMetrics:
+    """Counters of the engine's connection pool.
+
+    Checkout waits are timed by `MeteredQueuePool`, the rest comes from pool events.
+    Values are process local, every API and celery worker process reports its own pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.checked_out = 0
+            self.peak_checked_out = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait_seconds_total = self.wait_seconds_total + seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts = self.timeouts + 1
+
+    def attach(self, engine: AsyncEngine):
+        """Listens to the pool events of the engine."""
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                self.connects = self.connects + 1
+
+        @event.listens_for(sync_engine, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._lock:
+                self.checkouts = self.checkouts + 1
+                self.checked_out = self.checked_out + 1
+                self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+        @event.listens_for(sync_engine, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            with self._lock:
+                self.checkins = self.checkins + 1
+                self.checked_out = max(0, self.checked_out - 1)
+
+        @event.listens_for(sync_engine, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                self.invalidations = self.invalidations + 1
+
+    def snapshot(self, engine: AsyncEngine, profile: str) -> dict:
+        pool = engine.pool
+        with self._lock:
+            # Timed out checkouts waited too
+            attempts = self.checkouts + self.timeouts
+            data = {
+                "profile": profile,
+                "pool_class": type(pool).__name__,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "peak_checked_out": self.peak_checked_out,
+                "wait_ms_avg": (
+                    self.wait_seconds_total / attempts * 1000 if attempts else 0.0
+                ),
+                "wait_ms_max": self.wait_seconds_max * 1000,
+            }
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            data.update(
+                pool_size=pool.size(),
+                max_overflow=pool._max_overflow,
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                # Negative until the pool has opened `pool_size` connections
+                overflow=max(0, pool.overflow()),
+            )
+        return data
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """`AsyncAdaptedQueuePool` timing how long each checkout waits for a connection,
+    including the connect time of new connections."""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - started)
@@ -0,0 +1,83 @@
+import asyncio
+import itertools
+import math
+import time
+from dataclasses import dataclass
+from typing import List
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+# Seconds the replica is behind the primary, 0 when it replayed everything it received.
+# pg_last_xact_replay_timestamp alone grows while the primary is idle. A replica that
+# is not streaming also replayed everything it received but is cut off from the
+# primary, it counts as infinitely behind. Seeing the wal receiver status takes the
+# pg_read_all_stats role.
+REPLICATION_LAG_STATEMENT = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming'
+        ) THEN CAST('Infinity' AS double precision)
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+    """
+)
+
+
+@dataclass
+class Replica:
+    engine: AsyncEngine
+    lag: float = math.inf
+    checked_at: float = -math.inf
+
+
+class ReplicaRouter:
+    """Picks the replica engine a read-only session is bound to.
+
+    Replicas are used round robin. The replication lag of each one is sampled at most
+    every `check_interval` seconds, replicas lagging more than `max_lag` seconds or
+    failing the check are skipped until the next sample. `pick` returns None when no
+    replica qualifies and the caller reads from the primary.
+    """
+
+    def __init__(
+        self, engines: List[AsyncEngine], max_lag: float, check_interval: float
+    ):
+        self.replicas = [Replica(engine=engine) for engine in engines]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._next = itertools.cycle(range(len(self.replicas)))
+
+    async def _check_lag(self, replica: Replica):
+        replica.checked_at = time.monotonic()
+        try:
+            # The check runs on the request path, an unreachable replica must not stall it
+            async with asyncio.timeout(self.check_interval):
+                async with replica.engine.connect() as connection:
+                    result = await connection.execute(REPLICATION_LAG_STATEMENT)
+                    replica.lag = float(result.scalar_one())
+        except Exception as exc:
+            replica.lag = math.inf
+            logger.warning(f"Replica {replica.engine.url.host} check failed: {exc}")
+            return
+        if replica.lag > self.max_lag:
+            logger.warning(
+                f"Replica {replica.engine.url.host} lags {replica.lag:.1f}s, "
+                f"reading from the primary."
+            )
+
+    async def pick(self) -> AsyncEngine | None:
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._next)]
+            if time.monotonic() - replica.checked_at >= self.check_interval:
+                await self._check_lag(replica)
+            if replica.lag <= self.max_lag:
+                return replica.engine
+        return None
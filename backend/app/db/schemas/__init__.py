@@ -1,9 +1,10 @@
-from app.db.schemas.ai_news_service import Articles, Source
+from app.db.schemas.ai_news_service import Articles, ArticleContents, Source
 from app.db.schemas.core import Users, Category, SubCategory, UserCategory, UserSubCategory
 
 
 __all__ = [
     "Articles",
+    "ArticleContents",
     "Source",
     "Users",
     "Category",
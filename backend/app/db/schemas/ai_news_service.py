@@ -1,5 +1,5 @@
-from sqlalchemy.orm import mapped_column, Mapped
-from sqlalchemy import ForeignKey, Index, Enum
+from sqlalchemy.orm import mapped_column, Mapped, relationship
+from sqlalchemy import ForeignKey, Index, Enum, Computed, func, text
 import sqlalchemy.dialects.postgresql as pg
 from typing import Optional
 import enum
@@ -7,6 +7,12 @@ import enum
 from app.db.main import Base
 
 
+# Text search configuration of the search vectors, changing it needs a migration
+SEARCH_LANGUAGE = "english"
+# to_tsvector fails on inputs of about 1MB, longer bodies are indexed up to this length
+SEARCH_BODY_MAX_CHARS = 200_000
+
+
 class Source(str, enum.Enum):
     GOOGLE = "GOOGLE"
     ANTHROPIC = "ANTHROPIC"
@@ -25,9 +31,39 @@ class Articles(Base):
     source: Mapped[enum.Enum] = mapped_column(
         Enum(Source, name="source_enum", native_enum=True)
     )
-    published_on: Mapped[pg.TIMESTAMP] = mapped_column(pg.TIMESTAMP(timezone=True))
-    markdown_content: Mapped[str] = mapped_column(pg.TEXT, nullable=True)
-    summary: Mapped[Optional[str]] = mapped_column(pg.TEXT, nullable=True)
+    # Partition key, part of the primary key as Postgres requires for partitioned tables
+    published_on: Mapped[pg.TIMESTAMP] = mapped_column(
+        pg.TIMESTAMP(timezone=True), primary_key=True, nullable=False
+    )
+
+    # Watermark for incremental pinecone sync, NULL until the title record is upserted.
+    pinecone_indexed_at: Mapped[Optional[pg.TIMESTAMP]] = mapped_column(
+        pg.TIMESTAMP(timezone=True), nullable=True
+    )
+    # Same for the article record of the semantic search vector store
+    vector_indexed_at: Mapped[Optional[pg.TIMESTAMP]] = mapped_column(
+        pg.TIMESTAMP(timezone=True), nullable=True
+    )
+
+    # Story cluster of near-duplicate articles, see
+    # app/news_service/components/story_clusters.py. The cluster id is the guid of the
+    # canonical member, the only one scraped, classified and shown in the feed, and
+    # cluster_size is kept up to date on it. NULL for articles ingested before.
+    cluster_id: Mapped[Optional[str]] = mapped_column(pg.TEXT, nullable=True)
+    is_canonical: Mapped[bool] = mapped_column(
+        pg.BOOLEAN, nullable=False, default=True, server_default=text("true")
+    )
+    cluster_size: Mapped[int] = mapped_column(
+        pg.INTEGER, nullable=False, default=1, server_default=text("1")
+    )
+    minhash: Mapped[Optional[bytes]] = mapped_column(pg.BYTEA, nullable=True)
+
+    # Classifier confidences, part of the feed ranking, see app/services/ranking.py.
+    # NULL for articles ingested before they were stored.
+    category_confidence: Mapped[Optional[float]] = mapped_column(pg.REAL, nullable=True)
+    subcategory_confidence: Mapped[Optional[float]] = mapped_column(
+        pg.REAL, nullable=True
+    )
 
     # Foreign keys
     category_id: Mapped[Optional[str]] = mapped_column(
@@ -38,8 +74,111 @@ class Articles(Base):
         nullable=True,
     )
 
+    # Weighted title (A) and description (B) lexemes for full text search
+    search_vector = mapped_column(
+        pg.TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+    )
+
+    # Body of the article, kept out of the feed rows. Loaded explicitly, see
+    # NewsDBService.get_article_detail
+    content: Mapped[Optional["ArticleContents"]] = relationship(
+        "ArticleContents",
+        primaryjoin="and_(Articles.guid == foreign(ArticleContents.guid), "
+        "Articles.published_on == foreign(ArticleContents.published_on))",
+        uselist=False,
+        lazy="raise",
+    )
+
     __table_args__ = (
-        Index("idx_published_on", "published_on"),
-        Index("idx_subcategory_id", "subcategory_id"),
+        # Keyset order of the paginated feed
+        Index("idx_articles_published_guid", "published_on", "guid"),
+        # Serves the feed queries and their ranking, see NewsDBService.today_news_statement
+        # and get_feed_page. The unbounded description is left out, index tuples over
+        # ~2.7kB fail the insert, it is fetched from the heap.
+        Index(
+            "idx_articles_subcategory_published",
+            "subcategory_id",
+            "published_on",
+            "guid",
+            postgresql_include=[
+                "title",
+                "url",
+                "category_id",
+                "source",
+                "cluster_size",
+                "category_confidence",
+                "subcategory_confidence",
+            ],
+            postgresql_where=text("is_canonical"),
+        ),
+        Index(
+            "idx_articles_cluster_id",
+            "cluster_id",
+            postgresql_where=text("cluster_id IS NOT NULL"),
+        ),
         Index("idx_source", "source"),
+        Index("idx_articles_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "idx_articles_not_indexed",
+            "published_on",
+            postgresql_where=text("pinecone_indexed_at IS NULL"),
+        ),
+        Index(
+            "idx_articles_not_vector_indexed",
+            "published_on",
+            postgresql_where=text("vector_indexed_at IS NULL"),
+        ),
+        # Monthly partitions are managed by app.db.partitions
+        {"postgresql_partition_by": "RANGE (published_on)"},
+    )
+
+
+class ArticleContents(Base):
+    """Scraped body and summary of an article, one row per article that has either.
+
+    Partitioned like `articles` so both are created and archived month by month. There
+    is no foreign key to `articles`, it would prevent detaching its partitions.
+    """
+
+    __tablename__ = "article_contents"
+
+    guid: Mapped[str] = mapped_column(pg.TEXT, primary_key=True)
+    published_on: Mapped[pg.TIMESTAMP] = mapped_column(
+        pg.TIMESTAMP(timezone=True), primary_key=True, nullable=False
+    )
+    markdown_content: Mapped[Optional[str]] = mapped_column(pg.TEXT, nullable=True)
+    # Set instead of markdown_content when stored compressed, see app.content_codec
+    markdown_compressed: Mapped[Optional[bytes]] = mapped_column(
+        pg.BYTEA, nullable=True
     )
+    content_codec: Mapped[Optional[str]] = mapped_column(pg.TEXT, nullable=True)
+    summary: Mapped[Optional[str]] = mapped_column(pg.TEXT, nullable=True)
+    # Written at insert from the plain markdown, a generated column can not read
+    # compressed bodies
+    body_vector = mapped_column(pg.TSVECTOR, nullable=True)
+
+    __table_args__ = (
+        Index("idx_article_contents_body_vector", "body_vector", postgresql_using="gin"),
+        # Queue of the summarizer, see app/ai/pipeline/summarize_articles.py
+        Index(
+            "idx_article_contents_unsummarized",
+            "published_on",
+            postgresql_where=text(
+                "summary IS NULL AND "
+                "(markdown_content IS NOT NULL OR markdown_compressed IS NOT NULL)"
+            ),
+        ),
+        {"postgresql_partition_by": "RANGE (published_on)"},
+    )
+
+    @staticmethod
+    def body_vector_of(markdown: str | None):
+        """SQL expression of the `body_vector` value of the given markdown."""
+        if markdown is None:
+            return None
+        return func.to_tsvector(SEARCH_LANGUAGE, markdown[:SEARCH_BODY_MAX_CHARS])
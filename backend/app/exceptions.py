@@ -25,4 +25,18 @@ class SubCategoryAlreadyExistsError(ErrorResponse[T]):
     status_code: int = status.HTTP_409_CONFLICT
     message: str = "SubCategory already exists."
     error: str = "subcategory_already_exists_error"
-    data: T | None = None
\ No newline at end of file
+    data: T | None = None
+
+
+class InvalidCursorError(ErrorResponse[T]):
+    status_code: int = status.HTTP_400_BAD_REQUEST
+    message: str = "Given cursor is invalid."
+    error: str = "invalid_cursor_error"
+    data: T | None = None
+
+
+class ArticleNotFoundError(ErrorResponse[T]):
+    status_code: int = status.HTTP_404_NOT_FOUND
+    message: str = "Article not found"
+    error: str = "article_not_found_error"
+    data: T | None = None
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List, Tuple
 from uuid import UUID, uuid4
+from datetime import datetime
 
 
 
@@ -95,4 +96,56 @@ class TodayNewsResponse(BaseModel):
     anthropic: Tuple[AnthropicNewsResponse, ...] | None = None
     openai: Tuple[OpenaiNewsResponse, ...] | None = None
     hackernoon: Tuple[HackernoonResponse, ...] | None = None
- 
+
+
+class FeedArticleResponse(BaseArticleResponse):
+    guid: str
+    source: str
+    published_on: datetime
+
+
+class FeedPageResponse(BaseModel):
+    """One page of the feed, newest first. Pass `next_cursor` back to get the next page,
+    it is None on the last page."""
+    articles: List[FeedArticleResponse]
+    next_cursor: str | None = None
+
+
+class ArticleDetailResponse(FeedArticleResponse):
+    """A single article with its scraped body, both None when it was not scraped."""
+    markdown_content: str | None = None
+    summary: str | None = None
+
+
+class SearchArticleResponse(FeedArticleResponse):
+    rank: float
+
+
+class SemanticArticleResponse(FeedArticleResponse):
+    score: float
+
+
+class SemanticSearchResponse(BaseModel):
+    """Nearest articles to the query, best match first."""
+    articles: List[SemanticArticleResponse]
+
+
+class DigestSubcategoryResponse(BaseModel):
+    subcategory_id: str
+    title: str
+    articles: List[FeedArticleResponse]
+
+
+class DigestResponse(BaseModel):
+    """Today's articles of the user by subcategory, one per story and most
+    relevant first."""
+    day: str
+    generated_at: datetime
+    subcategories: List[DigestSubcategoryResponse]
+
+
+class SearchPageResponse(BaseModel):
+    """One page of search results, best match first. Pass `next_cursor` back to get the
+    next page, it is None on the last page."""
+    articles: List[SearchArticleResponse]
+    next_cursor: str | None = None
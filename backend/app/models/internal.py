@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+
+
+class PoolMetricsResponse(BaseModel):
+    profile: str
+    pool_class: str
+    checkouts: int
+    checkins: int
+    connects: int
+    invalidations: int
+    timeouts: int
+    peak_checked_out: int
+    wait_ms_avg: float
+    wait_ms_max: float
+    # Only reported by queue pools
+    pool_size: int | None = None
+    max_overflow: int | None = None
+    checked_in: int | None = None
+    checked_out: int | None = None
+    overflow: int | None = None
@@ -35,28 +35,37 @@ class Scraper:
             html = data["html"]
             return html
 
+    async def get_entries_from_rss_url(
+        self, rss_url: str, cutoff_hours: int = 24
+    ) -> List[Dict]:
+        """Returns the entries of a single rss feed published within the cutoff"""
+        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=cutoff_hours)
+        # feedparser blocks on the download, the other feeds go on meanwhile
+        feed = await asyncio.to_thread(feedparser.parse, rss_url)
+
+        entries = list()
+        for entry in feed.entries:
+            published_parsed = getattr(entry, "published_parsed", None)
+            if not published_parsed:
+                continue
+
+            published_time = datetime(*published_parsed[:6], tzinfo=timezone.utc)
+            if published_time >= cutoff_time:
+                entries.append(entry)
+        return entries
+
     async def get_entries_from_rss_feed(self, cutoff_hours: int = 24) -> List[Dict]:
         """Returns the list of the entries from rss feed"""
         all_entries = list()
-        now = datetime.now(timezone.utc)
-        cutoff_time = now - timedelta(hours=cutoff_hours)
         seen_guids = set()
         for rss_url in self.rss_urls:
-            feed = feedparser.parse(rss_url)
-
-            if not feed.entries:
-                continue
-
-            for entry in feed.entries:
-                published_parsed = getattr(entry, "published_parsed", None)
-                if not published_parsed:
-                    continue
-
-                published_time = datetime(*published_parsed[:6], tzinfo=timezone.utc)
-                if published_time >= cutoff_time:
-                    guid = entry.get("id", entry.get("link", ""))
-                    if guid not in seen_guids:
-                        all_entries.append(entry)
+            for entry in await self.get_entries_from_rss_url(
+                rss_url=rss_url, cutoff_hours=cutoff_hours
+            ):
+                guid = entry.get("id", entry.get("link", ""))
+                if guid not in seen_guids:
+                    seen_guids.add(guid)
+                    all_entries.append(entry)
         logger.info(f"Total entries in given cutoff is : {len(all_entries)}")
         return all_entries
 
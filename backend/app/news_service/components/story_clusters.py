@@ -0,0 +1,184 @@
+"""Near-duplicate clustering of the articles into stories.
+
+The same announcement comes in from several google subcategory feeds, the publisher's
+own blog and hackernoon. Each article gets a MinHash signature of its title and
+description, an LSH index over the signatures of the recent articles finds the
+candidates sharing at least one band and the ones whose estimated Jaccard similarity
+reaches the threshold are the same story. The first article of a story is its
+canonical member, the only one scraped, classified and shown in the feed.
+
+With 16 bands of 4 rows a pair at similarity 0.5 is a candidate with ~64%
+probability, at 0.7 with ~98%.
+"""
+
+import hashlib
+import html
+import re
+import struct
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set, Tuple
+
+from app.config import CONFIG
+
+
+Signature = Tuple[int, ...]
+
+_TAG = re.compile(r"<[^>]+>")
+_TOKEN = re.compile(r"\w+")
+# " - The Verge" google appends the publisher to the titles
+_PUBLISHER_SUFFIX = re.compile(r"\s+[-|–—]\s+(\S+(?:\s+\S+){0,3})\s*$")
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize(title: str, description: str | None) -> List[str]:
+    """Tokens of the title and description without markup, case and publisher suffix."""
+    title = _PUBLISHER_SUFFIX.sub("", html.unescape(_TAG.sub(" ", title or "")))
+    description = html.unescape(_TAG.sub(" ", description or ""))
+    return _TOKEN.findall(f"{title} {description}".lower())
+
+
+def shingles(tokens: List[str], size: int = 2) -> Set[str]:
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures, the permutations are (a * x + b) mod p of a 64 bit hash."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        self.num_perm = num_perm
+        self.permutations = []
+        for i in range(num_perm):
+            digest = hashlib.blake2b(f"{seed}:{i}".encode(), digest_size=16).digest()
+            a = int.from_bytes(digest[:8], "big") % (_MERSENNE_PRIME - 1) + 1
+            b = int.from_bytes(digest[8:], "big") % _MERSENNE_PRIME
+            self.permutations.append((a, b))
+
+    def signature(self, title: str, description: str | None) -> Signature:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+            for shingle in shingles(normalize(title, description))
+        ]
+        if not hashes:
+            return (_MAX_HASH,) * self.num_perm
+        return tuple(
+            min(((a * x + b) % _MERSENNE_PRIME) & _MAX_HASH for x in hashes)
+            for a, b in self.permutations
+        )
+
+    def to_bytes(self, signature: Signature) -> bytes:
+        return struct.pack(f"<{self.num_perm}I", *signature)
+
+    def from_bytes(self, data: bytes) -> Signature:
+        return struct.unpack(f"<{self.num_perm}I", bytes(data))
+
+
+def similarity(first: Signature, second: Signature) -> float:
+    """Estimated Jaccard similarity of the shingles the signatures were made of."""
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+class LSHIndex:
+    """Banded locality sensitive hashing of the signatures."""
+
+    def __init__(self, bands: int = 16, rows: int = 4):
+        self.bands = bands
+        self.rows = rows
+        self.buckets: List[Dict[Signature, List[str]]] = [
+            defaultdict(list) for _ in range(bands)
+        ]
+
+    def _bands(self, signature: Signature) -> Iterable[Tuple[int, Signature]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows : (band + 1) * self.rows]
+
+    def insert(self, key: str, signature: Signature):
+        for band, values in self._bands(signature):
+            self.buckets[band][values].append(key)
+
+    def candidates(self, signature: Signature) -> Set[str]:
+        keys = set()
+        for band, values in self._bands(signature):
+            keys.update(self.buckets[band].get(values, ()))
+        return keys
+
+
+@dataclass
+class StoryAssignment:
+    cluster_id: str
+    signature: Signature
+    minhash: bytes
+
+    def is_canonical(self, guid: str) -> bool:
+        return self.cluster_id == guid
+
+
+class StoryClusterer:
+    """Assigns articles to the story clusters of the recent articles.
+
+    Load the recent articles with `add`, then `assign` the incoming ones in order. An
+    article joins the cluster of its most similar candidate at or above `threshold`,
+    otherwise it starts a new cluster with its guid as cluster id.
+    """
+
+    def __init__(
+        self,
+        hasher: MinHasher | None = None,
+        threshold: float = CONFIG.STORY_CLUSTER_THRESHOLD,
+        bands: int = 16,
+    ):
+        self.hasher = hasher or MinHasher()
+        if self.hasher.num_perm % bands:
+            raise ValueError("The number of permutations must be a multiple of bands.")
+        self.threshold = threshold
+        self.index = LSHIndex(bands=bands, rows=self.hasher.num_perm // bands)
+        self.signatures: Dict[str, Signature] = {}
+        self.clusters: Dict[str, str] = {}
+
+    def add(self, guid: str, signature: Signature, cluster_id: str | None):
+        """Indexes an already clustered article."""
+        if len(signature) != self.hasher.num_perm:
+            return
+        self.signatures[guid] = signature
+        self.clusters[guid] = cluster_id or guid
+        self.index.insert(guid, signature)
+
+    def assign(self, guid: str, title: str, description: str | None) -> StoryAssignment:
+        signature = self.hasher.signature(title, description)
+        if guid in self.clusters:
+            cluster_id = self.clusters[guid]
+        else:
+            best, best_similarity = None, self.threshold
+            for candidate in self.index.candidates(signature):
+                candidate_similarity = similarity(signature, self.signatures[candidate])
+                if candidate_similarity >= best_similarity:
+                    best, best_similarity = candidate, candidate_similarity
+            cluster_id = self.clusters[best] if best is not None else guid
+            self.add(guid, signature, cluster_id)
+        return StoryAssignment(
+            cluster_id=cluster_id,
+            signature=signature,
+            minhash=self.hasher.to_bytes(signature),
+        )
+
+
+if __name__ == "__main__":
+    # Regression check of the clustering on a few hand picked titles
+    articles = [
+        ("a", "OpenAI launches GPT-5 with improved reasoning - The Verge", ""),
+        ("b", "OpenAI launches GPT-5 with improved reasoning - Reuters", ""),
+        ("c", "OpenAI launches GPT-5 with improved reasoning and coding", ""),
+        ("d", "Anthropic raises new funding round at higher valuation", ""),
+        ("e", "Google DeepMind unveils Gemini robotics model - TechCrunch", ""),
+        ("f", "Google DeepMind unveils Gemini robotics model", "<a href='x'>Google DeepMind unveils Gemini robotics model</a>"),
+    ]
+    clusterer = StoryClusterer(threshold=0.5)
+    for guid, title, description in articles:
+        assignment = clusterer.assign(guid, title, description)
+        print(f"{guid} -> {assignment.cluster_id}  {title}")
+    assert clusterer.clusters["b"] == "a" and clusterer.clusters["c"] == "a"
+    assert clusterer.clusters["d"] == "d" and clusterer.clusters["e"] == "e"
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
-from typing import List, TypeAlias
+from typing import Any, Dict, List, TypeAlias
 
 
 MarkdownContent: TypeAlias = str
@@ -24,8 +24,9 @@ class CategoriesData(BaseModel):
 class ClassifiedCategory(BaseModel):
     category: Category
     subcategory: SubCategory
-    category_confidence: float
-    subcategory_confidence: float
+    # None for the classifications copied from articles stored without them
+    category_confidence: float | None
+    subcategory_confidence: float | None
 
 
 
@@ -35,6 +36,12 @@ class BaseArticle(BaseModel):
     description: str
     url: str
     published_on: datetime
+    # Story cluster, see app/news_service/components/story_clusters.py
+    cluster_id: str | None = None
+    minhash: bytes | None = None
+    # Confidences of the classification, part of the feed ranking
+    category_confidence: float | None = None
+    subcategory_confidence: float | None = None
 
     model_config = ConfigDict(
         extra='ignore'
@@ -70,3 +77,21 @@ class HackernoonArticle(BaseArticle):
 
 
 ServiceArticle: TypeAlias = GoogleArticle | AnthropicArticle | OpenAiArticle | HackernoonArticle
+
+
+class IngestItem(BaseModel):
+    """An rss entry on its way through the ingestion stages, see
+    `NewsRepository.plan_ingestion`. JSON serializable, the celery tasks pass it on."""
+    source: str
+    guid: str
+    # The feedparser entry as plain JSON
+    entry: Dict[str, Any]
+    cluster_id: str
+    # Hex of the story MinHash signature
+    minhash: str
+    markdown_content: str | None = None
+    classification: ClassifiedCategory | None = None
+
+    @property
+    def is_canonical(self) -> bool:
+        return self.cluster_id == self.guid
@@ -1,13 +1,26 @@
-from typing import List, Tuple, Literal
+from collections import defaultdict
+from typing import Dict, List, Tuple, Literal
 import asyncio
+import json
+import feedparser
+import groq
 from loguru import logger
+from pydantic import ValidationError
 
-from app.db.models.ai_news_service import Articles
-from app.news_service.components.classifier import Classifier
+from app.db.schemas import Articles, ArticleContents
+from app.news_service.components.classifier import CategoryClassifier
 from app.db.main import get_session, AsyncSession
-from app.controllers.ai_news_service import NewsDBService
+from app.services.ai_news_service import NewsDBService
 from app.news_service.types import ServiceArticle
-from app.news_service.types import ClassifiedCategory, MarkdownContent
+from app.content_codec import ContentCodec, content_codec
+from app.news_service.types import (
+    ClassifiedCategory,
+    IngestItem,
+    Category,
+    SubCategory,
+)
+from app.news_service.components.story_clusters import StoryClusterer
+from app.news_service.components.scraper import CannotGetContent
 from app.news_service import (
     OpenAiService,
     AnthropicService,
@@ -25,35 +38,46 @@ class NewsRepository:
         self,
         *,
         db: NewsDBService | None = None,
-        classifier: Classifier | None = None,
+        classifier: CategoryClassifier | None = None,
         openai: OpenAiService | None = None,
         google: GoogleService | None = None,
         hackernoon: HackernoonService | None = None,
         anthropic: AnthropicService | None = None,
+        codec: ContentCodec | None = None,
     ):
         self.db: NewsDBService | None = db
-        self.classifier: Classifier | None = classifier
+        self.classifier: CategoryClassifier | None = classifier
         self.openai: OpenAiService | None = openai
         self.google: GoogleService | None = google
         self.anthropic: AnthropicService | None = anthropic
         self.hackernoon: HackernoonService | None = hackernoon
-
-        self.current_service: (
-            OpenAiService | GoogleService | AnthropicService | HackernoonService
-        ) = None
+        self.codec: ContentCodec = codec or content_codec
 
     async def article_to_orm(self, article: ServiceArticle):
-        """Convert classified article to ORM object"""
+        """Convert classified article to ORM object, the body goes to its own row
+        which is saved together with the article."""
         return Articles(
             guid=article.guid,
             title=article.title,
             description=article.description,
             url=article.url,
             published_on=article.published_on,
-            markdown_content=article.markdown_content,
             category_id=article.category.category_id,
             subcategory_id=article.sub_category.subcategory_id,
-            source=self.current_service.get_source(),
+            source=article.source,
+            cluster_id=article.cluster_id,
+            is_canonical=article.cluster_id in (None, article.guid),
+            minhash=article.minhash,
+            category_confidence=article.category_confidence,
+            subcategory_confidence=article.subcategory_confidence,
+            content=(
+                ArticleContents(
+                    **self.codec.encode(article.markdown_content).as_columns(),
+                    body_vector=ArticleContents.body_vector_of(article.markdown_content),
+                )
+                if article.markdown_content is not None
+                else None
+            ),
         )
 
     async def articles_to_orm_list(self, articles: List[ServiceArticle]) -> List:
@@ -90,26 +114,246 @@ class NewsRepository:
         await self.db.bulk_create_articles(articles=orm_articles, session=session)
         return True
 
-    async def _fetch_and_classify(
+    def get_service(
+        self, source: Literal["OPENAI", "GOOGLE", "ANTHROPIC", "HACKERNOON"]
+    ) -> OpenAiService | GoogleService | AnthropicService | HackernoonService:
+        match source:
+            case "ANTHROPIC":
+                return self.anthropic
+            case "GOOGLE":
+                return self.google
+            case "OPENAI":
+                return self.openai
+            case "HACKERNOON":
+                return self.hackernoon
+            case _:
+                raise Exception("Invalid Source Input.")
+
+    @staticmethod
+    def entry_to_json(entry) -> Dict:
+        """The feedparser entry as plain JSON, its struct_time fields become lists."""
+        return json.loads(json.dumps(entry, default=str))
+
+    async def fetch_feed(
+        self, source: str, rss_url: str, cutoff_hours: int = 24
+    ) -> List[Dict]:
+        """Ingestion stage 1: the JSON entries of one rss feed of the source."""
+        service = self.get_service(source)
+        entries = await service.scraper.get_entries_from_rss_url(
+            rss_url=rss_url, cutoff_hours=cutoff_hours
+        )
+        logger.info(f"{len(entries)} entries in {rss_url}")
+        return [self.entry_to_json(entry) for entry in entries]
+
+    async def _load_story_clusterer(
+        self, session: AsyncSession
+    ) -> Tuple[StoryClusterer, Dict[str, ClassifiedCategory]]:
+        """Indexes the recent articles and returns the classification of their stories
+        by cluster id, with the confidences of their canonical article."""
+        clusterer = StoryClusterer()
+        signature_bytes = clusterer.hasher.num_perm * 4
+        snapshot = await self.db.category_service.catalogue.get(session=session)
+        story_categories: Dict[str, ClassifiedCategory] = {}
+        for (
+            guid,
+            cluster_id,
+            minhash,
+            category_id,
+            subcategory_id,
+            category_confidence,
+            subcategory_confidence,
+        ) in await self.db.get_story_signatures(session=session):
+            # Signatures of another number of permutations can not be compared
+            if len(minhash) != signature_bytes:
+                continue
+            clusterer.add(guid, clusterer.hasher.from_bytes(minhash), cluster_id)
+            category = snapshot.categories.get(category_id)
+            subcategory = snapshot.subcategories.get(subcategory_id)
+            if cluster_id == guid and category and subcategory:
+                story_categories[cluster_id] = ClassifiedCategory(
+                    category=Category(
+                        category_id=str(category.id), title=category.title
+                    ),
+                    subcategory=SubCategory(
+                        subcategory_id=str(subcategory.id), title=subcategory.title
+                    ),
+                    # Not stored before, those duplicates rank as unknown
+                    category_confidence=category_confidence,
+                    subcategory_confidence=subcategory_confidence,
+                )
+        return clusterer, story_categories
+
+    async def plan_ingestion(
         self,
-        url: str,
-        title: str,
-        scrape_content: bool = True,
-    ) -> Tuple[MarkdownContent | None, ClassifiedCategory]:
-        if scrape_content is True:
-            markdown_content: MarkdownContent = (
-                await self.current_service.scraper.scrape_url(
-                    url=url, content_format="markdown"
+        source_entries: List[Tuple[str, Dict]],
+        session: AsyncSession,
+        cutoff_hours: int = 24,
+    ) -> List[IngestItem]:
+        """Ingestion stage 2: drops the entries already stored and assigns the others to
+        their stories, in order. Duplicates of a stored story get its classification,
+        see `pending_items` for the ones still to classify and scrape."""
+        entries_by_source: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+        for source, entry in source_entries:
+            # Restores feedparser's key aliases, e.g. description for summary
+            entry = feedparser.FeedParserDict(entry)
+            entries_by_source[source].setdefault(entry.guid, entry)
+
+        clusterer, story_categories = await self._load_story_clusterer(
+            session=session
+        )
+        items: List[IngestItem] = []
+        for source, entries in entries_by_source.items():
+            existing = set(
+                await self.db.get_all_guids(
+                    session=session,
+                    source=self.get_service(source).get_source(),
+                    cutoff_hours=cutoff_hours,
                 )
             )
-        else:
-            markdown_content = None
-        classified_category: ClassifiedCategory = (
-            await self.classifier.classify_category(news_title=title)
+            logger.info(
+                f"{len(existing.intersection(entries))} {source} entires already existed."
+            )
+            for guid, entry in entries.items():
+                if guid in existing:
+                    continue
+                story = clusterer.assign(
+                    guid=guid, title=entry["title"], description=entry.get("description")
+                )
+                is_canonical = story.is_canonical(guid)
+                if not is_canonical:
+                    logger.info(f"{guid} is a duplicate of {story.cluster_id}.")
+                items.append(
+                    IngestItem(
+                        source=source,
+                        guid=guid,
+                        entry=entry,
+                        cluster_id=story.cluster_id,
+                        minhash=story.minhash.hex(),
+                        classification=(
+                            None
+                            if is_canonical
+                            else story_categories.get(story.cluster_id)
+                        ),
+                    )
+                )
+        return items
+
+    @staticmethod
+    def pending_items(items: List[IngestItem]) -> List[IngestItem]:
+        """The items to classify and scrape: the canonical articles and the duplicates
+        of stored stories without a known classification. The other duplicates copy
+        the classification of their canonical article in `persist_items`."""
+        canonical_guids = {item.guid for item in items if item.is_canonical}
+        return [
+            item
+            for item in items
+            if item.classification is None
+            and (item.is_canonical or item.cluster_id not in canonical_guids)
+        ]
+
+    async def classify_item(self, item: IngestItem) -> IngestItem:
+        """Ingestion stage 3: the classification of the title. Left None on failure, the
+        article is then not stored and comes back in the next run."""
+        if item.classification is None:
+            try:
+                item.classification = await self.classifier.run(
+                    news_title=item.entry["title"]
+                )
+            except (groq.APIError, json.JSONDecodeError, ValidationError) as exc:
+                logger.error(f"Classifying {item.guid} failed: {exc}")
+        return item
+
+    async def scrape_item(
+        self, item: IngestItem, scrape_content: bool = True
+    ) -> IngestItem:
+        """Ingestion stage 4: the body of a classified canonical article, through
+        playwright for most sources. An article that can not be scraped is stored
+        without it."""
+        if (
+            scrape_content
+            and item.is_canonical
+            and item.classification is not None
+            and item.markdown_content is None
+        ):
+            try:
+                item.markdown_content = await self.get_service(
+                    item.source
+                ).scraper.scrape_url(url=item.entry["link"], content_format="markdown")
+            except CannotGetContent as exc:
+                logger.error(f"Scraping {item.guid} failed: {exc}")
+        return item
+
+    async def item_to_article(self, item: IngestItem) -> ServiceArticle | None:
+        service_article: ServiceArticle = await self.get_service(
+            item.source
+        ).to_service_article(
+            entry=feedparser.FeedParserDict(item.entry),
+            classified_category=item.classification,
+            markdown_content=item.markdown_content,
         )
-        return (markdown_content, classified_category)
+        if service_article is not None:
+            service_article.cluster_id = item.cluster_id
+            service_article.minhash = bytes.fromhex(item.minhash)
+            service_article.category_confidence = item.classification.category_confidence
+            service_article.subcategory_confidence = (
+                item.classification.subcategory_confidence
+            )
+        return service_article
 
+    async def persist_items(
+        self,
+        items: List[IngestItem],
+        session: AsyncSession,
+        commit_on_each: bool = False,
+        cutoff_hours: int = 24,
+    ) -> int:
+        """Ingestion stage 5: saves the classified items and recounts the stories which
+        got a new duplicate. Returns the number of articles saved."""
+        classifications = {
+            item.guid: item.classification
+            for item in items
+            if item.is_canonical and item.classification is not None
+        }
+        for item in items:
+            if item.classification is None:
+                item.classification = classifications.get(item.cluster_id)
+
+        # An overlapping run may have stored some of them meanwhile
+        existing = set()
+        for source in {item.source for item in items}:
+            existing.update(
+                (source, guid)
+                for guid in await self.db.get_all_guids(
+                    session=session,
+                    source=self.get_service(source).get_source(),
+                    cutoff_hours=cutoff_hours,
+                )
+            )
+        articles: List[ServiceArticle] = []
+        for item in items:
+            if item.classification is None or (item.source, item.guid) in existing:
+                continue
+            service_article = await self.item_to_article(item)
+            if service_article is not None:
+                articles.append(service_article)
+        logger.info(f"Saving {len(articles)} of {len(items)} entries.")
+        if not articles:
+            return 0
 
+        if commit_on_each is True:
+            for service_article in articles:
+                await self.save_article(article=service_article, session=session)
+        else:
+            await self.bulk_save_articles(articles, session)
+        await self.db.refresh_cluster_sizes(
+            cluster_ids={
+                article.cluster_id
+                for article in articles
+                if article.cluster_id != article.guid
+            },
+            session=session,
+        )
+        return len(articles)
 
     async def fetch_classify_and_save_articles(
         self,
@@ -119,92 +363,35 @@ class NewsRepository:
         commit_on_each: bool = False,
         scrape_content: bool = True,
     ) -> int:
-        """Main workflow: fetch, classify, and save articles"""
-        self.current_service = None
-        match source:
-            case "ANTHROPIC":
-                self.current_service = self.anthropic
-            case "GOOGLE":
-                self.current_service = self.google
-            case "OPENAI":
-                self.current_service = self.openai
-            case "HACKERNOON":
-                self.current_service = self.hackernoon
-            case _:
-                raise Exception("Invalid Source Input.")
-
-        entries = await self.current_service.scraper.get_entries_from_rss_feed(
+        """Main workflow: fetch, classify, and save articles. Runs the ingestion stages
+        one after the other in this process, the celery tasks spread them over workers."""
+        service = self.get_service(source)
+        entries = await service.scraper.get_entries_from_rss_feed(
             cutoff_hours=cutoff_hours
         )
 
         if not entries:
-            print(f"No new entries found for {self.current_service.__class__.__name__}")
+            print(f"No new entries found for {service.__class__.__name__}")
             return 0
 
-        all_guids = {entry.guid for entry in entries}
-        all_exising_guids = await self.db.get_all_guids(
+        items = await self.plan_ingestion(
+            source_entries=[(source, self.entry_to_json(entry)) for entry in entries],
             session=session,
-            source=self.current_service.get_source(),
             cutoff_hours=cutoff_hours,
         )
-        already_existing = set(all_exising_guids).intersection(all_guids)
-
-        logger.info(f"{len(already_existing)} entires already existed.")
-
-        #This creates all the valid guids to be stored in the db
-        entries = [entry for entry in entries if entry.guid not in already_existing]
-
-        logger.info(f"Total entries to be fetched: {len(entries)}")
-
-        if commit_on_each is True:
-            no_of_articles = 0
-            for entry in entries:
-                markdown_content, classified_category = (
-                    await self._fetch_and_classify(
-                        url=entry["link"],
-                        title=entry["title"],
-                        scrape_content=scrape_content,
-                    )
-                )
-                service_article: ServiceArticle = (
-                    await self.current_service.to_service_article(
-                        entry=entry,
-                        classified_category=classified_category,
-                        markdown_content=markdown_content,
-                    )
-                )
+        pending = self.pending_items(items)
+        logger.info(f"Total entries to be fetched: {len(pending)}")
 
-                if service_article is not None:
-                    await self.save_article(
-                        article=service_article, session=session
-                    )
-                no_of_articles = no_of_articles + 1
-            return no_of_articles
-
-        else:
+        for item in pending:
+            await self.classify_item(item=item)
+            await self.scrape_item(item=item, scrape_content=scrape_content)
 
-            classified_articles: List[ServiceArticle] = []
-            for entry in entries:
-                markdown_content, classified_category = (
-                    await self._fetch_and_classify(
-                        url=entry["link"],
-                        title=entry["title"],
-                        scrape_content=scrape_content,
-                    )
-                )
-                service_article: ServiceArticle = (
-                    await self.current_service.to_service_article(
-                        entry=entry,
-                        classified_category=classified_category,
-                        markdown_content=markdown_content,
-                    )
-                )
-                if service_article is not None:
-                    classified_articles.append(service_article)
-
-            if classified_articles:
-                await self.bulk_save_articles(classified_articles, session)
-            return len(classified_articles)
+        return await self.persist_items(
+            items=items,
+            session=session,
+            commit_on_each=commit_on_each,
+            cutoff_hours=cutoff_hours,
+        )
 
 
 
@@ -233,7 +420,7 @@ async def init_repository() -> NewsRepository:
         subcategory_ids=subcategory_ids
     )
 
-    classifier = Classifier(categories_data=categories_data)
+    classifier = CategoryClassifier(categories_data=categories_data)
     openai = await OpenAiService.create()
     google = await GoogleService.create(rss_urls=google_rss_urls)
     anthropic = await AnthropicService.create()
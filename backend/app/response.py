@@ -1,3 +1,4 @@
+import orjson
 from typing import Generic, TypeVar, Optional, Type
 from pydantic import BaseModel
 from fastapi import HTTPException
@@ -17,6 +18,16 @@ class SuccessResponse(ResponseBase[T]):
     status_code: int = 200
 
 
+def encode_success_response(
+    data: bytes, message: str = "Request Successful", status_code: int = 200
+) -> bytes:
+    """Wraps already serialized `data` in the same JSON envelope as `SuccessResponse`."""
+    head = orjson.dumps(
+        {"status": "success", "message": message, "status_code": status_code}
+    )
+    return head[:-1] + b',"data":' + data + b"}"
+
+
 class ErrorResponse(ResponseBase[T]):
     status: str = "error"
     message: str = "An Error Occurred"
@@ -1,7 +1,8 @@
 from app.routes.auth_routes import auth_routes
 from app.routes.news_service_routes import news_routes
+from app.routes.internal_routes import internal_routes
 
 
 __all__ = [
-    auth_routes, news_routes
+    auth_routes, news_routes, internal_routes
 ]
\ No newline at end of file
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, status
+
+from app.auth.dependencies import admin_checker
+from app.config import CONFIG
+from app.db.main import async_engine
+from app.db.pool_metrics import pool_metrics
+from app.models.internal import PoolMetricsResponse
+from app.response import SuccessResponse
+
+
+internal_routes = APIRouter(dependencies=[Depends(admin_checker)])
+
+
+@internal_routes.get(
+    "/db/pool",
+    response_model=SuccessResponse[PoolMetricsResponse],
+    description="Connection pool utilization of the API process that served the request.",
+)
+async def get_pool_metrics() -> SuccessResponse[PoolMetricsResponse]:
+    return SuccessResponse[PoolMetricsResponse](
+        status_code=status.HTTP_200_OK,
+        message="Returned Pool Metrics Successfully.",
+        data=pool_metrics.snapshot(
+            engine=async_engine, profile=CONFIG.DB_POOL_PROFILE
+        ),
+    )
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio.session import AsyncSession
-from typing import List
+from typing import List, Literal
+from datetime import datetime
 
 from app.auth.dependencies import AccessTokenBearer
 from app.models.ai_news_service import (
@@ -9,11 +11,22 @@ from app.models.ai_news_service import (
     UpdateUsersCategoriesModel,
     CreateCustomCategoryDataModel,
     CreateSubcategoriesToCategoryModel,
-    TodayNewsResponse
+    TodayNewsResponse,
+    FeedPageResponse,
+    ArticleDetailResponse,
+    SearchPageResponse,
+    SemanticSearchResponse,
+    DigestResponse,
 )
+from app.ai.components.vector_store import ArticleVectorStore, init_vector_store
 from app.services.ai_news_service import NewsDBService, CategoriesDBService
-from app.db.main import get_session
-from app.response import SuccessResponse
+from app.db.main import get_session, get_read_session, read_session
+from app.config import CONFIG
+from app.cache import feed_cache, data_versions, DataVersions, FeedCache
+from app.services.digests import digest_store
+from app.etag import CACHE_CONTROL, make_etag, is_not_modified, not_modified_response
+from app.response import SuccessResponse, encode_success_response
+from app.serializers import encode_feed_article
 from loguru import logger
 
 
@@ -29,7 +42,19 @@ news_service = NewsDBService()
 @news_routes.get(
     '/category-data', response_model=SuccessResponse[ResponseCategoryDataModel], description="Returs the existing categories in the database to select from to show in UI."
 )
-async def get_initial_category_data(session: AsyncSession = Depends(get_session)):
+async def get_initial_category_data(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
+):
+    versions = await data_versions.get(DataVersions.CATALOGUE_KEY)
+    if versions is not None:
+        etag = make_etag("category-data", *versions)
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+
     category_data = await category_service.get_categories_data(session=session)
     return SuccessResponse[ResponseCategoryDataModel](
         status_code=status.HTTP_200_OK,
@@ -52,6 +77,7 @@ async def set_user_categories(
             user_id=user_id, categories_data=categories_data, session=session
         )
     )
+    await feed_cache.invalidate_user(user_id=user_id)
     return SuccessResponse[ResponseCategoryDataModel](
         status_code=status.HTTP_201_CREATED,
         message="Categories Set Successfully.",
@@ -74,6 +100,7 @@ async def update_user_categories(
             user_id=user_id, categories_data=categories_data, session=session
         )
     )
+    await feed_cache.invalidate_user(user_id=user_id)
     return SuccessResponse[ResponseCategoryDataModel](
         status_code=status.HTTP_201_CREATED,
         message="Categories Set Successfully.",
@@ -86,10 +113,22 @@ async def update_user_categories(
     response_model=SuccessResponse[ResponseCategoryDataModel],
 )
 async def get_user_categories(
+    request: Request,
+    response: Response,
     decoded_token=Depends(AccessTokenBearer()),
     session: AsyncSession = Depends(get_session),
-) -> SuccessResponse[ResponseCategoryDataModel]:
+):
     user_id = decoded_token["sub"]
+    versions = await data_versions.get(
+        DataVersions.CATALOGUE_KEY, FeedCache.USER_VERSION_KEY.format(user_id=user_id)
+    )
+    if versions is not None:
+        etag = make_etag("my-categories", user_id, *versions)
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+
     result: ResponseCategoryDataModel = (
         await category_service.get_user_categories(user_id=user_id, session=session)
     )
@@ -116,6 +155,7 @@ async def create_own_category(
             user_id=user_id, category_data=category_data, session=session
         )
     )
+    await feed_cache.invalidate_user(user_id=user_id)
     return SuccessResponse[ResponseCategoryDataModel](
         status_code=status.HTTP_201_CREATED,
         message="Category Created Successfully",
@@ -141,6 +181,7 @@ async def add_subcategories_to_category(
             session=session,
         )
     )
+    await feed_cache.invalidate_user(user_id=user_id)
     return SuccessResponse[ResponseCategoryDataModel](
         status_code=status.HTTP_201_CREATED,
         message="Subcategories Added Successfully",
@@ -151,15 +192,229 @@ async def add_subcategories_to_category(
 
 @news_routes.get("/get/news", response_model=SuccessResponse[TodayNewsResponse])
 async def get_latest_news(
+    request: Request,
     decoded_token=Depends(AccessTokenBearer()),
+    # The primary, not a replica: a miss right after a category edit is stored under
+    # the new user version and must not read the subcategories before the edit. A
+    # cache hit does not touch the session.
     session: AsyncSession = Depends(get_session),
 ):
     user_id = decoded_token["sub"]
-    today_news_response = await news_service.get_today_news(
-        user_id=user_id, session=session
+    cached = await feed_cache.lookup(user_id=user_id)
+    headers = {}
+    if cached.epoch >= 0:
+        etag = make_etag("news", user_id, cached.epoch, cached.version, cached.day)
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+    # Precomputed for the active users after each ingestion, see app/services/digests.py
+    if cached.payload is not None:
+        return Response(
+            content=cached.payload, media_type="application/json", headers=headers
+        )
+
+    today_news = await news_service.get_today_news_json(
+        user_id=user_id, session=session, user_version=cached.version
+    )
+    payload = encode_success_response(
+        data=today_news,
+        message=FeedCache.RESPONSE_MESSAGE,
+        status_code=status.HTTP_200_OK,
+    )
+    await feed_cache.store(user_id=user_id, payload=payload, lookup=cached)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+@news_routes.get(
+    "/get/digest",
+    response_model=SuccessResponse[DigestResponse],
+    description="Returns today's articles of the user grouped by subcategory, one per story.",
+)
+async def get_digest(
+    decoded_token=Depends(AccessTokenBearer()),
+    session: AsyncSession = Depends(get_read_session),
+    primary_session: AsyncSession = Depends(get_session),
+):
+    user_id = decoded_token["sub"]
+    # Precomputed after each ingestion, built here only for new or edited users
+    digest = await digest_store.lookup(user_id=user_id)
+    if digest is None:
+        digest = await digest_store.build(
+            user_id=user_id, session=session, primary_session=primary_session
+        )
+    payload = encode_success_response(
+        data=digest,
+        message="Returned Digest Successfully",
+        status_code=status.HTTP_200_OK,
     )
-    return SuccessResponse[TodayNewsResponse](
+    return Response(content=payload, media_type="application/json")
+
+
+@news_routes.get(
+    "/feed",
+    response_model=SuccessResponse[FeedPageResponse],
+    description="Returns the user's feed newest first, one page at a time.",
+)
+async def get_feed(
+    cursor: str | None = None,
+    limit: int = Query(
+        default=CONFIG.FEED_DEFAULT_PAGE_SIZE, ge=1, le=CONFIG.FEED_MAX_PAGE_SIZE
+    ),
+    lookback_hours: int = Query(
+        default=CONFIG.FEED_LOOKBACK_HOURS, ge=1, le=CONFIG.FEED_MAX_LOOKBACK_HOURS
+    ),
+    decoded_token=Depends(AccessTokenBearer()),
+    session: AsyncSession = Depends(get_read_session),
+):
+    user_id = decoded_token["sub"]
+    feed_page = await news_service.get_feed_page_json(
+        user_id=user_id,
+        session=session,
+        cursor=cursor,
+        limit=limit,
+        lookback_hours=lookback_hours,
+    )
+    payload = encode_success_response(
+        data=feed_page,
+        message="Returned Feed Successfully",
         status_code=status.HTTP_200_OK,
-        message="Returned News Successfully",
-        data=today_news_response,
+    )
+    return Response(content=payload, media_type="application/json")
+
+
+@news_routes.get(
+    "/search",
+    response_model=SuccessResponse[SearchPageResponse],
+    description="Full text search over past articles, best match first. Supports web "
+    'search syntax: "quoted phrases", OR and -excluded words.',
+)
+async def search_articles(
+    q: str = Query(min_length=1, max_length=200),
+    mine: bool = Query(
+        default=False, description="Only search the user's subcategories."
+    ),
+    include_body: bool = True,
+    cursor: str | None = None,
+    limit: int = Query(
+        default=CONFIG.FEED_DEFAULT_PAGE_SIZE, ge=1, le=CONFIG.FEED_MAX_PAGE_SIZE
+    ),
+    lookback_days: int = Query(
+        default=CONFIG.SEARCH_LOOKBACK_DAYS, ge=1, le=CONFIG.SEARCH_MAX_LOOKBACK_DAYS
+    ),
+    decoded_token=Depends(AccessTokenBearer()),
+    session: AsyncSession = Depends(get_read_session),
+) -> SuccessResponse[SearchPageResponse]:
+    user_id = decoded_token["sub"]
+    result = await news_service.search_articles(
+        query=q,
+        session=session,
+        user_id=user_id if mine else None,
+        cursor=cursor,
+        limit=limit,
+        lookback_days=lookback_days,
+        include_body=include_body,
+    )
+    return SuccessResponse[SearchPageResponse](
+        status_code=status.HTTP_200_OK,
+        message="Returned Search Results Successfully",
+        data=result,
+    )
+
+
+@news_routes.get(
+    "/search/semantic",
+    response_model=SuccessResponse[SemanticSearchResponse],
+    description="Articles closest in meaning to the query, best match first.",
+)
+async def semantic_search_articles(
+    q: str = Query(min_length=1, max_length=500),
+    subcategory_id: List[str] | None = Query(
+        default=None, description="Only return articles of these subcategories."
+    ),
+    mine: bool = Query(
+        default=False, description="Only search the user's subcategories."
+    ),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = Query(
+        default=CONFIG.FEED_DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=CONFIG.SEMANTIC_SEARCH_MAX_RESULTS,
+    ),
+    decoded_token=Depends(AccessTokenBearer()),
+    session: AsyncSession = Depends(get_read_session),
+    store: ArticleVectorStore = Depends(init_vector_store),
+) -> SuccessResponse[SemanticSearchResponse]:
+    user_id = decoded_token["sub"]
+    result = await news_service.semantic_search(
+        query=q,
+        session=session,
+        store=store,
+        user_id=user_id if mine else None,
+        subcategory_ids=subcategory_id,
+        since=since,
+        until=until,
+        limit=limit,
+    )
+    return SuccessResponse[SemanticSearchResponse](
+        status_code=status.HTTP_200_OK,
+        message="Returned Search Results Successfully",
+        data=result,
+    )
+
+
+@news_routes.get(
+    "/article/{guid:path}",
+    response_model=SuccessResponse[ArticleDetailResponse],
+    description="Returns a single article with its scraped content.",
+)
+async def get_article(
+    guid: str,
+    decoded_token=Depends(AccessTokenBearer()),
+    session: AsyncSession = Depends(get_read_session),
+) -> SuccessResponse[ArticleDetailResponse]:
+    article = await news_service.get_article_detail(guid=guid, session=session)
+    return SuccessResponse[ArticleDetailResponse](
+        status_code=status.HTTP_200_OK,
+        message="Returned Article Successfully",
+        data=article,
+    )
+
+
+async def _stream_feed_lines(
+    user_id: str, lookback_hours: int, format: Literal["ndjson", "sse"]
+):
+    # The session is opened here as it has to live as long as the response body
+    async with read_session() as session:
+        async for row in news_service.stream_feed(
+            user_id=user_id, session=session, lookback_hours=lookback_hours
+        ):
+            article = encode_feed_article(row)
+            if format == "sse":
+                yield b"data: " + article + b"\n\n"
+            else:
+                yield article + b"\n"
+    if format == "sse":
+        yield b"event: end\ndata: {}\n\n"
+
+
+@news_routes.get(
+    "/stream",
+    description="Streams the user's feed newest first, one article per NDJSON line or SSE event.",
+)
+async def stream_feed(
+    format: Literal["ndjson", "sse"] = "ndjson",
+    lookback_hours: int = Query(
+        default=CONFIG.FEED_LOOKBACK_HOURS, ge=1, le=CONFIG.FEED_MAX_LOOKBACK_HOURS
+    ),
+    decoded_token=Depends(AccessTokenBearer()),
+):
+    user_id = decoded_token["sub"]
+    return StreamingResponse(
+        _stream_feed_lines(
+            user_id=user_id, lookback_hours=lookback_hours, format=format
+        ),
+        media_type="text/event-stream" if format == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache"},
     )
@@ -1,29 +1,69 @@
-from sqlalchemy import select, delete, insert
+from sqlalchemy import (
+    select,
+    delete,
+    insert,
+    update,
+    func,
+    tuple_,
+    literal,
+    union_all,
+    all_,
+    and_,
+    cast,
+    union,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import sqlalchemy.dialects.postgresql as pg
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased, with_loader_criteria, joinedload
+from sqlalchemy.orm import aliased
 from sqlalchemy.exc import IntegrityError
-from typing import Sequence, List, Literal, Tuple
+from sqlalchemy.engine import Row
+from typing import AsyncIterator, Iterable, Sequence, List, Literal, Tuple
 import json
+import base64
 import asyncio
-import uuid
 from uuid import UUID
 from datetime import datetime, timezone, time, timedelta
 
 
+from app.db.schemas.ai_news_service import SEARCH_LANGUAGE
 from app.db.schemas import (
     Category,
     SubCategory,
     UserCategory,
     UserSubCategory,
     Articles,
+    ArticleContents,
+    Source,
 )
 from app.db.main import get_session
+from app.config import CONFIG
+from app.ai import (
+    TitleCategoryRecord,
+    ArticleVectorRecord,
+    make_title_record_id,
+    make_article_record_id,
+)
+from app.ai.components.vector_store import ArticleVectorStore, article_filter
+from app.services.news_buckets import NewsBucketStore, news_bucket_store
+from app.services.category_catalogue import CategoryCatalogue, category_catalogue
+from app.services.ranking import relevance_score
+from app.cache import FeedCache, feed_cache as default_feed_cache
+from app.serializers import encode_today_news, encode_feed_page
+from app.content_codec import ContentCodec, content_codec
 from app.models.ai_news_service import (
     GoogleNewsResponse,
     AnthropicNewsResponse,
     HackernoonResponse,
     OpenaiNewsResponse,
     TodayNewsResponse,
+    FeedArticleResponse,
+    FeedPageResponse,
+    ArticleDetailResponse,
+    SearchArticleResponse,
+    SearchPageResponse,
+    SemanticArticleResponse,
+    SemanticSearchResponse,
     ResponseCategoryDataModel,
     ResponseCategoryData,
     SetUsersCategoriesModel,
@@ -40,6 +80,8 @@ from app.exceptions import (
     SubCategoryAlreadyExistsError,
     CategoryNotFoundError,
     SubCategoryNotFoundError,
+    InvalidCursorError,
+    ArticleNotFoundError,
 )
 from loguru import logger
 
@@ -93,6 +135,9 @@ class BaseDBInteractions:
 
 
 class CategoriesDBService(BaseDBInteractions):
+    def __init__(self, catalogue: CategoryCatalogue | None = None):
+        self.catalogue: CategoryCatalogue = catalogue or category_catalogue
+
     @staticmethod
     async def _initialize_categories(session: AsyncSession):
 
@@ -141,88 +186,54 @@ class CategoriesDBService(BaseDBInteractions):
         self, session: AsyncSession
     ) -> ResponseCategoryDataModel:
         """Returs the full category and subcategory data from the table except custom ones."""
-        category_data = {"categories": []}
-        statement = (
-            select(Category)
-            .where(Category.added_by_users == False)
-            .options(
-                joinedload(Category.subcategories),
-                with_loader_criteria(
-                    SubCategory,
-                    SubCategory.added_by_users == False,
-                    include_aliases=True,
-                ),
-            )
-        )
-        result = await session.execute(statement)
-        categories = result.unique().scalars().all()
-        for category in categories:
-            single_cat_data = {
-                "category_id": category.category_id,
-                "title": category.title,
-                "subcategories": [
-                    {
-                        "subcategory_id": subcategory.subcategory_id,
-                        "title": subcategory.title,
-                    }
-                    for subcategory in category.subcategories
-                ],
-            }
-
-            category_data["categories"].append(single_cat_data)
-
-        return ResponseCategoryDataModel(**category_data)
+        catalogue = await self.catalogue.get(session=session)
+        return catalogue.categories_data
 
     async def get_subcategory_column(
         self, column: Literal["subcategory_id", "title"], session: AsyncSession
     ) -> List[str] | None:
         """Returns all the ids of subcategories."""
+        catalogue = await self.catalogue.get(session=session)
         match (column):
             case "subcategory_id":
-                statement = select(SubCategory.subcategory_id)
+                result = list(catalogue.subcategories.keys())
             case "title":
-                statement = select(SubCategory.title)
-        result = (await session.execute(statement)).scalars().all()
+                result = [node.title for node in catalogue.subcategories.values()]
         return result if result else None
 
     async def get_category_column(
         self, column: Literal["category_id", "title"], session: AsyncSession
     ) -> List[UUID] | List[str] | None:
         """Returns all the ids of subcategories."""
+        catalogue = await self.catalogue.get(session=session)
+        categories = [
+            node for node in catalogue.categories.values() if not node.added_by_users
+        ]
         match (column):
             case "category_id":
-                statement = select(Category.category_id).where(
-                    Category.added_by_users == False
-                )
+                result = [node.id for node in categories]
             case "title":
-                statement = select(Category.title).where(
-                    Category.added_by_users == False
-                )
-        result = (await session.execute(statement=statement)).scalars().all()
+                result = [node.title for node in categories]
         return result if result else None
 
     async def filter_not_existing_categories(
         self, categories_id: List[str], session: AsyncSession
     ) -> List[UUID] | List[str] | None:
         """Returns the category_id list from given category_ids which doesnn't exist in the db."""
-        existing_categories: List[str] = await self.get_category_column(
-            column="category_id", session=session
-        )
-        not_existing_categories = set(categories_id) - set(existing_categories)
+        catalogue = await self.catalogue.get(session=session)
+        not_existing_categories = catalogue.missing_categories(set(categories_id))
         if not_existing_categories:
-            return list(not_existing_categories)
+            return not_existing_categories
         return None
 
     async def filter_not_existing_subcategories(
         self, subcategories_id: List[str], session: AsyncSession
     ) -> List[str] | None:
         """Returns the subcategory_id list from given subcategory_ids which doesnn't exist in the db."""
-        existing_subcategories: List[str] = await self.get_subcategory_column(
-            column="subcategory_id", session=session
-        )
-        not_existing_subcategories = set(subcategories_id) - set(existing_subcategories)
+        catalogue = await self.catalogue.get(session=session)
+        not_existing_subcategories = catalogue.missing_subcategories(set(subcategories_id))
         if not_existing_subcategories:
-            return list(not_existing_subcategories)
+            return not_existing_subcategories
         return None
 
     async def get_subcategories_for_category_by_id(
@@ -249,7 +260,7 @@ class CategoriesDBService(BaseDBInteractions):
             if not_existing_categories:
                 raise AppError(
                     CategoryNotFoundError(
-                        message=f"Categories: '{" ".join(not_existing_categories)}' not found."
+                        message=f"Categories: '{" ".join(map(str, not_existing_categories))}' not found."
                     )
                 )
             user_categories_orm = [
@@ -265,7 +276,7 @@ class CategoriesDBService(BaseDBInteractions):
             if not_existing_subcategories:
                 raise AppError(
                     SubCategoryNotFoundError(
-                        message=f"Subcategory: '{" ".join(not_existing_subcategories)}' not found."
+                        message=f"Subcategory: '{" ".join(map(str, not_existing_subcategories))}' not found."
                     )
                 )
 
@@ -305,67 +316,204 @@ class CategoriesDBService(BaseDBInteractions):
         )
         return user_categories
 
+    @staticmethod
+    def _sync_user_selection_statement(
+        user_id: str,
+        category_ids: List[UUID],
+        insertable_category_ids: List[UUID],
+        subcategory_ids: List[UUID],
+    ):
+        """Single statement making the user's selection equal to the given ids. Rows not
+        given are deleted and missing ones inserted with `unnest`, the ids travel as two
+        array parameters however large the selection is.
+
+        Returns (table, kind, id) rows where kind is "current" (before the statement),
+        "removed" or "added"."""
+        user_uuid = literal(UUID(str(user_id)), pg.UUID(as_uuid=True))
+        uuid_array = pg.ARRAY(pg.UUID(as_uuid=True))
+        category_ids = literal(category_ids, uuid_array)
+        insertable_category_ids = literal(insertable_category_ids, uuid_array)
+        subcategory_ids = literal(subcategory_ids, uuid_array)
+
+        removed_categories = (
+            delete(UserCategory)
+            .where(
+                UserCategory.user_id == user_uuid,
+                UserCategory.category_id != all_(category_ids),
+            )
+            .returning(UserCategory.category_id)
+            .cte("removed_categories")
+        )
+        added_categories = (
+            pg_insert(UserCategory)
+            .from_select(
+                ["user_id", "category_id"],
+                select(user_uuid, func.unnest(insertable_category_ids)),
+            )
+            .on_conflict_do_nothing()
+            .returning(UserCategory.category_id)
+            .cte("added_categories")
+        )
+        removed_subcategories = (
+            delete(UserSubCategory)
+            .where(
+                UserSubCategory.user_id == user_uuid,
+                UserSubCategory.subcategory_id != all_(subcategory_ids),
+            )
+            .returning(UserSubCategory.subcategory_id)
+            .cte("removed_subcategories")
+        )
+        added_subcategories = (
+            pg_insert(UserSubCategory)
+            .from_select(
+                ["user_id", "subcategory_id"],
+                select(user_uuid, func.unnest(subcategory_ids)),
+            )
+            .on_conflict_do_nothing()
+            .returning(UserSubCategory.subcategory_id)
+            .cte("added_subcategories")
+        )
+
+        def rows(table: str, kind: str, id_column, *where):
+            return select(
+                literal(table).label("table"), literal(kind).label("kind"), id_column
+            ).where(*where)
+
+        return union_all(
+            rows(
+                "category",
+                "current",
+                UserCategory.category_id,
+                UserCategory.user_id == user_uuid,
+            ),
+            rows("category", "removed", removed_categories.c.category_id),
+            rows("category", "added", added_categories.c.category_id),
+            rows(
+                "subcategory",
+                "current",
+                UserSubCategory.subcategory_id,
+                UserSubCategory.user_id == user_uuid,
+            ),
+            rows("subcategory", "removed", removed_subcategories.c.subcategory_id),
+            rows("subcategory", "added", added_subcategories.c.subcategory_id),
+        )
+
     async def update_user_categories(
         self,
         user_id: str,
         categories_data: UpdateUsersCategoriesModel,
         session: AsyncSession,
     ) -> ResponseCategoryDataModel:
+        """Replaces the user's selection with the given one in one statement and one commit.
+        The response is built from the resulting diff and the catalogue."""
         categories_data: List[SetCategoriesData] = categories_data.categories_data
+        catalogue = await self.catalogue.get(session=session)
 
-        # Get current user categories and subcategories
-        current_user_subcategories: List[str] = await self.get_user_subcategories_id(
-            user_id=user_id, session=session
-        )
-
-        # Extract new subcategories from the update request
-        new_subcategories: List[str] = [
+        new_categories = {category.category_id for category in categories_data}
+        new_subcategories = {
             subcategory_id
             for category in categories_data
             for subcategory_id in category.subcategories
-        ]
-
-        # Determine which subcategories to add and remove
-        subcategories_to_add = set(new_subcategories) - set(current_user_subcategories)
-        subcategories_to_remove = set(current_user_subcategories) - set(
-            new_subcategories
-        )
+        }
 
-        # Delete old subcategories and categories
-        if subcategories_to_remove:
-            await self.delete_user_subcategories(
-                user_id=user_id,
-                subcategory_ids=list(subcategories_to_remove),
-                session=session,
+        not_existing_subcategories = catalogue.missing_subcategories(new_subcategories)
+        if not_existing_subcategories:
+            raise AppError(
+                SubCategoryNotFoundError(
+                    message=f"Subcategory: '{" ".join(map(str, not_existing_subcategories))}' not found."
+                )
             )
-
-        # Delete categories that are not in the new data
-        current_categories = {
+        # Custom categories can be kept by their owner but never added through an update
+        custom_categories = {
             category_id
-            for category_id in await self.get_user_categories_id(
-                user_id=user_id, session=session
-            )
+            for category_id in new_categories
+            if category_id in catalogue.categories
+            and catalogue.categories[category_id].added_by_users
         }
-
-        new_categories = {category.category_id for category in categories_data}
-        categories_to_remove = current_categories - new_categories
-        categories_to_add = new_categories - current_categories
-
-        for category_id in categories_to_remove:
-            await self.delete_user_category_and_subcategories_by_category_id(
-                user_id=user_id, category_id=category_id, session=session
+        not_existing_categories = catalogue.missing_categories(
+            new_categories - custom_categories
+        )
+        if not_existing_categories:
+            raise AppError(
+                CategoryNotFoundError(
+                    message=f"Categories: '{" ".join(map(str, not_existing_categories))}' not found."
+                )
             )
 
-        user_categories: ResponseCategoryDataModel = (
-            await self._add_existing_category_to_users(
-                user_id=user_id,
-                category_ids=list(categories_to_add),
-                subcategory_ids=list(subcategories_to_add),
-                session=session,
+        statement = CategoriesDBService._sync_user_selection_statement(
+            user_id=user_id,
+            category_ids=list(new_categories),
+            insertable_category_ids=list(new_categories - custom_categories),
+            subcategory_ids=list(new_subcategories),
+        )
+        diff = {
+            (table, kind): set()
+            for table in ("category", "subcategory")
+            for kind in ("current", "removed", "added")
+        }
+        for table, kind, id in (await session.execute(statement)).all():
+            diff[(table, kind)].add(id)
+
+        not_owned_categories = custom_categories - diff[("category", "current")]
+        if not_owned_categories:
+            await session.rollback()
+            raise AppError(
+                CategoryNotFoundError(
+                    message=f"Categories: '{" ".join(map(str, not_owned_categories))}' not found."
+                )
             )
+        await session.commit()
+
+        category_ids = (
+            diff[("category", "current")] - diff[("category", "removed")]
+        ) | diff[("category", "added")]
+        subcategory_ids = (
+            diff[("subcategory", "current")] - diff[("subcategory", "removed")]
+        ) | diff[("subcategory", "added")]
+
+        # The user's current selection can hold a category created by another worker
+        # after this snapshot, before its invalidation arrived
+        if catalogue.missing_subcategories(subcategory_ids) or any(
+            category_id not in catalogue.categories for category_id in category_ids
+        ):
+            self.catalogue.invalidate()
+            catalogue = await self.catalogue.get(session=session)
+
+        return CategoriesDBService._group_user_categories(
+            categories=(
+                (category_id, node.title)
+                for category_id in category_ids
+                if (node := catalogue.categories.get(category_id)) is not None
+            ),
+            subcategories=(
+                (subcategory_id, node.title, node.category_id)
+                for subcategory_id in subcategory_ids
+                if (node := catalogue.subcategories.get(subcategory_id)) is not None
+            ),
         )
 
-        return user_categories
+    @staticmethod
+    def _group_user_categories(
+        categories: Iterable[Tuple[UUID, str]],
+        subcategories: Iterable[Tuple[UUID, str, UUID]],
+    ) -> ResponseCategoryDataModel:
+        """Nests (subcategory_id, title, category_id) rows under their (category_id, title)
+        rows in one pass over each. Subcategories of categories not given are dropped."""
+        grouped = {
+            category_id: {
+                "category_id": category_id,
+                "title": title,
+                "subcategories": [],
+            }
+            for category_id, title in categories
+        }
+        for subcategory_id, title, category_id in subcategories:
+            category = grouped.get(category_id)
+            if category is not None:
+                category["subcategories"].append(
+                    {"subcategory_id": subcategory_id, "title": title}
+                )
+        return ResponseCategoryDataModel(categories_data=list(grouped.values()))
 
     async def delete_user_subcategories(
         self, user_id: str, subcategory_ids: List[str], session: AsyncSession
@@ -467,6 +615,8 @@ class CategoriesDBService(BaseDBInteractions):
 
             await session.commit()
 
+        await self.catalogue.publish_change()
+
         category_data_response: ResponseCategoryDataModel = (
             await self.get_user_categories(user_id=user_id, session=session)
         )
@@ -533,6 +683,8 @@ class CategoriesDBService(BaseDBInteractions):
             
                     await session.commit()
 
+        await self.catalogue.publish_change()
+
         # Background process to create records in pinecone remaining
 
         # Return updated user categories
@@ -562,57 +714,59 @@ class CategoriesDBService(BaseDBInteractions):
     async def get_user_categories(
         self, user_id: str, session: AsyncSession
     ) -> ResponseCategoryDataModel:
-        """Returns all the categories of the user and the subcategory in structured format."""
-        subq_categories = (
-            select(UserCategory).where(UserCategory.user_id == user_id).subquery()
-        )
-        user_cat_alias = aliased(UserCategory, subq_categories)
-        stmt_categories = select(user_cat_alias.category_id, Category.title).join(
-            Category, user_cat_alias.category_id == Category.category_id
-        )
-
-        subq_subcategories = (
-            select(UserSubCategory).where(UserSubCategory.user_id == user_id).subquery()
-        )
-        user_subcat_alias = aliased(UserSubCategory, subq_subcategories)
-        stmt_subcategories = select(
-            user_subcat_alias.subcategory_id, SubCategory.title, SubCategory.category_id
-        ).join(
-            SubCategory, user_subcat_alias.subcategory_id == SubCategory.subcategory_id
-        )
-
-        user_categories = await self.fetch_from_db(
-            statement=stmt_categories, session=session, to="rows"
-        )
-        user_subcategories = await self.fetch_from_db(
-            statement=stmt_subcategories, session=session, to="rows"
+        """Returns all the categories of the user and the subcategory in structured format.
+
+        Both selections are read with one statement, (kind, id, title, category_id) rows,
+        and nested with a dict keyed by category id."""
+        statement = union_all(
+            select(
+                literal("category").label("kind"),
+                UserCategory.category_id.label("id"),
+                Category.title,
+                Category.category_id,
+            )
+            .join(Category, UserCategory.category_id == Category.category_id)
+            .where(UserCategory.user_id == user_id),
+            select(
+                literal("subcategory").label("kind"),
+                UserSubCategory.subcategory_id.label("id"),
+                SubCategory.title,
+                SubCategory.category_id,
+            )
+            .join(
+                SubCategory,
+                UserSubCategory.subcategory_id == SubCategory.subcategory_id,
+            )
+            .where(UserSubCategory.user_id == user_id),
         )
-
-        category_data: ResponseCategoryDataModel = ResponseCategoryDataModel(
-            categories_data=[
-                ResponseCategoryData(
-                    **{
-                        "category_id": category_row[0],
-                        "title": category_row[1],
-                        "subcategories": [
-                            {"subcategory_id": subcategory[0], "title": subcategory[1]}
-                            for subcategory in user_subcategories
-                            if subcategory[2] == category_row[0]
-                        ],
-                    }
-                )
-                for category_row in user_categories
-            ]
+        rows = await self.fetch_from_db(statement=statement, session=session, to="rows")
+
+        categories, subcategories = [], []
+        for kind, id, title, category_id in rows:
+            if kind == "category":
+                categories.append((id, title))
+            else:
+                subcategories.append((id, title, category_id))
+        return CategoriesDBService._group_user_categories(
+            categories=categories, subcategories=subcategories
         )
-        return category_data
 
 
 class NewsDBService:
 
-    def __init__(self, category_service: CategoriesDBService | None = None):
+    def __init__(
+        self,
+        category_service: CategoriesDBService | None = None,
+        bucket_store: NewsBucketStore | None = None,
+        codec: ContentCodec | None = None,
+        feed_cache: FeedCache | None = None,
+    ):
         self.category_service: CategoriesDBService | None = (
             category_service or CategoriesDBService()
         )
+        self.bucket_store: NewsBucketStore = bucket_store or news_bucket_store
+        self.codec: ContentCodec = codec or content_codec
+        self.feed_cache: FeedCache = feed_cache or default_feed_cache
 
     @staticmethod
     async def get_separate_sources(articles: list[tuple]) -> Tuple[
@@ -631,8 +785,8 @@ class NewsDBService:
                 "title": row[0],
                 "url": row[1],
                 "description": row[2],
-                "category_id": row[3],
-                "subcategory_id": row[4],
+                "category_id": str(row[3]) if row[3] is not None else None,
+                "subcategory_id": str(row[4]) if row[4] is not None else None,
             }
             src = row[5]
             if src == "GOOGLE":
@@ -651,30 +805,43 @@ class NewsDBService:
             tuple(hackernoon_articles),
         )
 
-    async def get_today_news(
-        self, user_id: str, session: AsyncSession
-    ) -> TodayNewsResponse:
+    @staticmethod
+    def today_news_statement(user_id: str, top_k: int = CONFIG.FEED_TOP_K):
+        """Single statement of the user's `top_k` most relevant articles of the day. The
+        user's subcategories are joined server side and the articles side is an index
+        scan of `idx_articles_subcategory_published`, only the description comes from
+        the heap."""
         # Current time in UTC (or your DB timezone)
         now = datetime.now(timezone.utc)
         # THis is the filter after mindnight 12
         today = datetime.combine(now.date(), time(0, 0, 0, tzinfo=timezone.utc))
-        user_subcategories: List[str] = (
-            await self.category_service.get_user_subcategories_id(
-                user_id=user_id, session=session
+        return (
+            select(
+                Articles.title,
+                Articles.url,
+                Articles.description,
+                Articles.category_id,
+                Articles.subcategory_id,
+                Articles.source,
             )
+            .join(
+                UserSubCategory,
+                UserSubCategory.subcategory_id == Articles.subcategory_id,
+            )
+            .where(
+                UserSubCategory.user_id == user_id,
+                Articles.published_on >= today,
+                # One card per story, the partial feed index only holds these
+                Articles.is_canonical,
+            )
+            .order_by(relevance_score(now).desc(), Articles.guid)
+            .limit(top_k)
         )
 
-        statement = select(
-            Articles.title,
-            Articles.url,
-            Articles.description,
-            Articles.category_id,
-            Articles.subcategory_id,
-            Articles.source,
-        ).where(
-            Articles.published_on >= today,
-            Articles.subcategory_id.in_(user_subcategories),
-        )
+    async def get_today_news(
+        self, user_id: str, session: AsyncSession
+    ) -> TodayNewsResponse:
+        statement = NewsDBService.today_news_statement(user_id=user_id)
 
         result = await session.execute(statement)
         articles = result.all()
@@ -691,26 +858,638 @@ class NewsDBService:
         )
         return today_news_response
 
+    async def get_today_news_json(
+        self, user_id: str, session: AsyncSession, user_version: int = -1
+    ) -> bytes:
+        """Returns the serialized `TodayNewsResponse` of the user, assembled from the shared
+        subcategory buckets. Falls back to the database when they are not materialized.
+
+        `user_version` is the user's feed cache version read before this call, the
+        subcategory ids cached under it are used without a query."""
+        user_subcategories = await self.feed_cache.get_subcategories(
+            user_id=user_id, version=user_version
+        )
+        if user_subcategories is None:
+            user_subcategories = [
+                str(subcategory_id)
+                for subcategory_id in await self.category_service.get_user_subcategories_id(
+                    user_id=user_id, session=session
+                )
+            ]
+            await self.feed_cache.store_subcategories(
+                user_id=user_id, version=user_version, subcategory_ids=user_subcategories
+            )
+        today_news = await self.bucket_store.get_today_news_json(
+            subcategory_ids=user_subcategories
+        )
+        if today_news is not None:
+            return today_news
+
+        statement = NewsDBService.today_news_statement(user_id=user_id)
+        result = await session.execute(statement)
+        return encode_today_news(result.all())
+
+    @staticmethod
+    def encode_feed_cursor(published_on: datetime, guid: str) -> str:
+        raw = json.dumps([published_on.isoformat(), guid], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_feed_cursor(cursor: str) -> Tuple[datetime, str]:
+        try:
+            published_on, guid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(published_on), str(guid)
+        except (ValueError, TypeError):
+            raise AppError(InvalidCursorError())
+
+    @staticmethod
+    def feed_statement(user_id: str, lookback_hours: int):
+        """Statement of the user's `FEED_PAGE_COLUMNS` rows within the lookback window,
+        ordered by (published_on, guid) descending."""
+        lookback_hours = min(lookback_hours, CONFIG.FEED_MAX_LOOKBACK_HOURS)
+        since = datetime.now(timezone.utc) - timedelta(hours=lookback_hours)
+        return (
+            select(
+                Articles.guid,
+                Articles.published_on,
+                Articles.title,
+                Articles.url,
+                Articles.description,
+                Articles.category_id,
+                Articles.subcategory_id,
+                Articles.source,
+            )
+            .join(
+                UserSubCategory,
+                UserSubCategory.subcategory_id == Articles.subcategory_id,
+            )
+            .where(
+                UserSubCategory.user_id == user_id,
+                Articles.published_on >= since,
+                Articles.is_canonical,
+            )
+            .order_by(Articles.published_on.desc(), Articles.guid.desc())
+        )
+
+    async def stream_feed(
+        self,
+        user_id: str,
+        session: AsyncSession,
+        lookback_hours: int = CONFIG.FEED_LOOKBACK_HOURS,
+        batch_size: int = 200,
+    ) -> AsyncIterator[Row]:
+        """Yields the user's feed rows off a server side cursor, `batch_size` rows are
+        fetched at a time so memory stays bounded however long the window is."""
+        statement = NewsDBService.feed_statement(
+            user_id=user_id, lookback_hours=lookback_hours
+        ).execution_options(yield_per=batch_size)
+        result = await session.stream(statement)
+        async for row in result:
+            yield row
+
+    async def _fetch_feed_page(
+        self,
+        user_id: str,
+        session: AsyncSession,
+        cursor: str | None,
+        limit: int,
+        lookback_hours: int,
+    ) -> Tuple[Sequence[tuple], str | None]:
+        """Returns the `FEED_PAGE_COLUMNS` rows of the page and the cursor of the next one.
+        Keyset pagination keeps every page an index range scan however deep it is."""
+        limit = min(limit, CONFIG.FEED_MAX_PAGE_SIZE)
+        statement = NewsDBService.feed_statement(
+            user_id=user_id, lookback_hours=lookback_hours
+        ).limit(limit + 1)
+        if cursor is not None:
+            published_on, guid = NewsDBService.decode_feed_cursor(cursor)
+            statement = statement.where(
+                tuple_(Articles.published_on, Articles.guid) < tuple_(published_on, guid)
+            )
+
+        rows = (await session.execute(statement)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = NewsDBService.encode_feed_cursor(rows[-1][1], rows[-1][0])
+        return rows, next_cursor
+
+    async def get_feed_page(
+        self,
+        user_id: str,
+        session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = CONFIG.FEED_DEFAULT_PAGE_SIZE,
+        lookback_hours: int = CONFIG.FEED_LOOKBACK_HOURS,
+    ) -> FeedPageResponse:
+        """Returns a page of the user's feed ordered by (published_on, guid) descending."""
+        rows, next_cursor = await self._fetch_feed_page(
+            user_id, session, cursor, limit, lookback_hours
+        )
+        return FeedPageResponse(
+            articles=[
+                FeedArticleResponse(
+                    guid=row[0],
+                    published_on=row[1],
+                    title=row[2],
+                    url=row[3],
+                    description=row[4],
+                    category_id=str(row[5]) if row[5] is not None else None,
+                    subcategory_id=str(row[6]) if row[6] is not None else None,
+                    source=Source(row[7]).value,
+                )
+                for row in rows
+            ],
+            next_cursor=next_cursor,
+        )
+
+    async def get_feed_page_json(
+        self,
+        user_id: str,
+        session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = CONFIG.FEED_DEFAULT_PAGE_SIZE,
+        lookback_hours: int = CONFIG.FEED_LOOKBACK_HOURS,
+    ) -> bytes:
+        """Same as `get_feed_page` but serialized straight from the rows."""
+        rows, next_cursor = await self._fetch_feed_page(
+            user_id, session, cursor, limit, lookback_hours
+        )
+        return encode_feed_page(rows, next_cursor)
+
+    # Weight of body matches relative to title/description matches in the search rank
+    SEARCH_BODY_RANK_WEIGHT = 0.4
+
+    @staticmethod
+    def encode_search_cursor(rank: float, published_on: datetime, guid: str) -> str:
+        raw = json.dumps(
+            [rank, published_on.isoformat(), guid], separators=(",", ":")
+        )
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_search_cursor(cursor: str) -> Tuple[float, datetime, str]:
+        try:
+            rank, published_on, guid = json.loads(
+                base64.urlsafe_b64decode(cursor.encode())
+            )
+            return float(rank), datetime.fromisoformat(published_on), str(guid)
+        except (ValueError, TypeError):
+            raise AppError(InvalidCursorError())
+
+    @staticmethod
+    def search_statement(
+        query: str, user_id: str | None, lookback_days: int, include_body: bool = True
+    ):
+        """Statement of the `FEED_PAGE_COLUMNS` rows plus rank of the articles matching
+        the web search style `query`, best match first.
+
+        Title/description and body matches are collected separately so each side is a
+        bitmap scan on its GIN index, only the matches are ranked. With `user_id` the
+        results are restricted to the user's subcategories."""
+        lookback_days = min(lookback_days, CONFIG.SEARCH_MAX_LOOKBACK_DAYS)
+        since = datetime.now(timezone.utc) - timedelta(days=lookback_days)
+        tsquery = func.websearch_to_tsquery(SEARCH_LANGUAGE, query)
+
+        matches = select(Articles.guid, Articles.published_on).where(
+            Articles.search_vector.bool_op("@@")(tsquery),
+            Articles.published_on >= since,
+        )
+        rank = func.ts_rank_cd(Articles.search_vector, tsquery)
+        if include_body:
+            matches = union(
+                matches,
+                select(ArticleContents.guid, ArticleContents.published_on).where(
+                    ArticleContents.body_vector.bool_op("@@")(tsquery),
+                    ArticleContents.published_on >= since,
+                ),
+            )
+            rank = rank + NewsDBService.SEARCH_BODY_RANK_WEIGHT * func.coalesce(
+                func.ts_rank_cd(ArticleContents.body_vector, tsquery), 0
+            )
+        matches = matches.subquery("matches")
+        rank = cast(rank, pg.REAL)
+
+        statement = (
+            select(
+                Articles.guid,
+                Articles.published_on,
+                Articles.title,
+                Articles.url,
+                Articles.description,
+                Articles.category_id,
+                Articles.subcategory_id,
+                Articles.source,
+                rank.label("rank"),
+            )
+            .join(
+                matches,
+                and_(
+                    matches.c.guid == Articles.guid,
+                    matches.c.published_on == Articles.published_on,
+                ),
+            )
+            .where(Articles.published_on >= since)
+            .order_by(rank.desc(), Articles.published_on.desc(), Articles.guid.desc())
+        )
+        if include_body:
+            statement = statement.outerjoin(
+                ArticleContents,
+                and_(
+                    ArticleContents.guid == Articles.guid,
+                    ArticleContents.published_on == Articles.published_on,
+                ),
+            )
+        if user_id is not None:
+            statement = statement.where(
+                Articles.subcategory_id.in_(
+                    select(UserSubCategory.subcategory_id).where(
+                        UserSubCategory.user_id == user_id
+                    )
+                )
+            )
+        return statement, rank
+
+    async def search_articles(
+        self,
+        query: str,
+        session: AsyncSession,
+        user_id: str | None = None,
+        cursor: str | None = None,
+        limit: int = CONFIG.FEED_DEFAULT_PAGE_SIZE,
+        lookback_days: int = CONFIG.SEARCH_LOOKBACK_DAYS,
+        include_body: bool = True,
+    ) -> SearchPageResponse:
+        """Returns a page of the articles matching `query` ordered by (rank, published_on,
+        guid) descending, restricted to the subcategories of `user_id` when given."""
+        limit = min(limit, CONFIG.FEED_MAX_PAGE_SIZE)
+        statement, rank = NewsDBService.search_statement(
+            query=query,
+            user_id=user_id,
+            lookback_days=lookback_days,
+            include_body=include_body,
+        )
+        statement = statement.limit(limit + 1)
+        if cursor is not None:
+            last_rank, published_on, guid = NewsDBService.decode_search_cursor(cursor)
+            statement = statement.where(
+                tuple_(rank, Articles.published_on, Articles.guid)
+                < tuple_(cast(last_rank, pg.REAL), published_on, guid)
+            )
+
+        rows = (await session.execute(statement)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = NewsDBService.encode_search_cursor(
+                rows[-1][8], rows[-1][1], rows[-1][0]
+            )
+        return SearchPageResponse(
+            articles=[
+                SearchArticleResponse(
+                    guid=row[0],
+                    published_on=row[1],
+                    title=row[2],
+                    url=row[3],
+                    description=row[4],
+                    category_id=str(row[5]) if row[5] is not None else None,
+                    subcategory_id=str(row[6]) if row[6] is not None else None,
+                    source=Source(row[7]).value,
+                    rank=row[8],
+                )
+                for row in rows
+            ],
+            next_cursor=next_cursor,
+        )
+
+    async def semantic_search(
+        self,
+        query: str,
+        session: AsyncSession,
+        store: ArticleVectorStore,
+        user_id: str | None = None,
+        subcategory_ids: List[str] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        limit: int = CONFIG.FEED_DEFAULT_PAGE_SIZE,
+    ) -> SemanticSearchResponse:
+        """Returns the articles nearest to `query` in the vector store, best match first.
+        The filters are applied by the store, with `user_id` the subcategories are
+        narrowed to the user's ones. The hits are hydrated with one query, hits of
+        articles archived since they were indexed are dropped."""
+        limit = min(limit, CONFIG.SEMANTIC_SEARCH_MAX_RESULTS)
+        if user_id is not None:
+            user_subcategory_ids = {
+                str(id)
+                for id in await self.category_service.get_user_subcategories_id(
+                    user_id=user_id, session=session
+                )
+            }
+            subcategory_ids = (
+                user_subcategory_ids
+                if subcategory_ids is None
+                else user_subcategory_ids.intersection(subcategory_ids)
+            )
+            if not subcategory_ids:
+                return SemanticSearchResponse(articles=[])
+
+        hits = await store.search_articles(
+            query=query,
+            top_k=limit,
+            filter=article_filter(
+                subcategory_ids=subcategory_ids, since=since, until=until
+            ),
+        )
+        if not hits:
+            return SemanticSearchResponse(articles=[])
+
+        keys = [
+            (hit["guid"], datetime.fromisoformat(hit["published_on"])) for hit in hits
+        ]
+        published_on = [key[1] for key in keys]
+        statement = select(
+            Articles.guid,
+            Articles.published_on,
+            Articles.title,
+            Articles.url,
+            Articles.description,
+            Articles.category_id,
+            Articles.subcategory_id,
+            Articles.source,
+        ).where(
+            tuple_(Articles.guid, Articles.published_on).in_(keys),
+            # Lets the planner prune the partitions, the tuple list alone does not
+            Articles.published_on.between(min(published_on), max(published_on)),
+        )
+        rows = {
+            (row[0], row[1]): row for row in (await session.execute(statement)).all()
+        }
+
+        articles = []
+        for key, hit in zip(keys, hits):
+            row = rows.get(key)
+            if row is None:
+                continue
+            articles.append(
+                SemanticArticleResponse(
+                    guid=row[0],
+                    published_on=row[1],
+                    title=row[2],
+                    url=row[3],
+                    description=row[4],
+                    category_id=str(row[5]) if row[5] is not None else None,
+                    subcategory_id=str(row[6]) if row[6] is not None else None,
+                    source=Source(row[7]).value,
+                    score=hit["score"],
+                )
+            )
+        return SemanticSearchResponse(articles=articles)
+
+    async def get_article_detail(
+        self, guid: str, session: AsyncSession
+    ) -> ArticleDetailResponse:
+        """Returns the article with its body, the newest one if the guid was published
+        more than once."""
+        statement = (
+            select(
+                Articles.guid,
+                Articles.published_on,
+                Articles.title,
+                Articles.url,
+                Articles.description,
+                Articles.category_id,
+                Articles.subcategory_id,
+                Articles.source,
+                ArticleContents.summary,
+                ArticleContents.markdown_content,
+                ArticleContents.markdown_compressed,
+                ArticleContents.content_codec,
+            )
+            .outerjoin(
+                ArticleContents,
+                and_(
+                    ArticleContents.guid == Articles.guid,
+                    ArticleContents.published_on == Articles.published_on,
+                ),
+            )
+            .where(Articles.guid == guid)
+            .order_by(Articles.published_on.desc())
+            .limit(1)
+        )
+        row = (await session.execute(statement)).one_or_none()
+        if row is None:
+            raise AppError(
+                ArticleNotFoundError(message=f"Article: '{guid}' not found.")
+            )
+        return ArticleDetailResponse(
+            guid=row[0],
+            published_on=row[1],
+            title=row[2],
+            url=row[3],
+            description=row[4],
+            category_id=str(row[5]) if row[5] is not None else None,
+            subcategory_id=str(row[6]) if row[6] is not None else None,
+            source=Source(row[7]).value,
+            summary=row[8],
+            markdown_content=self.codec.decode(*row[9:]),
+        )
+
+    async def get_articles_to_summarize(
+        self,
+        session: AsyncSession,
+        limit: int,
+        lookback_hours: int = CONFIG.SUMMARY_LOOKBACK_HOURS,
+        exclude: Sequence[Tuple[str, datetime]] = (),
+    ) -> List[Tuple[str, datetime, str]]:
+        """Returns (guid, published_on, markdown) of the newest articles with a body but
+        no summary. Articles failing to summarize age out of the lookback window."""
+        since = datetime.now(timezone.utc) - timedelta(hours=lookback_hours)
+        statement = (
+            select(
+                ArticleContents.guid,
+                ArticleContents.published_on,
+                ArticleContents.markdown_content,
+                ArticleContents.markdown_compressed,
+                ArticleContents.content_codec,
+            )
+            .where(
+                ArticleContents.summary.is_(None),
+                (ArticleContents.markdown_content.is_not(None))
+                | (ArticleContents.markdown_compressed.is_not(None)),
+                ArticleContents.published_on >= since,
+            )
+            .order_by(ArticleContents.published_on.desc())
+            .limit(limit)
+        )
+        if exclude:
+            statement = statement.where(
+                tuple_(ArticleContents.guid, ArticleContents.published_on).not_in(
+                    list(exclude)
+                )
+            )
+        rows = (await session.execute(statement)).all()
+        return [(row[0], row[1], self.codec.decode(*row[2:])) for row in rows]
+
+    async def save_summaries(
+        self, summaries: List[Tuple[str, datetime, str]], session: AsyncSession
+    ):
+        """Writes the (guid, published_on, summary) summaries in one executemany."""
+        if not summaries:
+            return False
+        await session.execute(
+            update(ArticleContents),
+            [
+                {"guid": guid, "published_on": published_on, "summary": summary}
+                for guid, published_on, summary in summaries
+            ],
+        )
+        await session.commit()
+        return True
+
     async def get_records_for_pinecone(
         self,
         session: AsyncSession,
-    ) -> List[dict]:
-        records = []
+    ) -> List[TitleCategoryRecord]:
+        """Returns the title records of all the articles with content addressed ids."""
         statement = select(
             Articles.title, Articles.category_id, Articles.subcategory_id
         )
         result = await session.execute(statement)
+        records = {}
+        for row in result.all():
+            record = NewsDBService._to_title_record(*row)
+            records[record["id"]] = record
+        return list(records.values())
+
+    async def get_unindexed_records_for_pinecone(
+        self, session: AsyncSession, limit: int = 960
+    ) -> Tuple[List[TitleCategoryRecord], List[str]]:
+        """Returns the title records of the articles not yet upserted in pinecone and their guids.
+        Records sharing the same content collapse into one."""
+        statement = (
+            select(
+                Articles.guid,
+                Articles.title,
+                Articles.category_id,
+                Articles.subcategory_id,
+            )
+            .where(Articles.pinecone_indexed_at.is_(None))
+            .order_by(Articles.published_on)
+            .limit(limit)
+        )
+        result = await session.execute(statement)
         rows = result.all()
+        records = {}
         for row in rows:
-            records.append(
-                {
-                    "id": str(uuid.uuid4()),
-                    "title": row[0],
-                    "category": row[1],
-                    "subcategory": row[2],
-                }
+            record = NewsDBService._to_title_record(row[1], row[2], row[3])
+            records[record["id"]] = record
+        return list(records.values()), [row[0] for row in rows]
+
+    async def mark_articles_indexed(self, guids: List[str], session: AsyncSession):
+        """Moves the pinecone watermark of the given articles to now."""
+        if not guids:
+            return False
+        statement = (
+            update(Articles)
+            .where(Articles.guid.in_(guids))
+            .values(pinecone_indexed_at=func.now())
+        )
+        await session.execute(statement)
+        await session.commit()
+        return True
+
+    async def reset_pinecone_watermark(self, session: AsyncSession):
+        """Marks every article as not indexed so the next sync re-upserts all of them."""
+        statement = (
+            update(Articles)
+            .where(Articles.pinecone_indexed_at.is_not(None))
+            .values(pinecone_indexed_at=None)
+        )
+        await session.execute(statement)
+        await session.commit()
+        return True
+
+    async def get_unindexed_article_records(
+        self, session: AsyncSession, limit: int = 960
+    ) -> Tuple[List[ArticleVectorRecord], List[Tuple[str, datetime]]]:
+        """Returns the vector store records of the articles not yet upserted there and
+        their (guid, published_on) keys."""
+        statement = (
+            select(
+                Articles.guid,
+                Articles.published_on,
+                Articles.title,
+                Articles.description,
+                Articles.category_id,
+                Articles.subcategory_id,
+                Articles.source,
             )
-        return records
+            .where(Articles.vector_indexed_at.is_(None))
+            .order_by(Articles.published_on)
+            .limit(limit)
+        )
+        rows = (await session.execute(statement)).all()
+        records = [NewsDBService._to_article_record(*row) for row in rows]
+        return records, [(row[0], row[1]) for row in rows]
+
+    async def mark_articles_vector_indexed(
+        self, keys: List[Tuple[str, datetime]], session: AsyncSession
+    ):
+        """Moves the vector store watermark of the given articles to now."""
+        if not keys:
+            return False
+        statement = (
+            update(Articles)
+            .where(tuple_(Articles.guid, Articles.published_on).in_(keys))
+            .values(vector_indexed_at=func.now())
+        )
+        await session.execute(statement)
+        await session.commit()
+        return True
+
+    async def reset_vector_watermark(self, session: AsyncSession):
+        """Marks every article as not indexed so the next sync re-upserts all of them."""
+        statement = (
+            update(Articles)
+            .where(Articles.vector_indexed_at.is_not(None))
+            .values(vector_indexed_at=None)
+        )
+        await session.execute(statement)
+        await session.commit()
+        return True
+
+    @staticmethod
+    def _to_article_record(
+        guid: str,
+        published_on: datetime,
+        title: str,
+        description: str,
+        category_id,
+        subcategory_id,
+        source,
+    ) -> ArticleVectorRecord:
+        published_on_iso = published_on.isoformat()
+        return {
+            "id": make_article_record_id(guid, published_on_iso),
+            # llama-text-embed-v2 truncates long inputs itself
+            "title": f"{title}\n{description}",
+            "guid": guid,
+            "published_on": published_on_iso,
+            "published_ts": int(published_on.timestamp()),
+            "category_id": str(category_id),
+            "subcategory_id": str(subcategory_id) if subcategory_id is not None else "",
+            "source": Source(source).value,
+        }
+
+    @staticmethod
+    def _to_title_record(title: str, category_id, subcategory_id) -> TitleCategoryRecord:
+        category, subcategory = str(category_id), str(subcategory_id)
+        return {
+            "id": make_title_record_id(title, category, subcategory),
+            "title": title,
+            "category": category,
+            "subcategory": subcategory,
+        }
 
     async def create_article(
         self,
@@ -733,13 +1512,61 @@ class NewsDBService:
         return True
 
     async def check_guid(self, guid: str, source: str, session: AsyncSession):
-        """Check the existence of guid of articles object."""
-        statement = select(Articles).where(
-            Articles.guid == guid and Articles.source == source
+        """Returns the guid if an article of the source has it, None otherwise."""
+        statement = (
+            select(Articles.guid)
+            .where(Articles.guid == guid, Articles.source == source)
+            .limit(1)
         )
         result = await session.execute(statement)
         return result.scalar_one_or_none()
 
+    async def get_story_signatures(
+        self,
+        session: AsyncSession,
+        window_hours: int = CONFIG.STORY_CLUSTER_WINDOW_HOURS,
+    ) -> Sequence[Row]:
+        """Returns (guid, cluster_id, minhash, category_id, subcategory_id,
+        category_confidence, subcategory_confidence) of the clustered articles of the
+        window, the incoming ones are matched against them."""
+        since = datetime.now(timezone.utc) - timedelta(hours=window_hours)
+        statement = select(
+            Articles.guid,
+            Articles.cluster_id,
+            Articles.minhash,
+            Articles.category_id,
+            Articles.subcategory_id,
+            Articles.category_confidence,
+            Articles.subcategory_confidence,
+        ).where(Articles.published_on >= since, Articles.minhash.is_not(None))
+        result = await session.execute(statement)
+        return result.all()
+
+    async def refresh_cluster_sizes(
+        self, cluster_ids: Iterable[str], session: AsyncSession
+    ):
+        """Recounts the members of the given clusters onto their canonical article."""
+        cluster_ids = list(set(cluster_ids))
+        if not cluster_ids:
+            return False
+        sizes = (
+            select(Articles.cluster_id, func.count().label("size"))
+            .where(Articles.cluster_id.in_(cluster_ids))
+            .group_by(Articles.cluster_id)
+            .subquery("sizes")
+        )
+        statement = (
+            update(Articles)
+            .where(
+                Articles.guid == sizes.c.cluster_id,
+                Articles.cluster_id == sizes.c.cluster_id,
+            )
+            .values(cluster_size=sizes.c.size)
+        )
+        await session.execute(statement)
+        await session.commit()
+        return True
+
     async def get_all_guids(
         self, session: AsyncSession, source: str, cutoff_hours: int | None = 24
     ) -> list[str]:
@@ -0,0 +1,204 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List
+from uuid import UUID
+
+from loguru import logger
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import get_redis, data_versions, DataVersions
+from app.config import CONFIG
+from app.db.main import Session
+from app.db.schemas import Category, SubCategory
+from app.models.ai_news_service import ResponseCategoryDataModel
+
+
+@dataclass(frozen=True)
+class CatalogueNode:
+    id: UUID
+    title: str
+    added_by_users: bool
+    # Parent category of a subcategory, None for categories
+    category_id: UUID | None = None
+
+
+@dataclass
+class CatalogueSnapshot:
+    """Read-only view of the category tree as loaded at `version`."""
+
+    version: int
+    loaded_at: float
+    categories: Dict[UUID, CatalogueNode] = field(default_factory=dict)
+    subcategories: Dict[UUID, CatalogueNode] = field(default_factory=dict)
+    subcategories_by_category: Dict[UUID, List[UUID]] = field(default_factory=dict)
+    # Prebuilt response of the non custom tree, see CategoriesDBService.get_categories_data
+    categories_data: ResponseCategoryDataModel | None = None
+
+    def missing_categories(self, category_ids: Iterable[UUID]) -> List[UUID]:
+        """Returns the ids which are not a non custom category."""
+        return [
+            category_id
+            for category_id in category_ids
+            if (node := self.categories.get(category_id)) is None or node.added_by_users
+        ]
+
+    def missing_subcategories(self, subcategory_ids: Iterable[UUID]) -> List[UUID]:
+        """Returns the ids which are not a subcategory."""
+        return [
+            subcategory_id
+            for subcategory_id in subcategory_ids
+            if subcategory_id not in self.subcategories
+        ]
+
+
+class CategoryCatalogue:
+    """Process wide cache of the category and subcategory tables.
+
+    The tables are read once and kept as an id -> node index. A change made by any
+    worker bumps the catalogue version and is published on `INVALIDATE_CHANNEL`, every
+    worker listening marks its snapshot stale. Snapshots older than `max_age` are
+    reloaded too, which covers processes that do not listen (celery workers).
+
+    The snapshot is usually loaded through a replica session. For `primary_window`
+    seconds after an invalidation it is loaded from the primary instead, so a change
+    that has not replicated yet is not cached for `max_age`.
+    """
+
+    INVALIDATE_CHANNEL = "news:catalogue:invalidate"
+
+    def __init__(
+        self,
+        max_age: int = CONFIG.CATEGORY_CATALOGUE_MAX_AGE_SECONDS,
+        primary_window: float = CONFIG.DB_REPLICA_MAX_LAG_SECONDS,
+    ):
+        self.max_age = max_age
+        self.primary_window = primary_window
+        self._invalidated_at = -primary_window
+        self._snapshot: CatalogueSnapshot | None = None
+        self._lock = asyncio.Lock()
+        # Bumped on invalidation so a load racing with a change is not kept
+        self._generation = 0
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._snapshot is not None
+            and time.monotonic() - self._snapshot.loaded_at < self.max_age
+        )
+
+    async def get(self, session: AsyncSession) -> CatalogueSnapshot:
+        """Returns the current snapshot, loading it when stale."""
+        if self._is_fresh():
+            return self._snapshot
+        async with self._lock:
+            if self._is_fresh():
+                return self._snapshot
+            generation = self._generation
+            if (
+                session.info.get("replica")
+                and time.monotonic() - self._invalidated_at < self.primary_window
+            ):
+                async with Session() as primary_session:
+                    snapshot = await self._load(session=primary_session)
+            else:
+                snapshot = await self._load(session=session)
+            if generation == self._generation:
+                self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        self._generation = self._generation + 1
+        self._invalidated_at = time.monotonic()
+        self._snapshot = None
+
+    async def publish_change(self):
+        """Call after categories or subcategories are created."""
+        self.invalidate()
+        await data_versions.bump(DataVersions.CATALOGUE_KEY)
+        try:
+            await get_redis().publish(self.INVALIDATE_CHANNEL, b"1")
+        except RedisError as exc:
+            logger.warning(f"Publishing catalogue change failed: {exc}")
+
+    async def listen(self):
+        """Marks the snapshot stale on every published change. Runs for the lifetime of
+        the app and reconnects when redis goes away."""
+        while True:
+            try:
+                pubsub = get_redis().pubsub()
+                await pubsub.subscribe(self.INVALIDATE_CHANNEL)
+                # Changes missed while not subscribed
+                self.invalidate()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.invalidate()
+            except RedisError as exc:
+                logger.warning(f"Catalogue listener disconnected: {exc}")
+                await asyncio.sleep(5)
+
+    async def _load(self, session: AsyncSession) -> CatalogueSnapshot:
+        versions = await data_versions.get(DataVersions.CATALOGUE_KEY)
+        snapshot = CatalogueSnapshot(
+            version=versions[0] if versions else -1, loaded_at=time.monotonic()
+        )
+
+        categories = await session.execute(
+            select(Category.category_id, Category.title, Category.added_by_users)
+        )
+        for category_id, title, added_by_users in categories.all():
+            snapshot.categories[category_id] = CatalogueNode(
+                id=category_id, title=title, added_by_users=added_by_users
+            )
+            snapshot.subcategories_by_category[category_id] = []
+
+        subcategories = await session.execute(
+            select(
+                SubCategory.subcategory_id,
+                SubCategory.title,
+                SubCategory.added_by_users,
+                SubCategory.category_id,
+            )
+        )
+        for subcategory_id, title, added_by_users, category_id in subcategories.all():
+            snapshot.subcategories[subcategory_id] = CatalogueNode(
+                id=subcategory_id,
+                title=title,
+                added_by_users=added_by_users,
+                category_id=category_id,
+            )
+            snapshot.subcategories_by_category.setdefault(category_id, []).append(
+                subcategory_id
+            )
+
+        snapshot.categories_data = ResponseCategoryDataModel(
+            categories_data=[
+                {
+                    "category_id": category.id,
+                    "title": category.title,
+                    "subcategories": [
+                        {
+                            "subcategory_id": subcategory.id,
+                            "title": subcategory.title,
+                        }
+                        for subcategory_id in snapshot.subcategories_by_category[
+                            category.id
+                        ]
+                        if not (
+                            subcategory := snapshot.subcategories[subcategory_id]
+                        ).added_by_users
+                    ],
+                }
+                for category in snapshot.categories.values()
+                if not category.added_by_users
+            ]
+        )
+        logger.info(
+            f"Loaded category catalogue v{snapshot.version}: {len(snapshot.categories)} "
+            f"categories, {len(snapshot.subcategories)} subcategories."
+        )
+        return snapshot
+
+
+category_catalogue = CategoryCatalogue()
@@ -0,0 +1,299 @@
+import hashlib
+import time
+from collections import defaultdict
+from datetime import datetime, timezone, time as dt_time
+from typing import Dict, List, Sequence, Tuple
+from uuid import UUID
+
+import orjson
+from loguru import logger
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import get_redis, FeedCache, FeedLookup, feed_cache
+from app.response import encode_success_response
+from app.config import CONFIG
+from app.db.schemas import Articles, UserSubCategory, Source
+from app.serializers import FEED_PAGE_COLUMNS
+from app.services.category_catalogue import CategoryCatalogue, category_catalogue
+from app.services.news_buckets import news_bucket_store
+from app.services.ranking import relevance_score
+
+
+class DigestStore:
+    """Today's digest of each active user, precomputed after every ingestion.
+
+    A digest is the user's articles of the day grouped by subcategory, one per story,
+    ranked by relevance and capped per subcategory. It only depends on the set of
+    subcategories, so it is built once per distinct set and stored under the hash of
+    the set. Each user gets a pointer `{user version}:{set hash}` to it, serving the
+    digest is a single lua call which also records the user as active. The pointer is
+    ignored once the user's category version moved, i.e. the categories were edited.
+
+    The same job precomputes the `/news/get/news` response of each active user into
+    the `FeedCache`, so the feed is a key lookup after an ingestion as well. Users are
+    active when they called either endpoint in the last `active_days`.
+    """
+
+    DIGEST_KEY = "news:digest:{day}:{set_hash}"
+    USER_KEY = "news:digest:user:{user_id}"
+    ACTIVE_KEY = FeedCache.ACTIVE_USERS_KEY
+
+    # KEYS: user pointer, user version, active users. ARGV: digest key prefix, now, user id
+    LOOKUP_SCRIPT = """
+    redis.call('ZADD', KEYS[3], ARGV[2], ARGV[3])
+    local pointer = redis.call('GET', KEYS[1])
+    if not pointer then
+        return false
+    end
+    local separator = string.find(pointer, ':', 1, true)
+    local version = redis.call('GET', KEYS[2]) or '0'
+    if string.sub(pointer, 1, separator - 1) ~= version then
+        return false
+    end
+    return redis.call('GET', ARGV[1] .. string.sub(pointer, separator + 1))
+    """
+
+    def __init__(
+        self,
+        catalogue: CategoryCatalogue | None = None,
+        articles_per_subcategory: int = CONFIG.DIGEST_ARTICLES_PER_SUBCATEGORY,
+        active_days: int = CONFIG.DIGEST_ACTIVE_DAYS,
+        ttl: int = CONFIG.DIGEST_TTL_SECONDS,
+    ):
+        self.catalogue = catalogue or category_catalogue
+        self.articles_per_subcategory = articles_per_subcategory
+        self.active_days = active_days
+        self.ttl = ttl
+
+    @staticmethod
+    def _today() -> Tuple[str, datetime]:
+        now = datetime.now(timezone.utc)
+        midnight = datetime.combine(now.date(), dt_time(0, 0, 0, tzinfo=timezone.utc))
+        return now.date().isoformat(), midnight
+
+    @staticmethod
+    def set_hash(subcategory_ids: Sequence[UUID | str]) -> str:
+        key = ",".join(sorted({str(subcategory_id) for subcategory_id in subcategory_ids}))
+        return hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+
+    def _digest_key_prefix(self, day: str) -> str:
+        return self.DIGEST_KEY.format(day=day, set_hash="")
+
+    async def _load_articles(
+        self,
+        session: AsyncSession,
+        midnight: datetime,
+        subcategory_ids: Sequence[UUID | str] | None = None,
+    ) -> Dict[str, List[dict]]:
+        """Today's canonical articles by subcategory, most relevant first."""
+        statement = (
+            select(
+                Articles.guid,
+                Articles.published_on,
+                Articles.title,
+                Articles.url,
+                Articles.description,
+                Articles.category_id,
+                Articles.subcategory_id,
+                Articles.source,
+            )
+            .where(
+                Articles.published_on >= midnight,
+                Articles.subcategory_id.is_not(None),
+                Articles.is_canonical,
+            )
+            .order_by(relevance_score().desc(), Articles.guid)
+        )
+        if subcategory_ids is not None:
+            statement = statement.where(Articles.subcategory_id.in_(subcategory_ids))
+        rows = (await session.execute(statement)).all()
+
+        articles: Dict[str, List[dict]] = defaultdict(list)
+        for row in rows:
+            articles[str(row[6])].append(
+                dict(zip(FEED_PAGE_COLUMNS, (*row[:7], Source(row[7]).value)))
+            )
+        return articles
+
+    def _encode_digest(
+        self,
+        day: str,
+        subcategory_ids: Sequence[str],
+        articles: Dict[str, List[dict]],
+        titles: Dict[str, str],
+    ) -> bytes:
+        """Encodes the digest of a subcategory set like `DigestResponse`."""
+        subcategories = []
+        # Copies of a story that escaped the clustering usually share the url, only
+        # the first one within the set is kept
+        seen_urls = set()
+        for subcategory_id in sorted(
+            set(subcategory_ids), key=lambda id: titles.get(id, id)
+        ):
+            subcategory_articles = []
+            for article in articles.get(subcategory_id, ()):
+                if len(subcategory_articles) >= self.articles_per_subcategory:
+                    break
+                if article["url"] in seen_urls:
+                    continue
+                seen_urls.add(article["url"])
+                subcategory_articles.append(article)
+            if subcategory_articles:
+                subcategories.append(
+                    {
+                        "subcategory_id": subcategory_id,
+                        "title": titles.get(subcategory_id, ""),
+                        "articles": subcategory_articles,
+                    }
+                )
+        return orjson.dumps(
+            {
+                "day": day,
+                "generated_at": datetime.now(timezone.utc),
+                "subcategories": subcategories,
+            }
+        )
+
+    async def _titles(self, session: AsyncSession) -> Dict[str, str]:
+        snapshot = await self.catalogue.get(session=session)
+        return {str(id): node.title for id, node in snapshot.subcategories.items()}
+
+    async def refresh(self, session: AsyncSession) -> Tuple[int, int]:
+        """Precomputes the digests and feeds of the users active in the last
+        `active_days`. Returns the number of users and of distinct digests built."""
+        day, midnight = self._today()
+        redis = get_redis()
+        user_ids = [
+            user_id.decode()
+            for user_id in await redis.zrangebyscore(
+                self.ACTIVE_KEY, time.time() - self.active_days * 24 * 60 * 60, "+inf"
+            )
+        ]
+        await redis.zremrangebyscore(
+            self.ACTIVE_KEY, "-inf", time.time() - self.active_days * 24 * 60 * 60
+        )
+        if not user_ids:
+            return 0, 0
+
+        # Read before the subcategories and the articles, an edit or an ingestion in
+        # between moves the version or the epoch past it
+        epoch, *versions = await redis.mget(
+            FeedCache.EPOCH_KEY,
+            *(FeedCache.USER_VERSION_KEY.format(user_id=user_id) for user_id in user_ids),
+        )
+        user_subcategories: Dict[str, List[str]] = defaultdict(list)
+        rows = await session.execute(
+            select(UserSubCategory.user_id, UserSubCategory.subcategory_id).where(
+                UserSubCategory.user_id.in_(user_ids)
+            )
+        )
+        for user_id, subcategory_id in rows.all():
+            user_subcategories[str(user_id)].append(str(subcategory_id))
+
+        articles = await self._load_articles(session=session, midnight=midnight)
+        titles = await self._titles(session=session)
+
+        digests: Dict[str, bytes] = {}
+        feeds: Dict[str, bytes | None] = {}
+        pointers: Dict[str, str] = {}
+        feed_entries: Dict[str, FeedLookup] = {}
+        for user_id, version in zip(user_ids, versions):
+            subcategory_ids = user_subcategories.get(user_id, [])
+            set_hash = self.set_hash(subcategory_ids)
+            if set_hash not in digests:
+                digests[set_hash] = self._encode_digest(
+                    day, subcategory_ids, articles, titles
+                )
+                # None when the buckets are not materialized, the feed builds it then
+                today_news = await news_bucket_store.get_today_news_json(
+                    subcategory_ids=subcategory_ids
+                )
+                feeds[set_hash] = today_news and encode_success_response(
+                    data=today_news, message=FeedCache.RESPONSE_MESSAGE
+                )
+            pointers[user_id] = f"{int(version or 0)}:{set_hash}"
+            if feeds[set_hash] is not None:
+                feed_entries[user_id] = FeedLookup(
+                    epoch=int(epoch or 0),
+                    version=int(version or 0),
+                    day=day,
+                    payload=feeds[set_hash],
+                )
+
+        pipe = redis.pipeline(transaction=False)
+        for set_hash, digest in digests.items():
+            pipe.set(self.DIGEST_KEY.format(day=day, set_hash=set_hash), digest, ex=self.ttl)
+        for user_id, pointer in pointers.items():
+            pipe.set(self.USER_KEY.format(user_id=user_id), pointer, ex=self.ttl)
+        await pipe.execute()
+        await feed_cache.store_many(feed_entries)
+
+        logger.info(
+            f"Precomputed digests of {len(pointers)} users from {len(digests)} subcategory "
+            f"sets and {len(feed_entries)} feeds."
+        )
+        return len(pointers), len(digests)
+
+    async def lookup(self, user_id: str) -> bytes | None:
+        """Returns the user's precomputed digest JSON of today, None on a miss."""
+        day, _ = self._today()
+        try:
+            return await get_redis().eval(
+                self.LOOKUP_SCRIPT,
+                3,
+                self.USER_KEY.format(user_id=user_id),
+                FeedCache.USER_VERSION_KEY.format(user_id=user_id),
+                self.ACTIVE_KEY,
+                self._digest_key_prefix(day),
+                time.time(),
+                user_id,
+            )
+        except RedisError as exc:
+            logger.warning(f"Digest lookup failed: {exc}")
+            return None
+
+    async def build(
+        self, user_id: str, session: AsyncSession, primary_session: AsyncSession
+    ) -> bytes:
+        """Builds the user's digest on a miss and stores it for the other users of the
+        same subcategory set. The articles are read with `session`, which may be a
+        replica. The subcategories are read from the primary: the pointer is written
+        under the current user version and must not hold the set before an edit."""
+        day, midnight = self._today()
+        try:
+            version = await get_redis().get(
+                FeedCache.USER_VERSION_KEY.format(user_id=user_id)
+            )
+        except RedisError:
+            version = None
+        result = await primary_session.execute(
+            select(UserSubCategory.subcategory_id).where(
+                UserSubCategory.user_id == user_id
+            )
+        )
+        subcategory_ids = [str(subcategory_id) for subcategory_id in result.scalars()]
+        articles = await self._load_articles(
+            session=session, midnight=midnight, subcategory_ids=subcategory_ids
+        )
+        digest = self._encode_digest(
+            day, subcategory_ids, articles, await self._titles(session=session)
+        )
+
+        set_hash = self.set_hash(subcategory_ids)
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.set(self.DIGEST_KEY.format(day=day, set_hash=set_hash), digest, ex=self.ttl)
+            pipe.set(
+                self.USER_KEY.format(user_id=user_id),
+                f"{int(version or 0)}:{set_hash}",
+                ex=self.ttl,
+            )
+            await pipe.execute()
+        except RedisError as exc:
+            logger.warning(f"Storing the digest of {user_id} failed: {exc}")
+        return digest
+
+
+digest_store = DigestStore()
@@ -0,0 +1,162 @@
+import heapq
+import struct
+from collections import defaultdict
+from datetime import datetime, timezone, time
+from typing import Dict, List, Sequence, Tuple
+from uuid import UUID
+
+from loguru import logger
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import get_redis
+from app.config import CONFIG
+from app.db.schemas import Articles, Source
+from app.serializers import encode_article
+from app.services.ranking import relevance_score
+
+
+class NewsBucketStore:
+    """Today's articles materialized once per subcategory and source, shared by all users.
+
+    Each bucket is a redis hash field `{subcategory_id}:{source}` holding the already
+    serialized articles joined by commas, so a user's feed is assembled by
+    concatenating the buckets of their subcategories without touching the database.
+    The `{field}:rank` field next to it holds the relevance score and end offset of
+    each article, the top articles of the user are picked by slicing the buckets.
+    """
+
+    BUCKET_KEY = "news:buckets:{day}"
+    BUILT_AT_FIELD = "__built_at"
+    BUCKET_TTL_SECONDS = 2 * 24 * 60 * 60
+    # (score, end offset in the bucket) of each article of a bucket
+    RANK_ENTRY = struct.Struct("<fI")
+
+    @staticmethod
+    def _today() -> Tuple[str, datetime]:
+        now = datetime.now(timezone.utc)
+        midnight = datetime.combine(now.date(), time(0, 0, 0, tzinfo=timezone.utc))
+        return now.date().isoformat(), midnight
+
+    @staticmethod
+    def _field(subcategory_id: UUID | str, source: str) -> str:
+        return f"{subcategory_id}:{source}"
+
+    @staticmethod
+    def _rank_field(field: str) -> str:
+        return f"{field}:rank"
+
+    @classmethod
+    def _rank_entries(cls, bucket: bytes, rank: bytes) -> List[Tuple[float, bytes]]:
+        entries, start = [], 0
+        for score, end in cls.RANK_ENTRY.iter_unpack(rank):
+            entries.append((score, bucket[start:end]))
+            # Skips the comma
+            start = end + 1
+        return entries
+
+    async def refresh(self, session: AsyncSession) -> int:
+        """Rebuilds today's buckets from the database. Run after every ingestion."""
+        day, midnight = self._today()
+        score = relevance_score()
+        statement = (
+            select(
+                Articles.title,
+                Articles.url,
+                Articles.description,
+                Articles.category_id,
+                Articles.subcategory_id,
+                Articles.source,
+                score,
+            )
+            .where(
+                Articles.published_on >= midnight,
+                Articles.subcategory_id.is_not(None),
+                Articles.is_canonical,
+            )
+            .order_by(score.desc())
+        )
+        rows = (await session.execute(statement)).all()
+
+        buckets: Dict[str, List[Tuple[float, bytes]]] = defaultdict(list)
+        for row in rows:
+            source = Source(row[5]).value
+            buckets[self._field(row[4], source)].append(
+                (row[6], encode_article((*row[:5], source)))
+            )
+
+        mapping = {}
+        for field, items in buckets.items():
+            mapping[field] = b",".join(article for _, article in items)
+            rank, end = [], -1
+            for item_score, article in items:
+                end += 1 + len(article)
+                rank.append(self.RANK_ENTRY.pack(item_score, end))
+            mapping[self._rank_field(field)] = b"".join(rank)
+        mapping[self.BUILT_AT_FIELD] = datetime.now(timezone.utc).isoformat()
+
+        key = self.BUCKET_KEY.format(day=day)
+        building_key = f"{key}:building"
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.delete(building_key)
+        pipe.hset(building_key, mapping=mapping)
+        pipe.expire(building_key, self.BUCKET_TTL_SECONDS)
+        pipe.rename(building_key, key)
+        await pipe.execute()
+
+        logger.info(f"Materialized {len(rows)} articles into {len(buckets)} buckets.")
+        return len(rows)
+
+    async def get_today_news_json(
+        self, subcategory_ids: Sequence[UUID | str], top_k: int = CONFIG.FEED_TOP_K
+    ) -> bytes | None:
+        """Returns the `TodayNewsResponse` JSON of the `top_k` most relevant articles of
+        the given subcategories, or None when today's buckets are not materialized yet."""
+        day, _ = self._today()
+        sources = [source.value for source in Source]
+        fields = [
+            self._field(subcategory_id, source)
+            for source in sources
+            for subcategory_id in subcategory_ids
+        ]
+        try:
+            values = await get_redis().hmget(
+                self.BUCKET_KEY.format(day=day),
+                [
+                    self.BUILT_AT_FIELD,
+                    *fields,
+                    *(self._rank_field(field) for field in fields),
+                ],
+            )
+        except RedisError as exc:
+            logger.warning(f"News buckets lookup failed: {exc}")
+            return None
+
+        if values[0] is None:
+            return None
+
+        per_source = len(subcategory_ids)
+        buckets, ranks = values[1 : 1 + len(fields)], values[1 + len(fields) :]
+        # Materialized before the ranking, the database ranks them
+        if any(bucket and not rank for bucket, rank in zip(buckets, ranks)):
+            return None
+        candidates = [
+            (score, i // per_source, article)
+            for i, (bucket, rank) in enumerate(zip(buckets, ranks))
+            if bucket
+            for score, article in self._rank_entries(bucket, rank)
+        ]
+        grouped: List[List[bytes]] = [[] for _ in sources]
+        for _, source_index, article in heapq.nlargest(
+            top_k, candidates, key=lambda candidate: candidate[0]
+        ):
+            grouped[source_index].append(article)
+
+        parts = []
+        for source, items in zip(sources, grouped):
+            parts.append(b'"' + source.lower().encode() + b'":[' + b",".join(items) + b"]")
+        return b"{" + b",".join(parts) + b"}"
+
+
+news_bucket_store = NewsBucketStore()
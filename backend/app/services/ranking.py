@@ -0,0 +1,44 @@
+"""Relevance score of the feed articles, computed in SQL over the candidate rows.
+
+    score = confidence * source weight * (1 + cluster weight * ln(cluster size))
+            * 0.5 ^ (age in hours / half life)
+
+The confidence is the product of the classifier's category and subcategory
+confidences, articles stored without them count as `UNKNOWN_CONFIDENCE`. A story
+reported by several sources is more relevant, its canonical article carries the size
+of the cluster. The decay is exponential so the order of two articles does not change
+as time passes, scores computed at the same `now` stay comparable.
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import case, cast, func, literal
+import sqlalchemy.dialects.postgresql as pg
+
+from app.config import CONFIG
+from app.db.schemas import Articles, Source
+
+
+UNKNOWN_CONFIDENCE = 0.5
+
+
+def relevance_score(now: datetime | None = None):
+    """SQL expression of the relevance score of an `Articles` row at `now`."""
+    now = now or datetime.now(timezone.utc)
+    confidence = func.coalesce(
+        Articles.category_confidence, UNKNOWN_CONFIDENCE
+    ) * func.coalesce(Articles.subcategory_confidence, UNKNOWN_CONFIDENCE)
+    source_weight = case(
+        *(
+            (Articles.source == source, CONFIG.FEED_SOURCE_WEIGHTS.get(source.value, 1.0))
+            for source in Source
+        ),
+        else_=1.0,
+    )
+    cluster_boost = 1 + CONFIG.FEED_CLUSTER_SIZE_WEIGHT * func.ln(
+        func.greatest(Articles.cluster_size, 1)
+    )
+    age = literal(now, pg.TIMESTAMP(timezone=True)) - Articles.published_on
+    age_hours = func.greatest(func.extract("epoch", age), 0) / 3600
+    decay = func.power(0.5, age_hours / CONFIG.FEED_RECENCY_HALF_LIFE_HOURS)
+    return cast(confidence * source_weight * cluster_boost * decay, pg.REAL)
@@ -0,0 +1,50 @@
+"""keyset indexes for paginated feed
+
+Revision ID: 1f9a3c6e8d42
+Revises: c4e7a91d5b20
+Create Date: 2026-10-19 11:48:09.104377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f9a3c6e8d42'
+down_revision: Union[str, Sequence[str], None] = 'c4e7a91d5b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (published_on) is a prefix of the keyset index
+    op.create_index('idx_articles_published_guid', 'articles', ['published_on', 'guid'], unique=False)
+    op.drop_index('idx_published_on', table_name='articles')
+
+    # guid becomes a key column so the keyset tie-break stays inside the covering index
+    op.drop_index('idx_articles_subcategory_published', table_name='articles')
+    op.create_index(
+        'idx_articles_subcategory_published',
+        'articles',
+        ['subcategory_id', 'published_on', 'guid'],
+        unique=False,
+        postgresql_include=['title', 'url', 'description', 'category_id', 'source'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_articles_subcategory_published', table_name='articles')
+    op.create_index(
+        'idx_articles_subcategory_published',
+        'articles',
+        ['subcategory_id', 'published_on'],
+        unique=False,
+        postgresql_include=['title', 'url', 'description', 'category_id', 'source'],
+    )
+
+    op.create_index('idx_published_on', 'articles', ['published_on'], unique=False)
+    op.drop_index('idx_articles_published_guid', table_name='articles')
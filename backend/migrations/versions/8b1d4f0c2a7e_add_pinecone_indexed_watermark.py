@@ -0,0 +1,37 @@
+"""add pinecone indexed watermark
+
+Revision ID: 8b1d4f0c2a7e
+Revises: 33023b368863
+Create Date: 2026-10-19 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1d4f0c2a7e'
+down_revision: Union[str, Sequence[str], None] = '33023b368863'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('pinecone_indexed_at', postgresql.TIMESTAMP(timezone=True), nullable=True))
+    op.create_index(
+        'idx_articles_not_indexed',
+        'articles',
+        ['published_on'],
+        unique=False,
+        postgresql_where=sa.text('pinecone_indexed_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_articles_not_indexed', table_name='articles', postgresql_where=sa.text('pinecone_indexed_at IS NULL'))
+    op.drop_column('articles', 'pinecone_indexed_at')
@@ -0,0 +1,36 @@
+"""unsummarized contents index
+
+Revision ID: a2d7e9b4c061
+Revises: f4b9d2c7a318
+Create Date: 2026-10-19 18:31:05.662149
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2d7e9b4c061'
+down_revision: Union[str, Sequence[str], None] = 'f4b9d2c7a318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'idx_article_contents_unsummarized',
+        'article_contents',
+        ['published_on'],
+        unique=False,
+        postgresql_where=sa.text(
+            'summary IS NULL AND (markdown_content IS NOT NULL OR markdown_compressed IS NOT NULL)'
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_article_contents_unsummarized', table_name='article_contents')
@@ -0,0 +1,40 @@
+"""compressed article contents
+
+Revision ID: a9c4e2d7f160
+Revises: e1a7c3f5b824
+Create Date: 2026-10-19 15:42:03.517290
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c4e2d7f160'
+down_revision: Union[str, Sequence[str], None] = 'e1a7c3f5b824'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('article_contents', sa.Column('markdown_compressed', postgresql.BYTEA(), nullable=True))
+    op.add_column('article_contents', sa.Column('content_codec', sa.TEXT(), nullable=True))
+    # Already zstd compressed, TOAST should store it out of line without trying pglz again
+    op.execute('ALTER TABLE article_contents ALTER COLUMN markdown_compressed SET STORAGE EXTERNAL')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Compressed bodies can only be decoded by the application, fails while any exist
+    op.execute(
+        "DO $$ BEGIN "
+        "IF EXISTS (SELECT 1 FROM article_contents WHERE markdown_compressed IS NOT NULL) THEN "
+        "RAISE EXCEPTION 'article_contents has compressed rows, decompress them first'; "
+        "END IF; END $$"
+    )
+    op.drop_column('article_contents', 'content_codec')
+    op.drop_column('article_contents', 'markdown_compressed')
@@ -0,0 +1,54 @@
+"""full text search vectors
+
+Revision ID: b5f1d3a8e274
+Revises: a9c4e2d7f160
+Create Date: 2026-10-19 16:20:44.109823
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5f1d3a8e274'
+down_revision: Union[str, Sequence[str], None] = 'a9c4e2d7f160'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'articles',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+        ),
+    )
+    op.create_index('idx_articles_search_vector', 'articles', ['search_vector'], unique=False, postgresql_using='gin')
+
+    op.add_column('article_contents', sa.Column('body_vector', postgresql.TSVECTOR(), nullable=True))
+    # Compressed bodies can not be read here, they stay unsearchable until rewritten
+    op.execute(
+        "UPDATE article_contents SET body_vector = to_tsvector('english', left(markdown_content, 200000)) "
+        "WHERE markdown_content IS NOT NULL"
+    )
+    op.create_index(
+        'idx_article_contents_body_vector', 'article_contents', ['body_vector'], unique=False, postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_article_contents_body_vector', table_name='article_contents')
+    op.drop_column('article_contents', 'body_vector')
+    op.drop_index('idx_articles_search_vector', table_name='articles')
+    op.drop_column('articles', 'search_vector')
@@ -0,0 +1,54 @@
+"""article confidences
+
+Revision ID: b9e4c1f7a362
+Revises: a2d7e9b4c061
+Create Date: 2026-10-19 20:12:47.381920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e4c1f7a362'
+down_revision: Union[str, Sequence[str], None] = 'a2d7e9b4c061'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+FEED_INDEX_INCLUDE = ['title', 'url', 'description', 'category_id', 'source']
+
+
+def _create_feed_index(include):
+    op.create_index(
+        'idx_articles_subcategory_published',
+        'articles',
+        ['subcategory_id', 'published_on', 'guid'],
+        unique=False,
+        postgresql_include=include,
+        postgresql_where=sa.text('is_canonical'),
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('category_confidence', postgresql.REAL(), nullable=True))
+    op.add_column('articles', sa.Column('subcategory_confidence', postgresql.REAL(), nullable=True))
+
+    # The ranked feed stays an index only scan
+    op.drop_index('idx_articles_subcategory_published', table_name='articles')
+    _create_feed_index(
+        FEED_INDEX_INCLUDE
+        + ['cluster_size', 'category_confidence', 'subcategory_confidence']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_articles_subcategory_published', table_name='articles')
+    _create_feed_index(FEED_INDEX_INCLUDE)
+    op.drop_column('articles', 'subcategory_confidence')
+    op.drop_column('articles', 'category_confidence')
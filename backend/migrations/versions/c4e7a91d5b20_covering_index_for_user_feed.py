@@ -0,0 +1,37 @@
+"""covering index for user feed
+
+Revision ID: c4e7a91d5b20
+Revises: 8b1d4f0c2a7e
+Create Date: 2026-10-19 11:03:27.552190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7a91d5b20'
+down_revision: Union[str, Sequence[str], None] = '8b1d4f0c2a7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'idx_articles_subcategory_published',
+        'articles',
+        ['subcategory_id', 'published_on'],
+        unique=False,
+        postgresql_include=['title', 'url', 'description', 'category_id', 'source'],
+    )
+    # (subcategory_id) is a prefix of the covering index
+    op.drop_index('idx_subcategory_id', table_name='articles')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('idx_subcategory_id', 'articles', ['subcategory_id'], unique=False)
+    op.drop_index('idx_articles_subcategory_published', table_name='articles')
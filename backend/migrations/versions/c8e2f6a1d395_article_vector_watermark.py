@@ -0,0 +1,38 @@
+"""article vector watermark
+
+Revision ID: c8e2f6a1d395
+Revises: b5f1d3a8e274
+Create Date: 2026-10-19 17:02:13.574120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e2f6a1d395'
+down_revision: Union[str, Sequence[str], None] = 'b5f1d3a8e274'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # NULL for the existing articles, the first sync embeds all of them
+    op.add_column('articles', sa.Column('vector_indexed_at', postgresql.TIMESTAMP(timezone=True), nullable=True))
+    op.create_index(
+        'idx_articles_not_vector_indexed',
+        'articles',
+        ['published_on'],
+        unique=False,
+        postgresql_where=sa.text('vector_indexed_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_articles_not_vector_indexed', table_name='articles')
+    op.drop_column('articles', 'vector_indexed_at')
@@ -0,0 +1,47 @@
+"""feed index without description
+
+Revision ID: d5a3f8c2e917
+Revises: b9e4c1f7a362
+Create Date: 2026-10-20 09:41:18.527304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a3f8c2e917'
+down_revision: Union[str, Sequence[str], None] = 'b9e4c1f7a362'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+RANKING_INCLUDE = ['cluster_size', 'category_confidence', 'subcategory_confidence']
+
+
+def _create_feed_index(include):
+    op.create_index(
+        'idx_articles_subcategory_published',
+        'articles',
+        ['subcategory_id', 'published_on', 'guid'],
+        unique=False,
+        postgresql_include=include,
+        postgresql_where=sa.text('is_canonical'),
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A long description made the index tuple exceed the btree limit and failed the insert
+    op.drop_index('idx_articles_subcategory_published', table_name='articles')
+    _create_feed_index(['title', 'url', 'category_id', 'source'] + RANKING_INCLUDE)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_articles_subcategory_published', table_name='articles')
+    _create_feed_index(
+        ['title', 'url', 'description', 'category_id', 'source'] + RANKING_INCLUDE
+    )
@@ -0,0 +1,136 @@
+"""partition articles by month
+
+Revision ID: d6b2e8f4a913
+Revises: 1f9a3c6e8d42
+Create Date: 2026-10-19 14:31:52.440871
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6b2e8f4a913'
+down_revision: Union[str, Sequence[str], None] = '1f9a3c6e8d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = (
+    'guid, title, description, url, source, published_on, markdown_content, summary, '
+    'pinecone_indexed_at, category_id, subcategory_id'
+)
+# Partitions created past the newest article, the maintenance job keeps this ahead
+MONTHS_AHEAD = 3
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _articles_columns():
+    return [
+        sa.Column('guid', sa.TEXT(), nullable=False),
+        sa.Column('title', sa.TEXT(), nullable=False),
+        sa.Column('description', sa.TEXT(), nullable=False),
+        sa.Column('url', sa.TEXT(), nullable=False),
+        sa.Column('source', postgresql.ENUM(name='source_enum', create_type=False), nullable=False),
+        sa.Column('published_on', postgresql.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('markdown_content', sa.TEXT(), nullable=True),
+        sa.Column('summary', sa.TEXT(), nullable=True),
+        sa.Column('pinecone_indexed_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('category_id', sa.UUID(), nullable=False),
+        sa.Column('subcategory_id', sa.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(['category_id'], ['news_categories.category_id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['subcategory_id'], ['news_subcategories.subcategory_id'], ondelete='SET NULL'),
+    ]
+
+
+def _create_articles_indexes():
+    op.create_index('idx_articles_published_guid', 'articles', ['published_on', 'guid'], unique=False)
+    op.create_index(
+        'idx_articles_subcategory_published',
+        'articles',
+        ['subcategory_id', 'published_on', 'guid'],
+        unique=False,
+        postgresql_include=['title', 'url', 'description', 'category_id', 'source'],
+    )
+    op.create_index('idx_source', 'articles', ['source'], unique=False)
+    op.create_index(
+        'idx_articles_not_indexed',
+        'articles',
+        ['published_on'],
+        unique=False,
+        postgresql_where=sa.text('pinecone_indexed_at IS NULL'),
+    )
+
+
+def _drop_articles_indexes(table_name: str):
+    op.drop_index('idx_articles_not_indexed', table_name=table_name)
+    op.drop_index('idx_source', table_name=table_name)
+    op.drop_index('idx_articles_subcategory_published', table_name=table_name)
+    op.drop_index('idx_articles_published_guid', table_name=table_name)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.rename_table('articles', 'articles_unpartitioned')
+    op.execute('ALTER TABLE articles_unpartitioned RENAME CONSTRAINT articles_pkey TO articles_unpartitioned_pkey')
+    _drop_articles_indexes('articles_unpartitioned')
+
+    # The partition key has to be part of the primary key
+    op.create_table(
+        'articles',
+        *_articles_columns(),
+        sa.PrimaryKeyConstraint('guid', 'published_on'),
+        postgresql_partition_by='RANGE (published_on)',
+    )
+
+    oldest, newest = op.get_bind().execute(
+        sa.text('SELECT min(published_on), max(published_on) FROM articles_unpartitioned')
+    ).one()
+    now = datetime.now(timezone.utc)
+    oldest, newest = oldest or now, max(newest or now, now)
+    month = date(oldest.year, oldest.month, 1)
+    last = _add_months(date(newest.year, newest.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        following = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE articles_p{month.year:04d}_{month.month:02d} PARTITION OF articles "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{following.isoformat()} 00:00:00+00')"
+        )
+        month = following
+    op.execute('CREATE TABLE articles_default PARTITION OF articles DEFAULT')
+
+    op.execute(f'INSERT INTO articles ({COLUMNS}) SELECT {COLUMNS} FROM articles_unpartitioned')
+    op.drop_table('articles_unpartitioned')
+
+    # Created on the parent after the copy, every partition gets its own index
+    _create_articles_indexes()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Partitions archived by the maintenance job are left in the archive schema
+    _drop_articles_indexes('articles')
+    op.rename_table('articles', 'articles_partitioned')
+    op.execute('ALTER TABLE articles_partitioned RENAME CONSTRAINT articles_pkey TO articles_partitioned_pkey')
+
+    op.create_table(
+        'articles',
+        *_articles_columns(),
+        sa.PrimaryKeyConstraint('guid'),
+    )
+    # guid is only unique per published_on in the partitioned table
+    op.execute(
+        f'INSERT INTO articles ({COLUMNS}) SELECT {COLUMNS} FROM articles_partitioned '
+        f'ORDER BY published_on DESC ON CONFLICT (guid) DO NOTHING'
+    )
+    op.drop_table('articles_partitioned')
+
+    _create_articles_indexes()
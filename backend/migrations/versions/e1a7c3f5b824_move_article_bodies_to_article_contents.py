@@ -0,0 +1,78 @@
+"""move article bodies to article_contents
+
+Revision ID: e1a7c3f5b824
+Revises: d6b2e8f4a913
+Create Date: 2026-10-19 15:07:26.918354
+
+"""
+import re
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1a7c3f5b824'
+down_revision: Union[str, Sequence[str], None] = 'd6b2e8f4a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'article_contents',
+        sa.Column('guid', sa.TEXT(), nullable=False),
+        sa.Column('published_on', postgresql.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('markdown_content', sa.TEXT(), nullable=True),
+        sa.Column('summary', sa.TEXT(), nullable=True),
+        sa.PrimaryKeyConstraint('guid', 'published_on'),
+        postgresql_partition_by='RANGE (published_on)',
+    )
+
+    # Same months as the articles partitions
+    partitions = op.get_bind().execute(
+        sa.text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST('articles' AS regclass)"
+        )
+    ).scalars().all()
+    for name in partitions:
+        match = re.match(r'^articles_p(\d{4})_(\d{2})$', name)
+        if not match:
+            continue
+        month = date(int(match[1]), int(match[2]), 1)
+        following = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE article_contents_p{month.year:04d}_{month.month:02d} PARTITION OF article_contents "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{following.isoformat()} 00:00:00+00')"
+        )
+    op.execute('CREATE TABLE article_contents_default PARTITION OF article_contents DEFAULT')
+
+    op.execute(
+        'INSERT INTO article_contents (guid, published_on, markdown_content, summary) '
+        'SELECT guid, published_on, markdown_content, summary FROM articles '
+        'WHERE markdown_content IS NOT NULL OR summary IS NOT NULL'
+    )
+    op.drop_column('articles', 'summary')
+    op.drop_column('articles', 'markdown_content')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('articles', sa.Column('markdown_content', sa.TEXT(), nullable=True))
+    op.add_column('articles', sa.Column('summary', sa.TEXT(), nullable=True))
+    op.execute(
+        'UPDATE articles SET markdown_content = c.markdown_content, summary = c.summary '
+        'FROM article_contents c '
+        'WHERE articles.guid = c.guid AND articles.published_on = c.published_on'
+    )
+    op.drop_table('article_contents')
@@ -0,0 +1,61 @@
+"""story clusters
+
+Revision ID: f4b9d2c7a318
+Revises: c8e2f6a1d395
+Create Date: 2026-10-19 17:48:39.206517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b9d2c7a318'
+down_revision: Union[str, Sequence[str], None] = 'c8e2f6a1d395'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_feed_index(**kwargs):
+    op.create_index(
+        'idx_articles_subcategory_published',
+        'articles',
+        ['subcategory_id', 'published_on', 'guid'],
+        unique=False,
+        postgresql_include=['title', 'url', 'description', 'category_id', 'source'],
+        **kwargs,
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Constant defaults, no table rewrite. Existing articles are their own story.
+    op.add_column('articles', sa.Column('cluster_id', sa.TEXT(), nullable=True))
+    op.add_column('articles', sa.Column('is_canonical', sa.BOOLEAN(), server_default=sa.text('true'), nullable=False))
+    op.add_column('articles', sa.Column('cluster_size', sa.INTEGER(), server_default=sa.text('1'), nullable=False))
+    op.add_column('articles', sa.Column('minhash', postgresql.BYTEA(), nullable=True))
+    op.create_index(
+        'idx_articles_cluster_id',
+        'articles',
+        ['cluster_id'],
+        unique=False,
+        postgresql_where=sa.text('cluster_id IS NOT NULL'),
+    )
+
+    # The feed only reads canonical articles
+    op.drop_index('idx_articles_subcategory_published', table_name='articles')
+    _create_feed_index(postgresql_where=sa.text('is_canonical'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_articles_subcategory_published', table_name='articles')
+    _create_feed_index()
+    op.drop_index('idx_articles_cluster_id', table_name='articles')
+    op.drop_column('articles', 'minhash')
+    op.drop_column('articles', 'cluster_size')
+    op.drop_column('articles', 'is_canonical')
+    op.drop_column('articles', 'cluster_id')